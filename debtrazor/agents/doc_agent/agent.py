@@ -1,64 +1,263 @@
 import os
 import json
+import time
+import itertools
+import shutil
+import asyncio
+import threading
+import contextvars
+from typing import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from debtrazor.agents.agent import Agent
 from langgraph.graph import StateGraph, END
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from debtrazor.agents.doc_agent.prompts import (
+    DEPENDENCY_SUMMARIES_PROMPT,
     PROMPT,
+    PROMPT_INSERTIONS,
+    PROMPT_UPDATE,
     PROMPT_SUMMARY,
     PROMPT_README,
+    PROMPT_README_BATCH,
     PROMPT_DEPENDENCY_TREE,
 )
 from debtrazor.tools.utils import execute_tool
+from debtrazor.agents.instrumentation import (
+    InstrumentedCheckpointSaver,
+    MetricsCallbackHandler,
+    timed_node,
+)
+from debtrazor.utils.metrics import metrics
+from debtrazor.utils.tokens import (
+    count_tokens,
+    split_by_tokens,
+    split_file_by_tokens,
+)
+from debtrazor.utils.sniff import FileLimits, read_source, skip_reason
 from debtrazor.agents.doc_agent.state import DocAgentState
-from debtrazor.utils.logging import logger, add_to_log_queue
-from debtrazor.constants import supported_langs, dependency_tool_supported_langs
-from debtrazor.utils.util import is_ignored, parse_code_string, get_relative_path
+from debtrazor.agents.doc_agent.journal import get_journal
+from debtrazor.agents.doc_agent.batch import (
+    BatchBackend,
+    BatchRequest,
+    BatchResult,
+    get_batch_backend,
+    to_batch_messages,
+)
+from debtrazor.agents.doc_agent.patch import (
+    COMMENT_SYNTAX,
+    apply_insertions,
+    number_lines,
+    parse_insertions,
+)
+from debtrazor.agents.doc_agent.pipeline import (
+    PreparedDependencies,
+    PreparedFile,
+    Prefetcher,
+    file_signature,
+)
+from debtrazor.agents.doc_agent.similarity import (
+    Fingerprint,
+    SimilarityIndex,
+    digest,
+    fingerprint,
+    line_ranges,
+    transfer_comments,
+)
+from debtrazor.agents.doc_agent.scheduler import (
+    extract_dependencies,
+    list_source_files,
+    plan_levels,
+    resolve_dependencies,
+    run_dependency_tool,
+)
+from debtrazor.utils.logging import (
+    logger,
+    add_to_log_queue,
+    forward_progress,
+    report_progress,
+)
+from debtrazor.constants import (
+    supported_langs,
+    dependency_tool_supported_langs,
+    dependency_tools,
+)
+from debtrazor.utils.util import (
+    CodeStringStream,
+    is_ignored,
+    parse_code_string,
+    get_relative_path,
+)
+
+# Minimum interval between progress reports of a streamed file
+PROGRESS_INTERVAL_SECONDS = 1.0
+
 
 class DocAgent(Agent):
-    def __init__(self, model, tools, checkpointer=None, thread_id=None):
+    def __init__(
+        self,
+        model,
+        tools,
+        checkpointer=None,
+        thread_id=None,
+        readme_batch_tokens=None,
+        max_concurrency=4,
+        schedule="directory",
+        file_limits=None,
+        prefetch=8,
+        stream_output=False,
+        output_format="code",
+        reuse_duplicates=True,
+        near_duplicate_threshold=0.8,
+        batch_backend="openai",
+        batch_size=1000,
+        batch_poll_seconds=60,
+    ):
         """
         Initialize the DocAgent with the given model, tools, checkpointer, and thread_id.
 
         Args:
             model: The model to be used by the agent.
             tools: The tools to be used by the agent.
-            checkpointer: Optional checkpointer for state management.
-            thread_id: Optional thread identifier.
+            checkpointer: Optional checkpointer for state management. Either a
+                checkpoint saver or a context manager yielding one (as returned
+                by ``setup_memory``).
+            thread_id: Optional thread identifier. The compiled graph is not
+                bound to it, so one agent can serve many threads through
+                ``get_config``.
+            readme_batch_tokens: Optional token budget of the summaries in one
+                README prompt. Larger directories are summarized map-reduce
+                style in batches of this size. None disables batching.
+            max_concurrency: Maximum number of model calls made at once by
+                the batch summaries and the topological schedule.
+            schedule: "directory" documents files as the directories are
+                walked. "topological" documents all files first, in
+                topological levels of their internal dependencies, with the
+                summaries of its dependencies in each file's prompt.
+                "batch" documents all files first too, submitting the doc and
+                summary prompts of each wave of files to a batch endpoint.
+            file_limits: Optional ``FileLimits`` deciding which files are
+                skipped (binary, minified, generated, too large) and how files
+                over the token limit are chunked or truncated.
+            prefetch: Number of upcoming files of the current directory that
+                are read, split and run through the dependency tool in worker
+                threads while the model documents the current one. 0 disables
+                prefetching.
+            stream_output: Stream the documented code to the output file as
+                the model generates it, reporting progress to the job's log
+                queue. The pieces of a chunked file are then generated one
+                after the other instead of concurrently.
+            output_format: "code" has the model return the whole documented
+                file. "insertions" has it list the comments to insert by line
+                number, which are inserted and verified locally; files whose
+                insertions cannot be used are documented with "code".
+            reuse_duplicates: Reuse the documentation of already documented
+                copies of a file. Exact copies take the documented code and
+                summary as is; near copies take the comments of the lines
+                they share, and the model only documents the changed lines.
+            near_duplicate_threshold: Minimum estimated similarity of the
+                token shingles of a near copy. None only reuses exact copies.
+            batch_backend: Where the "batch" schedule submits its batches,
+                "openai" or "local" (answered in-process, for offline runs),
+                see ``get_batch_backend``.
+            batch_size: Maximum number of files per wave of the "batch"
+                schedule. Later waves get the summaries of their dependencies
+                in earlier waves.
+            batch_poll_seconds: Interval between checks of a pending batch.
         """
         super().__init__(model, tools)
+        self.readme_batch_tokens = readme_batch_tokens
+        self.max_concurrency = max_concurrency
+        self.file_limits = file_limits or FileLimits()
+        self.model_name = getattr(model, "model_name", None)
+        self.prefetch = prefetch
+        self.stream_output = stream_output
+        self.output_format = output_format
+        self.reuse_duplicates = reuse_duplicates
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.batch_backend = batch_backend
+        self.batch_size = batch_size
+        self.batch_poll_seconds = batch_poll_seconds
+
+        # Fingerprints of the documented files, per journal and repository
+        self._similarity_indexes = {}
+        self._similarity_lock = threading.Lock()
+
+        # The local stages of the upcoming files, run ahead of the model calls
+        self.prepared_files = Prefetcher("files", self._prepare_file, capacity=prefetch)
+        self.prepared_dependencies = Prefetcher(
+            "dependencies", self._prepare_dependencies, capacity=prefetch
+        )
+
+        self.thread_id = thread_id + "_docAgent" if thread_id is not None else None
+        self.config = self.get_config(thread_id)
+
+        # Defining the chains, named and instrumented for the metrics
+        chain_names = [
+            "doc_chain",
+            "insertions_chain",
+            "update_chain",
+            "summary_chain",
+            "readme_chain",
+            "readme_batch_chain",
+            "dependency_tree_chain",
+        ]
+        metrics_handler = MetricsCallbackHandler(chain_names)
+
+        def instrument(chain, name):
+            return chain.with_config(run_name=name, callbacks=[metrics_handler])
 
-        self.thread_id = thread_id + "_docAgent"
-        self.config = {"recursion_limit": 1000}
-        if self.thread_id is not None:
-            self.config["configurable"] = {"thread_id": self.thread_id}
+        self.doc_chain = instrument(PROMPT | self.model, "doc_chain")
 
-        # Defining the chains
-        self.doc_chain = PROMPT | self.model
+        self.insertions_chain = instrument(
+            PROMPT_INSERTIONS | self.model, "insertions_chain"
+        )
+
+        self.update_chain = instrument(PROMPT_UPDATE | self.model, "update_chain")
 
-        self.summary_chain = PROMPT_SUMMARY | self.model
+        self.summary_chain = instrument(PROMPT_SUMMARY | self.model, "summary_chain")
 
-        self.readme_chain = PROMPT_README | self.model
+        self.readme_chain = instrument(PROMPT_README | self.model, "readme_chain")
+
+        self.readme_batch_chain = instrument(
+            PROMPT_README_BATCH | self.model, "readme_batch_chain"
+        )
 
-        self.dependency_tree_chain = (
+        self.dependency_tree_chain = instrument(
             PROMPT_DEPENDENCY_TREE.partial(
                 tool_names=", ".join([tool.name for tool in tools])
             )
             | self.model.bind_tools(self.tools)
-            | (lambda message: execute_tool(message, self.tools))
+            | (lambda message: execute_tool(message, self.tools)),
+            "dependency_tree_chain",
         )
 
         # creating Agent graph
         logger.info("Creating Agent Graph")
         graph = StateGraph(DocAgentState)
 
-        # Adding nodes
-        graph.add_node("start", self.start_node)
-        graph.add_node("directory_processor", self.directory_processor_node)
-        graph.add_node("is_supported_code_file", self.is_supported_code_file_node)
-        graph.add_node("document_file", self.document_file_node)
-        graph.add_node("readme_creator", self.readme_creator_node)
-
-        graph.set_entry_point("start")
+        # Adding nodes, each timed for the metrics
+        nodes = {
+            "start": self.start_node,
+            "directory_processor": self.directory_processor_node,
+            "is_supported_code_file": self.is_supported_code_file_node,
+            "document_file": self.document_file_node,
+            "readme_creator": self.readme_creator_node,
+            "merge_subtree": self.merge_subtree_node,
+        }
+        for name, node in nodes.items():
+            graph.add_node(name, timed_node(name, node))
+
+        if schedule == "topological":
+            graph.add_node("schedule", timed_node("schedule", self.schedule_node))
+            graph.set_entry_point("schedule")
+            graph.add_edge("schedule", "start")
+        elif schedule == "batch":
+            graph.add_node("batch", timed_node("batch", self.batch_node))
+            graph.set_entry_point("batch")
+            graph.add_edge("batch", "start")
+        else:
+            graph.set_entry_point("start")
         graph.add_edge("start", "directory_processor")
 
         # Adding edges
@@ -69,6 +268,7 @@ class DocAgent(Agent):
                 "start": "start",
                 "is_supported_code_file": "is_supported_code_file",
                 "readme_creator": "readme_creator",
+                "merge_subtree": "merge_subtree",
                 "end": END,
             },
         )
@@ -84,6 +284,9 @@ class DocAgent(Agent):
         graph.add_conditional_edges(
             "readme_creator", self.should_continue, {"start": "start", "end": END}
         )
+        graph.add_conditional_edges(
+            "merge_subtree", self.should_continue, {"start": "start", "end": END}
+        )
 
         logger.info(
             """Nodes: Start, directory_preprossor, document_file,
@@ -91,19 +294,52 @@ class DocAgent(Agent):
         )
         logger.info("Conditional Edges: directory_processor")
         # compiling graph
-        self.graph = graph.compile(checkpointer=checkpointer.__enter__())
+        if checkpointer is not None and not isinstance(
+            checkpointer, BaseCheckpointSaver
+        ):
+            checkpointer = checkpointer.__enter__()
+        if checkpointer is not None:
+            checkpointer = InstrumentedCheckpointSaver(checkpointer)
+        self.graph = graph.compile(checkpointer=checkpointer)
+
+    @staticmethod
+    def get_config(thread_id=None):
+        """
+        Build the graph run configuration for a thread.
+
+        Args:
+            thread_id: Optional thread identifier of the job.
+
+        Returns:
+            dict: The configuration to pass to the compiled graph.
+        """
+        config = {"recursion_limit": 1000}
+        if thread_id is not None:
+            config["configurable"] = {"thread_id": str(thread_id) + "_docAgent"}
+        return config
 
-    def __call__(self, state: DocAgentState):
+    def __call__(self, state: DocAgentState, config=None):
         """
         Execute the agent with the given state.
 
         Args:
             state (DocAgentState): The state to be processed by the agent.
+            config (dict, optional): Run configuration from ``get_config``.
+                Defaults to the configuration of the agent's own thread.
 
         Returns:
             The result of the graph execution.
         """
-        return self.graph.stream(state, config=self.config)
+        return self.graph.stream(state, config=config or self.config)
+
+    def close(self):
+        """
+        Stop the prefetch threads and drop the prepared files they hold.
+
+        The agent stays usable; a later run starts prefetching again.
+        """
+        self.prepared_files.close()
+        self.prepared_dependencies.close()
 
     def process_directory_or_file(self, state: DocAgentState):
         """
@@ -117,11 +353,16 @@ class DocAgent(Agent):
         """
         logger.info("on node: process_directory_or_file")
         if state["current_path"] is not None:
-            if os.path.isdir(
-                os.path.join(
-                    state["directory_stack"][-1]["path"], state["current_path"]
-                )
-            ):
+            path = os.path.join(
+                state["directory_stack"][-1]["path"], state["current_path"]
+            )
+            if os.path.isdir(path):
+                # Subtrees documented separately (e.g. by shards) are merged
+                # instead of walked
+                if get_relative_path(path, state["entry_path"]) in (
+                    state.get("completed_subtrees") or {}
+                ):
+                    return "merge_subtree"
                 return "start"
             else:
                 return "is_supported_code_file"
@@ -176,7 +417,9 @@ class DocAgent(Agent):
             dict: The updated state.
         """
         logger.info("on node: start_node")
-        current_path = state["current_path"]
+        # A None current_path is not restored from a checkpoint, e.g. when
+        # resuming after a crash in the schedule node
+        current_path = state.get("current_path")
 
         items_to_process = state["items_to_process"]
         path = (
@@ -247,6 +490,7 @@ class DocAgent(Agent):
                 next_item = state["items_to_process"].pop(0)
                 if not is_ignored(next_item, state["ignore_list"]):
                     break
+            self._prefetch_upcoming(state, next_item)
             return {"current_path": next_item}
 
         else:
@@ -265,7 +509,14 @@ class DocAgent(Agent):
         logger.info("on node: is_supported_code_file_node")
         if state["current_path"] is not None:
             if state["current_path"].endswith(supported_langs[state["legacy_language"]]):
-                return {"document_or_skip_current_file": True}
+                path = os.path.join(
+                    state["directory_stack"][-1]["path"], state["current_path"]
+                )
+                return {
+                    "document_or_skip_current_file": not self._skip_file(
+                        path, prepared=self._prepared_file(path)
+                    )
+                }
         return {"document_or_skip_current_file": False}
     
     def continue_to_document_file_or_skip(self, state: DocAgentState):
@@ -286,79 +537,77 @@ class DocAgent(Agent):
         logger.info("on node: document_file_node")
         logger.info(f"file name: {state['current_path']}")
         # TODO: Invoke the model to document the file.
-        code_file = None
         message = None
-        with open(
-            os.path.join(state["directory_stack"][-1]["path"], state["current_path"]),
-            "r",
-        ) as f:
-            code_file = f.read()
 
         relative_path = get_relative_path(
             state["directory_stack"][-1]["path"], state["entry_path"]
         )
 
         output_path = os.path.join(state["output_path"], relative_path)
-        dependencies_per_file = state["dependencies_per_file"]
+        # Copied, the previous checkpoint may still be serialized in the
+        # background
+        dependencies_per_file = dict(state["dependencies_per_file"])
         if not os.path.exists(output_path):
             os.makedirs(output_path)
-        if not os.path.exists(os.path.join(output_path, state["current_path"])):
-            doc_commented_code_file = parse_code_string(
-                self.doc_chain.invoke(
+        file_path = os.path.join(relative_path, state["current_path"])
+        message_kwargs = {
+            "directory_path": state["directory_stack"][-1]["path"],
+            "file_name": state["current_path"],
+        }
+        scheduled = (state.get("file_summaries") or {}).get(file_path)
+        if scheduled is not None:
+            # Already documented and summarized by the schedule node
+            message = AIMessage(
+                content=scheduled["summary"], additional_kwargs=message_kwargs
+            )
+            if scheduled["dependencies"] is not None:
+                dependencies_str = json.dumps(scheduled["dependencies"])
+                message.content += f"""\nInternal Dependencies: {dependencies_str}"""
+                # Keyed by path, so files of the same name do not collide
+                dependencies_per_file.update(
                     {
-                        "language": state["legacy_language"],
-                        "framework": state["legacy_framework"],
-                        "code_file": code_file,
+                        file_path: resolve_dependencies(
+                            file_path, scheduled["dependencies"]
+                        )
                     }
-                ).content
+                )
+        else:
+            # Each sub-step is journaled, so after a crash only the missing
+            # ones are redone
+            doc_commented_code_file = self._document_code(
+                state,
+                file_path,
+                os.path.join(
+                    state["directory_stack"][-1]["path"], state["current_path"]
+                ),
             )
 
-            try:
-                with open(os.path.join(output_path, state["current_path"]), "w") as f:
-                    f.write(doc_commented_code_file)
-            except IOError:
-                if os.path.exists(os.path.join(output_path, state["current_path"])):
-                    os.remove(os.path.join(output_path, state["current_path"]))
-                print("Error writing file")
-
             # pass doc_commented_code_file to the model again with the
             # summary chain to create a summary of the file and write the
             # summary along with the path to the messages in state
-            code_file_summary = self.summary_chain.invoke(
-                {
-                    "language": state["legacy_language"],
-                    "framework": state["legacy_framework"],
-                    "code_file": doc_commented_code_file,
-                }
+            message = AIMessage(
+                content=self._summarize_code(state, file_path, doc_commented_code_file),
+                additional_kwargs=message_kwargs,
             )
-            code_file_summary.additional_kwargs["directory_path"] = state[
-                "directory_stack"
-            ][-1]["path"]
-            code_file_summary.additional_kwargs["file_name"] = state["current_path"]
-            message = code_file_summary
 
             if state["legacy_language"] in dependency_tool_supported_langs:
-                dependency_tree = self.dependency_tree_chain.invoke(
-                    {
-                        "language": state["legacy_language"],
-                        "framework": state["legacy_framework"],
-                        "code_file_path": os.path.join(
-                            state["directory_stack"][-1]["path"], state["current_path"]
-                        ),
-                    }
+                dependency_tree = self._find_dependencies(
+                    state,
+                    file_path,
+                    os.path.join(
+                        state["directory_stack"][-1]["path"], state["current_path"]
+                    ),
                 )
-
-                if hasattr(dependency_tree, "dependencies"):
-                    if (
-                        len(dependency_tree.dependencies) > 0
-                    ):  # Check if the list is not empty
-                        dependencies_str = json.dumps(dependency_tree.dependencies)
-                    else:  # Handle the empty list case
-                        dependencies_str = json.dumps([])
+                if dependency_tree is not None:
+                    dependencies_str = json.dumps(dependency_tree["dependencies"])
                     message.content += f"""\nInternal Dependencies: {dependencies_str}"""
-                dependencies_per_file.update(
-                    {dependency_tree.root: dependency_tree.dependencies}
-                )
+                    dependencies_per_file.update(
+                        {
+                            file_path: resolve_dependencies(
+                                file_path, dependency_tree["dependencies"]
+                            )
+                        }
+                    )
 
         prefix = "├── " if state["directory_stack"][-1]["count"] >= 0 else "└── "
         state["directory_structure"] = (
@@ -369,119 +618,1905 @@ class DocAgent(Agent):
             + "\n"
         )
 
-        if message is not None:
-            return {
-                "directory_structure": state["directory_structure"],
-                "messages": [message],
-                "dependencies_per_file": dependencies_per_file,
-            }
-
         return {
             "directory_structure": state["directory_structure"],
+            "messages": [message],
             "dependencies_per_file": dependencies_per_file,
         }
 
-    def readme_creator_node(self, state: DocAgentState):
+    def _dependency_tool(self, language: str):
         """
-        Process the README creator node in the state graph.
+        Return the tool extracting the dependencies of a language directly.
+
+        Args:
+            language (str): The legacy language.
+
+        Returns:
+            BaseTool | None: The tool, or None if the language has none.
+        """
+        tool_name = dependency_tools.get(language)
+        return next((tool for tool in self.tools if tool.name == tool_name), None)
+
+    def _prefetch_upcoming(self, state: DocAgentState, next_item: str):
+        """
+        Start the local stages of the next files of the current directory.
+
+        The files are read, sniffed and split, and the dependency tool is run
+        on them, in worker threads while the model works on earlier files.
 
         Args:
             state (DocAgentState): The current state of the agent.
+            next_item (str): The item about to be processed.
+        """
+        if self.prefetch <= 0:
+            return
+        directory = state["directory_stack"][-1]
+        extension = supported_langs[state["legacy_language"]]
+        upcoming = [next_item] + state["items_to_process"][: max(directory["count"], 0)]
+        paths = [
+            os.path.join(directory["path"], item)
+            for item in upcoming
+            if item.endswith(extension) and not is_ignored(item, state["ignore_list"])
+        ][: self.prefetch]
+        paths = [path for path in paths if os.path.isfile(path)]
+        self.prepared_files.prefetch((path,) for path in paths)
+
+        language = state["legacy_language"]
+        if self._dependency_tool(language) is None:
+            return
+        # Files whose dependencies are journaled are not run through the tool
+        journal = get_journal(state.get("journal_path"))
+        relative_path = get_relative_path(directory["path"], state["entry_path"])
+        self.prepared_dependencies.prefetch(
+            (path, language, state["entry_path"])
+            for path in paths
+            if journal is None
+            or not journal.done(
+                state["entry_path"],
+                os.path.join(relative_path, os.path.basename(path)),
+                "dependencies",
+            )
+        )
+
+    def _prepare_file(self, path: str) -> PreparedFile:
+        """
+        Sniff, read and split a source file, before its model calls.
+
+        Args:
+            path (str): The path of the source file.
 
         Returns:
-            dict: The updated state.
+            PreparedFile: Whether the file is skipped, its code pieces and
+            fingerprint.
         """
-        logger.info("on node: readme_creator_node")
+        signature = file_signature(path)
+        limits = self.file_limits
+        reason = skip_reason(path, limits)
+        pieces = None
+        code_fingerprint = None
+        if reason is None:
+            code = read_source(path)
+            pieces = split_by_tokens(code, limits.max_tokens, self.model_name)
+            if limits.oversize == "skip" and len(pieces) > 1:
+                reason, pieces = "oversize", None
+            elif self.reuse_duplicates:
+                code_fingerprint = fingerprint(code)
+        return PreparedFile(signature, reason, pieces, code_fingerprint)
+
+    def _prepare_dependencies(
+        self, path: str, language: str, entry_path: str | None = None
+    ) -> PreparedDependencies:
+        """
+        Run the dependency tool of a language on a source file.
 
-        # Ensure items_to_process is initialized to an empty list if it's None
-        if state["items_to_process"] is None:
-            state["items_to_process"] = []
+        Args:
+            path (str): The path of the source file.
+            language (str): The legacy language.
+            entry_path (str | None): The repository root, see
+                ``run_dependency_tool``.
 
-        # Pop the last directory from the stack
-        directory_path = state["directory_stack"].pop(-1)["path"]
+        Returns:
+            PreparedDependencies: The reported dependencies.
+        """
+        signature = file_signature(path)
+        tool = self._dependency_tool(language)
+        return PreparedDependencies(
+            signature,
+            None if tool is None else run_dependency_tool(tool, path, entry_path),
+        )
 
-        # write this README.md in the output_path and add
-        # the contents of README.md to the messages in state
-        # with the path in the last position in the directory_stack
-        # in state
-        relative_path = get_relative_path(directory_path, state["entry_path"])
-        output_directory_path = os.path.join(state["output_path"], relative_path)
+    @staticmethod
+    def _fresh(prefetcher: Prefetcher, key: tuple, path: str):
+        """
+        Return a prefetched result, redone if the file changed since.
 
-        readme_file_path = os.path.join(output_directory_path, "README.md")
+        Args:
+            prefetcher (Prefetcher): The stage the result comes from.
+            key (tuple): The key of the result.
+            path (str): The path of the file the result was computed from.
 
-        # Generate the summaries and filter out the messages simultaneously
-        file_or_module_summaries = [
-            message.additional_kwargs["file_name"] + ":" + message.content + "\n\n"
-            for message in state["messages"]
-            if message.additional_kwargs["directory_path"] == directory_path
-        ]
+        Returns:
+            PreparedFile | PreparedDependencies: The result.
+        """
+        status = prefetcher.status(key)
+        result = prefetcher.get(key)
+        if result.signature != file_signature(path):
+            prefetcher.invalidate(key)
+            status = "missing"
+            result = prefetcher.get(key)
+        metrics.inc("debtrazor_prefetch_total", stage=prefetcher.name, status=status)
+        return result
+
+    def _prepared_file(self, path: str) -> PreparedFile:
+        """
+        Return a source file prepared for its model calls, prefetched or not.
 
-        file_or_module_summaries = "\n\n".join(file_or_module_summaries)
+        Args:
+            path (str): The path of the source file.
 
-        readme = self.readme_chain.invoke(
+        Returns:
+            PreparedFile: The prepared file.
+        """
+        return self._fresh(self.prepared_files, (path,), path)
+
+    def _skip_file(
+        self, path: str, record: bool = True, prepared: PreparedFile | None = None
+    ) -> bool:
+        """
+        Decide whether a source file is left out of the documentation.
+
+        Binary files and, unless configured otherwise, minified and generated
+        files are detected from their first KB; files over the byte limit are
+        not read at all.
+
+        Args:
+            path (str): The path of the source file.
+            record (bool): Log and count the skipped file in the metrics.
+            prepared (PreparedFile | None): The file, if it was prepared
+                already.
+
+        Returns:
+            bool: True if the file is skipped.
+        """
+        limits = self.file_limits
+        if prepared is not None:
+            reason = prepared.skip_reason
+        else:
+            reason = skip_reason(path, limits)
+            if reason is None and limits.oversize == "skip":
+                if count_tokens(read_source(path), self.model_name) > limits.max_tokens:
+                    reason = "oversize"
+        if reason is not None and record:
+            logger.info("Skipping %s file: %s", reason, path)
+            metrics.inc("debtrazor_files_skipped_total", reason=reason)
+        return reason is not None
+
+    def _split_code(self, pieces: list[str], path: str) -> list[str]:
+        """
+        Select the pieces of a file over the token limit sent to the model.
+
+        Args:
+            pieces (list[str]): The code, split by ``split_by_tokens``.
+            path (str): The path of the code file, for logging.
+
+        Returns:
+            list[str]: The pieces; only the first one if files are truncated.
+        """
+        limits = self.file_limits
+        if len(pieces) > 1:
+            mode = "truncate" if limits.oversize == "truncate" else "chunk"
+            logger.info(
+                "%s is over %d tokens (%d pieces), mode: %s",
+                path,
+                limits.max_tokens,
+                len(pieces),
+                mode,
+            )
+            metrics.inc("debtrazor_files_split_total", mode=mode)
+            if mode == "truncate":
+                pieces = pieces[:1]
+        return pieces
+
+    def _doc_prompts(
+        self, state: DocAgentState, file_path: str, source_path: str, **variables
+    ) -> tuple[PreparedFile, list[str], list[dict]]:
+        """
+        Prepare a file and build the doc prompt variables of its pieces.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            file_path (str): The file path relative to the entry path.
+            source_path (str): The path of the source file.
+            **variables: Extra prompt variables, e.g. ``dependency_summaries``.
+
+        Returns:
+            tuple[PreparedFile, list[str], list[dict]]: The prepared file, the
+            pieces of code sent to the model and the variables of each.
+        """
+        prepared = self._prepared_file(source_path)
+        if prepared.pieces is None:
+            # The file changed since it was selected and is skipped now
+            prepared = prepared._replace(
+                pieces=split_by_tokens(
+                    read_source(source_path),
+                    self.file_limits.max_tokens,
+                    self.model_name,
+                )
+            )
+        pieces = self._split_code(prepared.pieces, file_path)
+        prompts = [
             {
-                "file_module_summaries": file_or_module_summaries,
-                "module_name": os.path.basename(relative_path),
+                "language": state["legacy_language"],
+                "framework": state["legacy_framework"],
+                "dependency_summaries": "",
+                "code_file": piece,
+                **variables,
             }
+            for piece in pieces
+        ]
+        return prepared, pieces, prompts
+
+    def _document_code(
+        self,
+        state: DocAgentState,
+        file_path: str,
+        source_path: str,
+        batched: list[str] | None = None,
+        **variables,
+    ) -> str | None:
+        """
+        Return the documented code of a file, calling the model only once.
+
+        The output is written atomically, so an existing output file is always
+        complete and is reused as is. Copies of documented files reuse their
+        documentation, see ``_reuse_copy``. Files over the token limit are
+        documented in pieces (or truncated), see ``FileLimits``. In
+        insertions mode only the comments are generated, see
+        ``_document_by_insertions``. With ``stream_output`` the code is
+        written to disk as it is generated and is not returned.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            file_path (str): The file path relative to the entry path.
+            source_path (str): The path of the source file.
+            batched (list[str] | None): The model output for each piece,
+                already generated by a batch (see ``batch_node``); unusable
+                insertions are still regenerated as code.
+            **variables: Extra prompt variables, e.g. ``dependency_summaries``.
+
+        Returns:
+            str | None: The documented code, or None if it is only in the
+            output file, see ``_summary_prompts``.
+        """
+        journal = get_journal(state.get("journal_path"))
+        output_file_path = os.path.join(state["output_path"], file_path)
+        if os.path.exists(output_file_path):
+            # Already documented by an earlier (possibly interrupted) run
+            metrics.inc("debtrazor_cache_hits_total", cache="doc_output")
+            if journal is not None and not journal.done(
+                state["entry_path"], file_path, "doc"
+            ):
+                journal.record(state["entry_path"], file_path, "doc")
+            if self.stream_output:
+                return None
+            with open(output_file_path, "r") as f:
+                return f.read()
+
+        prepared, pieces, prompts = self._doc_prompts(
+            state, file_path, source_path, **variables
         )
+        temporary_path = output_file_path + ".tmp"
+        doc_commented_code_file = None
+        if batched is None:
+            doc_commented_code_file = self._reuse_copy(
+                state, file_path, prepared, prompts[0]
+            )
+        if doc_commented_code_file is None and self.output_format == "insertions":
+            doc_commented_code_file = self._document_by_insertions(
+                state["legacy_language"], pieces, prompts, file_path, batched
+            )
+        elif doc_commented_code_file is None and batched is not None:
+            doc_commented_code_file = "\n".join(
+                parse_code_string(content) for content in batched
+            )
+        if doc_commented_code_file is None and self.stream_output:
+            doc_commented_code_file = self._stream_code(
+                prompts, temporary_path, file_path
+            )
+        elif doc_commented_code_file is None:
+            documented_pieces = self.doc_chain.batch(
+                prompts, config={"max_concurrency": self.max_concurrency}
+            )
+            doc_commented_code_file = "\n".join(
+                parse_code_string(documented.content)
+                for documented in documented_pieces
+            )
 
         try:
-            with open(readme_file_path, "w") as f:
-                f.write(readme.content)
+            os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+            if doc_commented_code_file is not None:
+                with open(temporary_path, "w") as f:
+                    f.write(doc_commented_code_file)
+            os.replace(temporary_path, output_file_path)
+            metrics.inc(
+                "debtrazor_bytes_written_total",
+                (
+                    os.path.getsize(output_file_path)
+                    if doc_commented_code_file is None
+                    else len(doc_commented_code_file.encode("utf-8"))
+                ),
+                kind="doc",
+            )
+            if journal is not None:
+                journal.record(state["entry_path"], file_path, "doc")
+                # Indexed once its documentation exists, see _reuse_copy
+                if prepared.fingerprint is not None:
+                    journal.record(
+                        state["entry_path"],
+                        file_path,
+                        "fingerprint",
+                        prepared.fingerprint._asdict(),
+                    )
         except IOError:
-            print(f"Error writing README file at {readme_file_path}")
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            logger.info("Error writing file %s", output_file_path)
+        return doc_commented_code_file
 
-        # Filter the messages to exclude those that have been processed
-        state["messages"] = [
-            message
-            for message in state["messages"]
-            if message.additional_kwargs["directory_path"] != directory_path
-        ]
+    def _similarity_index(self, journal, entry_path: str) -> SimilarityIndex:
+        """
+        Return the index of the documented files of a repository.
 
-        # Add the README.md path and content to the messages
-        if len(state["directory_stack"]) > 0:
-            readme.additional_kwargs["directory_path"] = state["directory_stack"][-1][
-                "path"
-            ]
-            readme.additional_kwargs["file_name"] = os.path.basename(directory_path)
-        else:
-            readme.additional_kwargs["directory_path"] = state["entry_path"]
-            readme.additional_kwargs["file_name"] = "README.md"
+        The index follows the fingerprints recorded in the journal, so files
+        documented by other threads, shards or earlier runs are found too.
 
-        if len(state["items_to_process"]) == 0:
-            state["directory_structure"] += state["indent"] + "└── README.md\n"
-            state["indent"] = state["indent"][:-4]
-        else:
-            state["directory_structure"] += state["indent"] + "│   " + "└── README.md\n"
+        Args:
+            journal (Journal): The journal of the run.
+            entry_path (str): The repository root.
 
-        return {
-            "messages": [readme],
-            "directory_structure": state["directory_structure"],
-            "indent": state["indent"],
-        }
+        Returns:
+            SimilarityIndex: The index, up to date with the journal.
+        """
+        with self._similarity_lock:
+            index = self._similarity_indexes.setdefault(
+                (journal.path, entry_path), SimilarityIndex()
+            )
+            records, index.rowid = journal.since(entry_path, "fingerprint", index.rowid)
+        for path, value in records:
+            index.add(path, Fingerprint(value["digest"], tuple(value["minhash"])))
+        return index
+
+    def _find_twin(
+        self, state: DocAgentState, file_path: str, prepared: PreparedFile
+    ) -> tuple[str, float, Fingerprint] | None:
+        """
+        Find the documented file a file is an exact or near copy of.
 
-    @staticmethod
-    async def stream_events(events, log_queue):
+        Args:
+            state (DocAgentState): The current state of the agent.
+            file_path (str): The file path relative to the entry path.
+            prepared (PreparedFile): The prepared file.
+
+        Returns:
+            tuple[str, float, Fingerprint] | None: The path, similarity and
+            fingerprint of the twin, or None if there is none.
         """
-        Stream events and add them to the log queue.
+        journal = get_journal(state.get("journal_path"))
+        if not self.reuse_duplicates or journal is None:
+            return None
+        if prepared.fingerprint is None:
+            return None
+        threshold = self.near_duplicate_threshold
+        if len(prepared.pieces) > 1 or state["legacy_language"] not in COMMENT_SYNTAX:
+            threshold = None
+        index = self._similarity_index(journal, state["entry_path"])
+        found = index.find(prepared.fingerprint, threshold, exclude=file_path)
+        if found is None:
+            return None
+        return found[0], found[1], index.fingerprints[found[0]]
+
+    def _reuse_copy(
+        self,
+        state: DocAgentState,
+        file_path: str,
+        prepared: PreparedFile,
+        prompt: dict,
+    ) -> str | None:
+        """
+        Document a file from the documentation of an already documented copy.
+
+        Exact copies take the documented code as is (and the summary, see
+        ``_summarize_code``) without calling the model. Near copies get the
+        comments of the lines they share with their twin, and the model only
+        lists comments for the changed lines, so its output scales with the
+        changes. Only files documented in one piece are matched with near
+        copies.
 
         Args:
-            events: The events to be streamed.
-            log_queue: The log queue to add the events to.
+            state (DocAgentState): The current state of the agent.
+            file_path (str): The file path relative to the entry path.
+            prepared (PreparedFile): The prepared file.
+            prompt (dict): The doc prompt variables of the first piece.
+
+        Returns:
+            str | None: The documented code, or None if the file is not a copy
+            of a documented file or its twin cannot be used.
         """
-        for event in events:
-            # TODO: fix the logging here for showing information on the frontend
-            if "document_file" in event.keys():
-                await add_to_log_queue(
-                    "\n".join(
-                        [
-                            f'{event["document_file"]["messages"][-1].additional_kwargs["file_name"]}:',
-                            f'{event["document_file"]["messages"][-1].content}',
-                        ]
-                    ),
-                    log_queue,
-                )
-            elif "readme_creator" in event.keys():
-                await add_to_log_queue(
-                    f'{event["readme_creator"]["messages"][-1].content}', log_queue
+        journal = get_journal(state.get("journal_path"))
+        found = self._find_twin(state, file_path, prepared)
+        if found is None:
+            return None
+        twin, score, twin_fingerprint = found
+        try:
+            with open(os.path.join(state["output_path"], twin), "r") as f:
+                documented = f.read()
+        except OSError:
+            return None
+
+        if twin_fingerprint.digest == prepared.fingerprint.digest:
+            logger.info(
+                "%s is a copy of %s, reusing its documentation", file_path, twin
+            )
+            metrics.inc("debtrazor_duplicates_total", kind="exact")
+            metrics.inc("debtrazor_cache_hits_total", cache="duplicate")
+            journal.record(state["entry_path"], file_path, "copy_of", twin)
+            return documented
+
+        try:
+            twin_code = read_source(os.path.join(state["entry_path"], twin))
+        except OSError:
+            return None
+        if digest(twin_code) != twin_fingerprint.digest:
+            return None  # Changed since it was documented
+        code = prepared.pieces[0]
+        insertions, changed = transfer_comments(twin_code, documented, code)
+        logger.info(
+            "%s is a near copy of %s (similarity %.2f), %d changed lines",
+            file_path,
+            twin,
+            score,
+            len(changed),
+        )
+        if changed:
+            result = self.update_chain.invoke(
+                {
+                    **prompt,
+                    "code_file": number_lines(code),
+                    "changed_lines": line_ranges(changed),
+                }
+            )
+            try:
+                insertions += parse_insertions(result.content)
+            except ValueError as e:
+                logger.info("Unusable insertions for %s: %s", file_path, e)
+                metrics.inc("debtrazor_insertions_fallback_total", reason="invalid")
+                return None
+        patched = apply_insertions(code, insertions, state["legacy_language"])
+        if patched is None:
+            metrics.inc("debtrazor_insertions_fallback_total", reason="unverified")
+            return None
+        metrics.inc("debtrazor_duplicates_total", kind="near")
+        return patched[0]
+
+    def _document_by_insertions(
+        self,
+        language: str,
+        pieces: list[str],
+        prompts: list[dict],
+        file_path: str,
+        batched: list[str] | None = None,
+    ) -> str | None:
+        """
+        Document a file with the comments the model lists, see ``patch``.
+
+        Only the comments are generated, so the output tokens scale with the
+        documentation instead of the file. Insertions that would change the
+        code are dropped.
+
+        Args:
+            language (str): The legacy language.
+            pieces (list[str]): The code sent to the model, in pieces.
+            prompts (list[dict]): The doc prompt variables of each piece.
+            file_path (str): The file path relative to the entry path, for
+                logging.
+            batched (list[str] | None): The insertions listed for each piece,
+                already generated by a batch.
+
+        Returns:
+            str | None: The documented code, or None if the model output or
+            the code cannot be used, in which case the whole documented file
+            is generated instead.
+        """
+        if not any(piece.strip() for piece in pieces):
+            return "".join(pieces)  # Nothing to document
+
+        if batched is None:
+            batched = [
+                result.content
+                for result in self.insertions_chain.batch(
+                    self._numbered_prompts(pieces, prompts),
+                    config={"max_concurrency": self.max_concurrency},
                 )
+            ]
+        try:
+            insertions = [
+                insertion
+                for content in batched
+                for insertion in parse_insertions(content)
+            ]
+        except ValueError as e:
+            logger.info("Unusable insertions for %s: %s", file_path, e)
+            metrics.inc("debtrazor_insertions_fallback_total", reason="invalid")
+            return None
+
+        patched = apply_insertions("".join(pieces), insertions, language)
+        if patched is None:
+            logger.info("Insertions cannot be verified for %s", file_path)
+            metrics.inc("debtrazor_insertions_fallback_total", reason="unverified")
+            return None
+        code, rejected = patched
+        if rejected:
+            logger.info(
+                "Dropped %d of %d insertions for %s",
+                rejected,
+                len(insertions),
+                file_path,
+            )
+        metrics.inc(
+            "debtrazor_insertions_total", len(insertions) - rejected, result="applied"
+        )
+        metrics.inc("debtrazor_insertions_total", rejected, result="rejected")
+        return code
+
+    @staticmethod
+    def _numbered_prompts(pieces: list[str], prompts: list[dict]) -> list[dict]:
+        """
+        Number the lines of the pieces of a file for the insertions prompt.
+
+        Args:
+            pieces (list[str]): The code sent to the model, in pieces.
+            prompts (list[dict]): The doc prompt variables of each piece.
+
+        Returns:
+            list[dict]: The prompt variables, with the lines of each piece
+            numbered from its position in the file.
+        """
+        first_line = 1
+        numbered = []
+        for piece, prompt in zip(pieces, prompts):
+            numbered.append({**prompt, "code_file": number_lines(piece, first_line)})
+            first_line += piece.count("\n")
+        return numbered
+
+    def _stream_code(
+        self, prompts: list[dict], temporary_path: str, file_path: str
+    ) -> str | None:
+        """
+        Stream the documented code of a file to disk as the model writes it.
+
+        The code fence is stripped on the fly, and the lines written so far
+        are reported to the job's log queue at most once per
+        ``PROGRESS_INTERVAL_SECONDS``. The pieces of a chunked file are
+        generated in order, and no more than a chunk of the model output is
+        held in memory.
+
+        Args:
+            prompts (list[dict]): The doc prompt variables of each piece.
+            temporary_path (str): The file the code is written to; the caller
+                moves it in place once it is complete.
+            file_path (str): The file path relative to the entry path, for
+                the progress reports.
+
+        Returns:
+            str | None: None once the code is on disk; the documented code if
+            the file could not be written.
+        """
+        parts = []
+        lines = 0
+        reported = None
+
+        def write(text):
+            nonlocal lines, reported
+            if not text:
+                return
+            if f is None:
+                parts.append(text)
+            else:
+                f.write(text)
+            lines += text.count("\n")
+            now = time.monotonic()
+            if reported is None or now - reported >= PROGRESS_INTERVAL_SECONDS:
+                reported = now
+                report_progress(f"Documenting {file_path}: {lines} lines")
+
+        try:
+            os.makedirs(os.path.dirname(temporary_path), exist_ok=True)
+            f = open(temporary_path, "w")
+        except IOError:
+            # Still documented, the caller reports the missing file
+            logger.info("Error writing file %s", temporary_path)
+            f = None
+        try:
+            for index, prompt in enumerate(prompts):
+                if index:
+                    write("\n")
+                stream = CodeStringStream()
+                for chunk in self.doc_chain.stream(prompt):
+                    write(stream.feed(chunk.content))
+                write(stream.close())
+        except BaseException:
+            if f is not None:
+                f.close()
+                os.remove(temporary_path)
+            raise
+        if f is None:
+            return "".join(parts)
+        f.close()
+        return None
+
+    def _summarize_code(
+        self,
+        state: DocAgentState,
+        file_path: str,
+        doc_commented_code_file: str | None,
+        batched: list[str] | None = None,
+    ) -> str:
+        """
+        Return the summary of a documented file, calling the model only once.
+
+        The pieces are summarized ``max_concurrency`` at a time, so a streamed
+        file is never read whole.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            file_path (str): The file path relative to the entry path.
+            doc_commented_code_file (str | None): The documented code, None to
+                read it from the output file.
+            batched (list[str] | None): The summary of each piece, already
+                generated by a batch.
+
+        Returns:
+            str: The summary.
+        """
+        journal = get_journal(state.get("journal_path"))
+        if journal is not None and journal.done(state["entry_path"], file_path, "summary"):
+            metrics.inc("debtrazor_cache_hits_total", cache="journal")
+            return journal.get(state["entry_path"], file_path, "summary")
+
+        summary = self._copy_summary(state, file_path)
+        if summary is not None:
+            journal.record(state["entry_path"], file_path, "summary", summary)
+            return summary
+
+        if batched is None:
+            batched = []
+            prompts = self._summary_prompts(state, file_path, doc_commented_code_file)
+            while group := list(itertools.islice(prompts, self.max_concurrency)):
+                batched.extend(
+                    message.content
+                    for message in self.summary_chain.batch(
+                        group, config={"max_concurrency": self.max_concurrency}
+                    )
+                )
+        summary = "\n\n".join(batched)
+        if journal is not None:
+            journal.record(state["entry_path"], file_path, "summary", summary)
+        return summary
+
+    def _summary_prompts(
+        self,
+        state: DocAgentState,
+        file_path: str,
+        doc_commented_code_file: str | None,
+    ) -> Iterator[dict]:
+        """
+        Build the summary prompt variables of a documented file.
+
+        Documented code over the token limit is summarized piece by piece.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            file_path (str): The file path relative to the entry path.
+            doc_commented_code_file (str | None): The documented code, None to
+                read it lazily from the output file.
+
+        Yields:
+            dict: The variables of each piece.
+        """
+        if doc_commented_code_file is None:
+            pieces = split_file_by_tokens(
+                os.path.join(state["output_path"], file_path),
+                self.file_limits.max_tokens,
+                self.model_name,
+            )
+        else:
+            pieces = split_by_tokens(
+                doc_commented_code_file, self.file_limits.max_tokens, self.model_name
+            )
+        if self.file_limits.oversize == "truncate":
+            pieces = itertools.islice(pieces, 1)
+        for piece in pieces:
+            yield {
+                "language": state["legacy_language"],
+                "framework": state["legacy_framework"],
+                "code_file": piece,
+            }
+
+    def _copy_summary(self, state: DocAgentState, file_path: str) -> str | None:
+        """
+        Return the summary of the twin a file was copied from, if any.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            file_path (str): The file path relative to the entry path.
+
+        Returns:
+            str | None: The summary of the twin, or None if the file was not
+            documented as an exact copy or the twin has no summary yet.
+        """
+        journal = get_journal(state.get("journal_path"))
+        if not self.reuse_duplicates or journal is None:
+            return None
+        twin = journal.get(state["entry_path"], file_path, "copy_of")
+        if twin is None or not journal.done(state["entry_path"], twin, "summary"):
+            return None
+        # Still copies: the file may have been documented again since
+        fingerprints = self._similarity_index(
+            journal, state["entry_path"]
+        ).fingerprints
+        if (
+            file_path not in fingerprints
+            or twin not in fingerprints
+            or fingerprints[file_path].digest != fingerprints[twin].digest
+        ):
+            return None
+        metrics.inc("debtrazor_cache_hits_total", cache="duplicate")
+        return journal.get(state["entry_path"], twin, "summary")
+
+    def _find_dependencies(
+        self, state: DocAgentState, file_path: str, code_file_path: str
+    ) -> dict | None:
+        """
+        Return the dependency tree of a file, computed only once.
+
+        The dependency tool of the language is run directly, usually ahead of
+        time by the prefetch; the model picks and calls a tool only for
+        languages without one.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            file_path (str): The file path relative to the entry path.
+            code_file_path (str): The path of the source file.
+
+        Returns:
+            dict | None: The ``root`` and ``dependencies`` of the file, or None
+            if no dependency tree could be generated.
+        """
+        journal = get_journal(state.get("journal_path"))
+        if journal is not None and journal.done(
+            state["entry_path"], file_path, "dependencies"
+        ):
+            metrics.inc("debtrazor_cache_hits_total", cache="journal")
+            return journal.get(state["entry_path"], file_path, "dependencies")
+
+        language = state["legacy_language"]
+        result = None
+        if self._dependency_tool(language) is not None:
+            key = (code_file_path, language, state["entry_path"])
+            dependencies = self._fresh(
+                self.prepared_dependencies, key, code_file_path
+            ).dependencies
+            # Only used once, unlike the prepared file
+            self.prepared_dependencies.invalidate(key)
+            if dependencies is not None:
+                result = {
+                    "root": os.path.basename(code_file_path),
+                    "dependencies": dependencies,
+                }
+        else:
+            dependency_tree = self.dependency_tree_chain.invoke(
+                {
+                    "language": language,
+                    "framework": state["legacy_framework"],
+                    "code_file_path": code_file_path,
+                }
+            )
+            if hasattr(dependency_tree, "dependencies"):
+                result = {
+                    "root": dependency_tree.root,
+                    "dependencies": dependency_tree.dependencies or [],
+                }
+        if journal is not None:
+            journal.record(state["entry_path"], file_path, "dependencies", result)
+        return result
+
+    def readme_creator_node(self, state: DocAgentState):
+        """
+        Process the README creator node in the state graph.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+
+        Returns:
+            dict: The updated state.
+        """
+        logger.info("on node: readme_creator_node")
+
+        # Ensure items_to_process is initialized to an empty list if it's None
+        if state["items_to_process"] is None:
+            state["items_to_process"] = []
+
+        # Pop the last directory from the stack
+        directory_path = state["directory_stack"].pop(-1)["path"]
+
+        # write this README.md in the output_path and add
+        # the contents of README.md to the messages in state
+        # with the path in the last position in the directory_stack
+        # in state
+        relative_path = get_relative_path(directory_path, state["entry_path"])
+        output_directory_path = os.path.join(state["output_path"], relative_path)
+
+        readme_file_path = os.path.join(output_directory_path, "README.md")
+
+        journal = get_journal(state.get("journal_path"))
+        if journal is not None and journal.done(
+            state["entry_path"], relative_path, "readme"
+        ):
+            # Written by an interrupted run of this node
+            metrics.inc("debtrazor_cache_hits_total", cache="journal")
+            readme = AIMessage(
+                content=journal.get(state["entry_path"], relative_path, "readme")
+            )
+        else:
+            # Generate the summaries and filter out the messages simultaneously
+            file_or_module_summaries = [
+                message.additional_kwargs["file_name"]
+                + ":"
+                + message.content
+                + "\n\n"
+                for message in state["messages"]
+                if message.additional_kwargs["directory_path"] == directory_path
+            ]
+            readme = self._generate_readme(
+                state, relative_path, directory_path, file_or_module_summaries
+            )
+
+        try:
+            with open(readme_file_path, "w") as f:
+                f.write(readme.content)
+            metrics.inc(
+                "debtrazor_bytes_written_total",
+                len(readme.content.encode("utf-8")),
+                kind="readme",
+            )
+        except IOError:
+            print(f"Error writing README file at {readme_file_path}")
+
+        # Filter the messages to exclude those that have been processed
+        state["messages"] = [
+            message
+            for message in state["messages"]
+            if message.additional_kwargs["directory_path"] != directory_path
+        ]
+
+        # Add the README.md path and content to the messages
+        if len(state["directory_stack"]) > 0:
+            readme.additional_kwargs["directory_path"] = state["directory_stack"][-1][
+                "path"
+            ]
+            readme.additional_kwargs["file_name"] = os.path.basename(directory_path)
+        else:
+            readme.additional_kwargs["directory_path"] = state["entry_path"]
+            readme.additional_kwargs["file_name"] = "README.md"
+
+        if len(state["items_to_process"]) == 0:
+            state["directory_structure"] += state["indent"] + "└── README.md\n"
+            state["indent"] = state["indent"][:-4]
+        else:
+            state["directory_structure"] += state["indent"] + "│   " + "└── README.md\n"
+
+        return {
+            "messages": [readme],
+            "directory_structure": state["directory_structure"],
+            "indent": state["indent"],
+            # The root README is the last step of the final pass
+            "finalized": len(state["directory_stack"]) == 0,
+        }
+
+    def _generate_readme(
+        self,
+        state: DocAgentState,
+        relative_path: str,
+        directory_path: str,
+        file_or_module_summaries: list[str],
+    ) -> AIMessage:
+        """
+        Generate and journal the README of a directory from its summaries.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            relative_path (str): The directory path relative to the entry path.
+            directory_path (str): The path of the directory.
+            file_or_module_summaries (list[str]): ``<name>:<summary>`` of each
+                file and sub-directory.
+
+        Returns:
+            AIMessage: The README.
+        """
+        # Named after the directory itself at the root, e.g. for shard roots
+        module_name = os.path.basename(relative_path) or os.path.basename(
+            os.path.normpath(directory_path)
+        )
+        file_or_module_summaries = self.reduce_summaries(
+            file_or_module_summaries, module_name
+        )
+
+        readme = self.readme_chain.invoke(
+            {
+                "file_module_summaries": file_or_module_summaries,
+                "module_name": module_name,
+            }
+        )
+        journal = get_journal(state.get("journal_path"))
+        if journal is not None:
+            journal.record(state["entry_path"], relative_path, "readme", readme.content)
+        return readme
+
+    def schedule_node(self, state: DocAgentState):
+        """
+        Document every file of the repository in dependency order.
+
+        The internal dependencies of the files are extracted with the
+        dependency tools directly, and the files are documented and
+        summarized level by level of the dependency graph, up to
+        ``max_concurrency`` files at once. Each file's prompt includes the
+        summaries of the files it depends on. The directory walk that follows
+        reuses the results instead of calling the model again.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+
+        Returns:
+            dict: The updated state.
+        """
+        logger.info("on node: schedule_node")
+        file_summaries = dict(state.get("file_summaries") or {})
+        dependencies = self._scheduled_files(state, file_summaries)
+        levels = plan_levels(dependencies)
+        logger.info(
+            "Scheduling %d files in %d dependency levels",
+            len(dependencies),
+            len(levels),
+        )
+        # Run in copies of the node's context, which carries the progress
+        # reporting of the job
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            for level in levels:
+                for batch in self._copies_last(state["entry_path"], level):
+                    summaries = list(
+                        pool.map(
+                            lambda relative_path: context.copy().run(
+                                self._document_scheduled_file,
+                                state,
+                                relative_path,
+                                dependencies,
+                                file_summaries,
+                            ),
+                            batch,
+                        )
+                    )
+                    for relative_path, summary in zip(batch, summaries):
+                        file_summaries[relative_path] = {
+                            "summary": summary,
+                            "dependencies": dependencies[relative_path],
+                        }
+
+        return {"file_summaries": file_summaries}
+
+    def _scheduled_files(
+        self, state: DocAgentState, file_summaries: dict
+    ) -> dict[str, list | None]:
+        """
+        List the files left to document by a schedule, with their dependencies.
+
+        The internal dependencies are extracted with the dependency tool of
+        the language directly.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            file_summaries (dict): Results of the files documented so far.
+
+        Returns:
+            dict[str, list | None]: The reported dependencies of each file
+            path relative to the entry path, None for languages without a
+            dependency tool.
+        """
+        files = [
+            relative_path
+            for relative_path in list_source_files(
+                state["entry_path"],
+                state["ignore_list"],
+                supported_langs[state["legacy_language"]],
+            )
+            if relative_path not in file_summaries
+            # Recorded by the directory walk that follows
+            and not self._skip_file(
+                os.path.join(state["entry_path"], relative_path), record=False
+            )
+        ]
+
+        tool = self._dependency_tool(state["legacy_language"])
+        if tool is not None:
+            return extract_dependencies(
+                state["entry_path"], files, tool, self.max_concurrency
+            )
+        return {relative_path: None for relative_path in files}
+
+    def _copies_last(self, entry_path: str, level: list[str]) -> list[list[str]]:
+        """
+        Split a level of the schedule so exact copies come after their twin.
+
+        The files of a level are documented concurrently, so a copy would not
+        find its twin documented yet.
+
+        Args:
+            entry_path (str): The repository root.
+            level (list[str]): The file paths of the level.
+
+        Returns:
+            list[list[str]]: The batches documented one after the other.
+        """
+        if not self.reuse_duplicates:
+            return [level]
+        seen = set()
+        first, copies = [], []
+        for relative_path in level:
+            try:
+                key = digest(read_source(os.path.join(entry_path, relative_path)))
+            except OSError:
+                key = relative_path
+            (copies if key in seen else first).append(relative_path)
+            seen.add(key)
+        return [first, copies] if copies else [first]
+
+    def _document_scheduled_file(
+        self, state: DocAgentState, relative_path, dependencies, file_summaries
+    ) -> str:
+        """
+        Document and summarize one file of the schedule.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            relative_path (str): The file path relative to the entry path.
+            dependencies (dict): Reported dependencies of every scheduled file.
+            file_summaries (dict): Results of the files documented so far.
+
+        Returns:
+            str: The summary of the documented file.
+        """
+        doc_commented_code_file = self._document_code(
+            state,
+            relative_path,
+            os.path.join(state["entry_path"], relative_path),
+            dependency_summaries=self._dependency_summaries(
+                relative_path, dependencies, file_summaries
+            ),
+        )
+        return self._summarize_code(state, relative_path, doc_commented_code_file)
+
+    @staticmethod
+    def _dependency_summaries(relative_path, dependencies, file_summaries) -> str:
+        """
+        Build the prompt section with the summaries of a file's dependencies.
+
+        Args:
+            relative_path (str): The file path relative to the entry path.
+            dependencies (dict): Reported dependencies of every scheduled file.
+            file_summaries (dict): Results of the files documented so far.
+
+        Returns:
+            str: The ``dependency_summaries`` prompt variable; empty if no
+            dependency is documented yet.
+        """
+        dependency_summaries = [
+            f"{dependency}: {file_summaries[dependency]['summary']}"
+            for dependency in resolve_dependencies(
+                relative_path, dependencies[relative_path]
+            )
+            if dependency in file_summaries
+        ]
+        if not dependency_summaries:
+            return ""
+        return DEPENDENCY_SUMMARIES_PROMPT.format(
+            summaries="\n\n".join(dependency_summaries)
+        )
+
+    def batch_node(self, state: DocAgentState):
+        """
+        Document every file of the repository through a batch endpoint.
+
+        The files are taken in dependency order, like in ``schedule_node``,
+        in waves of ``batch_size`` files. The doc prompts of a wave are
+        submitted as one batch and, once the documented code is written, its
+        summary prompts as another; each prompt includes the summaries of the
+        file's dependencies documented in earlier waves. The batch of each
+        file is journaled, so a resumed run waits for the pending batches
+        instead of submitting the prompts again, and the requests that failed
+        in a batch are made interactively. The directory walk that follows
+        reuses the results and writes the READMEs.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+
+        Returns:
+            dict: The updated state.
+        """
+        logger.info("on node: batch_node")
+        file_summaries = dict(state.get("file_summaries") or {})
+        dependencies = self._scheduled_files(state, file_summaries)
+        order = [
+            relative_path
+            for level in plan_levels(dependencies)
+            for relative_path in level
+        ]
+        # Kept next to the journal and checkpoints, outside the documentation
+        run_directory = os.path.dirname(
+            state.get("journal_path") or state["output_path"]
+        )
+        backend = get_batch_backend(
+            self.batch_backend, self.model, os.path.join(run_directory, "batches")
+        )
+        waves = [
+            order[start : start + self.batch_size]
+            for start in range(0, len(order), self.batch_size)
+        ]
+        logger.info("Batching %d files in %d waves", len(order), len(waves))
+        journal = get_journal(state.get("journal_path"))
+        for wave in waves:
+            # Exact copies are documented from their twin, after it
+            batches = self._copies_last(state["entry_path"], wave)
+            variables = {
+                relative_path: {
+                    "dependency_summaries": self._dependency_summaries(
+                        relative_path, dependencies, file_summaries
+                    )
+                }
+                for relative_path in wave
+            }
+            documented = self._batch_documents(state, backend, batches, variables)
+            summaries = self._batch_summaries(state, backend, batches, documented)
+            for relative_path in wave:
+                file_summaries[relative_path] = {
+                    "summary": summaries[relative_path],
+                    "dependencies": dependencies[relative_path],
+                }
+                # Consumed, a later run submits the file's prompts again
+                for step in ("doc_batch", "summary_batch"):
+                    if journal is not None and journal.get(
+                        state["entry_path"], relative_path, step
+                    ):
+                        journal.record(state["entry_path"], relative_path, step)
+
+        return {"file_summaries": file_summaries}
+
+    def _batch_documents(
+        self,
+        state: DocAgentState,
+        backend: BatchBackend,
+        batches: list[list[str]],
+        variables: dict[str, dict],
+    ) -> dict[str, str | None]:
+        """
+        Document a wave of files with one batch of doc prompts.
+
+        Files already documented, and copies of documented files (see
+        ``_reuse_copy``), are not submitted.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            backend (BatchBackend): Where the batch is submitted.
+            batches (list[list[str]]): The file paths of the wave, from
+                ``_copies_last``.
+            variables (dict[str, dict]): Extra doc prompt variables per file.
+
+        Returns:
+            dict[str, str | None]: The documented code of each file, see
+            ``_document_code``.
+        """
+        requests = {}
+        for relative_path in batches[0]:
+            source_path = os.path.join(state["entry_path"], relative_path)
+            if os.path.exists(os.path.join(state["output_path"], relative_path)):
+                continue
+            prepared, pieces, prompts = self._doc_prompts(
+                state, relative_path, source_path, **variables[relative_path]
+            )
+            if self._find_twin(state, relative_path, prepared) is not None:
+                continue
+            template = PROMPT
+            if self.output_format == "insertions":
+                if not any(piece.strip() for piece in pieces):
+                    continue  # Nothing to document
+                template = PROMPT_INSERTIONS
+                prompts = self._numbered_prompts(pieces, prompts)
+            requests[relative_path] = [
+                to_batch_messages(template.format_messages(**prompt))
+                for prompt in prompts
+            ]
+        outputs = self._run_batch(state, backend, "doc", requests)
+
+        return {
+            relative_path: self._document_code(
+                state,
+                relative_path,
+                os.path.join(state["entry_path"], relative_path),
+                batched=outputs.get(relative_path),
+                **variables[relative_path],
+            )
+            for batch in batches
+            for relative_path in batch
+        }
+
+    def _batch_summaries(
+        self,
+        state: DocAgentState,
+        backend: BatchBackend,
+        batches: list[list[str]],
+        documented: dict[str, str | None],
+    ) -> dict[str, str]:
+        """
+        Summarize a wave of documented files with one batch of prompts.
+
+        Files already summarized, and exact copies, which take the summary of
+        their twin, are not submitted.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            backend (BatchBackend): Where the batch is submitted.
+            batches (list[list[str]]): The file paths of the wave, from
+                ``_copies_last``.
+            documented (dict[str, str | None]): The documented code of each
+                file, see ``_document_code``.
+
+        Returns:
+            dict[str, str]: The summary of each file.
+        """
+        journal = get_journal(state.get("journal_path"))
+        requests = {}
+        for relative_path in batches[0]:
+            if journal is not None and (
+                journal.done(state["entry_path"], relative_path, "summary")
+                or journal.get(state["entry_path"], relative_path, "copy_of")
+            ):
+                continue
+            requests[relative_path] = [
+                to_batch_messages(PROMPT_SUMMARY.format_messages(**prompt))
+                for prompt in self._summary_prompts(
+                    state, relative_path, documented[relative_path]
+                )
+            ]
+        outputs = self._run_batch(state, backend, "summary", requests)
+
+        return {
+            relative_path: self._summarize_code(
+                state,
+                relative_path,
+                documented[relative_path],
+                batched=outputs.get(relative_path),
+            )
+            for batch in batches
+            for relative_path in batch
+        }
+
+    def _run_batch(
+        self,
+        state: DocAgentState,
+        backend: BatchBackend,
+        kind: str,
+        requests: dict[str, list[list[dict]]],
+    ) -> dict[str, list[str]]:
+        """
+        Get the model outputs of the prompts of many files through a batch.
+
+        Files whose prompts went into a batch that is still pending, e.g.
+        before a crash, wait for it; the others are submitted in a new batch.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            backend (BatchBackend): Where the batch is submitted.
+            kind (str): "doc" or "summary".
+            requests (dict[str, list[list[dict]]]): The messages of the
+                prompt of each piece, per file path.
+
+        Returns:
+            dict[str, list[str]]: The output for each piece, per file path;
+            files whose requests failed are left out.
+        """
+        journal = get_journal(state.get("journal_path"))
+        step = f"{kind}_batch"
+        pending = {}
+        new = []
+        for relative_path in requests:
+            batch_id = (
+                journal.get(state["entry_path"], relative_path, step)
+                if journal is not None
+                else None
+            )
+            if batch_id is None:
+                new.append(relative_path)
+            else:
+                pending.setdefault(batch_id, []).append(relative_path)
+        if new:
+            batch_id = backend.submit(
+                [
+                    BatchRequest(f"{kind}:{index}:{relative_path}", messages)
+                    for relative_path in new
+                    for index, messages in enumerate(requests[relative_path])
+                ]
+            )
+            logger.info("Submitted %s batch %s for %d files", kind, batch_id, len(new))
+            metrics.inc(
+                "debtrazor_batch_requests_total",
+                sum(len(requests[relative_path]) for relative_path in new),
+                kind=kind,
+                result="submitted",
+            )
+            if journal is not None:
+                for relative_path in new:
+                    journal.record(state["entry_path"], relative_path, step, batch_id)
+            pending[batch_id] = new
+
+        if kind == "summary":
+            chain = "summary_chain"
+        else:
+            chain = (
+                "insertions_chain"
+                if self.output_format == "insertions"
+                else "doc_chain"
+            )
+        outputs = {}
+        for batch_id, paths in pending.items():
+            results = self._await_batch(backend, batch_id, kind)
+            for relative_path in paths:
+                pieces = [
+                    results.get(f"{kind}:{index}:{relative_path}")
+                    for index in range(len(requests[relative_path]))
+                ]
+                failed = [result for result in pieces if result is None or result.error]
+                if failed:
+                    logger.info(
+                        "Batch %s has no %s for %s (%s), calling the model instead",
+                        batch_id,
+                        kind,
+                        relative_path,
+                        failed[0].error if failed[0] is not None else "missing",
+                    )
+                    metrics.inc(
+                        "debtrazor_batch_requests_total",
+                        len(pieces),
+                        kind=kind,
+                        result="failed",
+                    )
+                    continue
+                metrics.inc(
+                    "debtrazor_batch_requests_total",
+                    len(pieces),
+                    kind=kind,
+                    result="succeeded",
+                )
+                for result in pieces:
+                    metrics.inc(
+                        "debtrazor_llm_prompt_tokens_total",
+                        result.usage.get("input_tokens", 0),
+                        chain=chain,
+                    )
+                    metrics.inc(
+                        "debtrazor_llm_completion_tokens_total",
+                        result.usage.get("output_tokens", 0),
+                        chain=chain,
+                    )
+                    metrics.inc(
+                        "debtrazor_llm_cached_prompt_tokens_total",
+                        result.usage.get("cached_tokens", 0),
+                        chain=chain,
+                    )
+                outputs[relative_path] = [result.content for result in pieces]
+        return outputs
+
+    def _await_batch(
+        self, backend: BatchBackend, batch_id: str, kind: str
+    ) -> dict[str, BatchResult]:
+        """
+        Wait for a batch to complete and fetch its results.
+
+        Args:
+            backend (BatchBackend): The backend the batch was submitted to.
+            batch_id (str): The id of the batch.
+            kind (str): "doc" or "summary", for the metrics and progress.
+
+        Returns:
+            dict[str, BatchResult]: The results by custom id; empty if the
+            batch failed.
+        """
+        with metrics.time("debtrazor_batch_wait_seconds", kind=kind):
+            while True:
+                status = backend.status(batch_id)
+                if status != "pending":
+                    break
+                report_progress(f"Waiting for the {kind} batch {batch_id}")
+                time.sleep(self.batch_poll_seconds)
+        if status != "completed":
+            logger.info("The %s batch %s failed", kind, batch_id)
+            return {}
+        return backend.results(batch_id)
+
+    def merge_subtree_node(self, state: DocAgentState):
+        """
+        Merge a subtree that was documented separately into its parent.
+
+        The subtree's README.md becomes a message of the parent directory,
+        like the README of a walked sub-directory, and its directory structure
+        is nested under the current indentation.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+
+        Returns:
+            dict: The updated state.
+        """
+        logger.info("on node: merge_subtree_node")
+        directory_path = state["directory_stack"][-1]["path"]
+        subtree = state["completed_subtrees"][
+            get_relative_path(
+                os.path.join(directory_path, state["current_path"]),
+                state["entry_path"],
+            )
+        ]
+
+        readme = AIMessage(
+            content=subtree["readme"],
+            additional_kwargs={
+                "directory_path": directory_path,
+                "file_name": state["current_path"],
+            },
+        )
+
+        directory_structure = (
+            state["directory_structure"]
+            + state["indent"]
+            + "├── "
+            + state["current_path"]
+            + "/\n"
+        )
+        for line in subtree["directory_structure"].splitlines():
+            directory_structure += state["indent"] + "│   " + line + "\n"
+
+        # Clear the current path so that start_node does not descend into it
+        return {
+            "messages": [readme],
+            "directory_structure": directory_structure,
+            "current_path": None,
+        }
+
+    def summary_records(self, state: DocAgentState) -> list[dict]:
+        """
+        Collect the summaries and READMEs of a documented repository, for the
+        summary store.
+
+        Args:
+            state (DocAgentState): The final state of a documentation run.
+
+        Returns:
+            list[dict]: One record per documented file and directory, see
+            ``SummaryStore``.
+        """
+        journal = get_journal(state.get("journal_path"))
+        if journal is None:
+            return []
+        entry_path = state["entry_path"]
+        language = state["legacy_language"]
+        dependencies_per_file = state.get("dependencies_per_file") or {}
+        fingerprints = dict(journal.since(entry_path, "fingerprint")[0])
+        records = []
+        for relative_path, summary in journal.since(entry_path, "summary")[0]:
+            fingerprint = fingerprints.get(relative_path)
+            if fingerprint is not None:
+                code_digest = fingerprint["digest"]
+            else:
+                try:
+                    code_digest = digest(
+                        read_source(os.path.join(entry_path, relative_path))
+                    )
+                except OSError:
+                    code_digest = None
+            records.append(
+                {
+                    "path": relative_path,
+                    "kind": "file",
+                    "language": language,
+                    "digest": code_digest,
+                    "summary": summary,
+                    "dependencies": dependencies_per_file.get(relative_path),
+                }
+            )
+        for relative_path, readme in journal.since(entry_path, "readme")[0]:
+            records.append(
+                {
+                    "path": relative_path,
+                    "kind": "directory",
+                    "language": language,
+                    "digest": None,
+                    "summary": readme,
+                    "dependencies": None,
+                }
+            )
+        return records
+
+    def stale_files(self, state: DocAgentState) -> list[str]:
+        """
+        List the files whose documentation is out of date.
+
+        A file is stale if its output is missing or older than its source, or
+        if its source was deleted; used to catch up with the changes made
+        while the repository was not watched.
+
+        Args:
+            state (DocAgentState): The final state of a documentation run.
+
+        Returns:
+            list[str]: The file paths relative to the entry path, sorted.
+        """
+        extension = supported_langs[state["legacy_language"]]
+        stale = set()
+        for relative_path in list_source_files(
+            state["entry_path"], state["ignore_list"], extension
+        ):
+            source_path = os.path.join(state["entry_path"], relative_path)
+            output_file_path = os.path.join(state["output_path"], relative_path)
+            try:
+                if os.path.getmtime(source_path) <= os.path.getmtime(output_file_path):
+                    continue
+            except OSError:
+                # Never documented, unless it is skipped
+                if self._skip_file(source_path, record=False):
+                    continue
+            stale.add(relative_path)
+        for relative_path in list_source_files(
+            state["output_path"], state["ignore_list"], extension
+        ):
+            if not os.path.exists(os.path.join(state["entry_path"], relative_path)):
+                stale.add(relative_path)
+        return sorted(stale)
+
+    def refresh(self, state: DocAgentState, changed_paths) -> dict:
+        """
+        Bring the documentation of a documented repository up to date with
+        changes to some of its paths.
+
+        Changed files are documented again, unless their code is the same as
+        when they were documented, and deleted files and directories lose
+        their documentation. The READMEs of their directories, up to the
+        root, are then regenerated deepest first from the journaled summaries
+        of the other files, so only the changed files and the READMEs call
+        the model.
+
+        Args:
+            state (DocAgentState): The final state of a documentation run.
+            changed_paths (Iterable[str]): The created, modified or deleted
+                paths, relative to the entry path.
+
+        Returns:
+            dict: The updated ``dependencies_per_file``.
+        """
+        journal = get_journal(state.get("journal_path"))
+        entry_path = state["entry_path"]
+        extension = supported_langs[state["legacy_language"]]
+        dependencies_per_file = dict(state.get("dependencies_per_file") or {})
+        directories = set()
+        files = []
+        for relative_path in sorted(set(changed_paths)):
+            if not relative_path or any(
+                is_ignored(part, state["ignore_list"])
+                for part in relative_path.split(os.sep)
+            ):
+                continue
+            source_path = os.path.join(entry_path, relative_path)
+            output_file_path = os.path.join(state["output_path"], relative_path)
+            if os.path.isdir(source_path):
+                directories.add(relative_path)
+                continue
+            if os.path.isdir(output_file_path):
+                # A deleted directory
+                shutil.rmtree(output_file_path, ignore_errors=True)
+                if journal is not None:
+                    journal.forget(entry_path, relative_path, subtree=True)
+                for path in list(dependencies_per_file):
+                    if path.startswith(relative_path + os.sep):
+                        del dependencies_per_file[path]
+                directories.add(os.path.dirname(relative_path))
+                continue
+            if not relative_path.endswith(extension):
+                continue
+
+            documented = os.path.exists(output_file_path)
+            exists = os.path.isfile(source_path) and not self._skip_file(
+                source_path, record=False
+            )
+            if not documented and not exists:
+                continue
+            if documented and exists and self._unchanged(state, relative_path):
+                # Only touched, e.g. by a checkout; no longer stale
+                os.utime(output_file_path)
+                continue
+            # The outputs of the previous code
+            if journal is not None:
+                journal.forget(entry_path, relative_path)
+            if documented:
+                os.remove(output_file_path)
+            dependencies_per_file.pop(relative_path, None)
+            directories.add(os.path.dirname(relative_path))
+            if exists:
+                files.append(relative_path)
+
+        logger.info(
+            "Refreshing %d files and the READMEs of %d directories",
+            len(files),
+            len(directories),
+        )
+        # Run in copies of the caller's context, which carries the progress
+        # reporting of the job
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            for batch in self._copies_last(entry_path, files):
+                results = list(
+                    pool.map(
+                        lambda relative_path: context.copy().run(
+                            self._file_summary, state, relative_path
+                        ),
+                        batch,
+                    )
+                )
+                for relative_path, (_, dependencies) in zip(batch, results):
+                    if dependencies is not None:
+                        dependencies_per_file[relative_path] = resolve_dependencies(
+                            relative_path, dependencies
+                        )
+
+        ancestors = set()
+        for directory in directories:
+            while True:
+                ancestors.add(directory)
+                if not directory:
+                    break
+                directory = os.path.dirname(directory)
+        for directory in sorted(
+            ancestors, key=lambda path: (-len(path.split(os.sep)) if path else 0, path)
+        ):
+            if os.path.isdir(os.path.join(entry_path, directory)):
+                self._refresh_readme(state, directory)
+            else:
+                shutil.rmtree(
+                    os.path.join(state["output_path"], directory), ignore_errors=True
+                )
+                if journal is not None:
+                    journal.forget(entry_path, directory, subtree=True)
+
+        return {"dependencies_per_file": dependencies_per_file}
+
+    def _unchanged(self, state: DocAgentState, relative_path: str) -> bool:
+        """
+        Tell whether the code of a file is the code that was documented.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            relative_path (str): The file path relative to the entry path.
+
+        Returns:
+            bool: True if the fingerprint of the documented code is journaled
+            and matches the current code.
+        """
+        journal = get_journal(state.get("journal_path"))
+        if journal is None:
+            return False
+        recorded = journal.get(state["entry_path"], relative_path, "fingerprint")
+        if recorded is None:
+            return False
+        try:
+            code = read_source(os.path.join(state["entry_path"], relative_path))
+        except OSError:
+            return False
+        return recorded["digest"] == digest(code)
+
+    def _file_summary(
+        self, state: DocAgentState, relative_path: str
+    ) -> tuple[str, list | None]:
+        """
+        Return the summary of a file for the README of its directory.
+
+        The file is documented, summarized and its dependencies found as far
+        as the journal does not have them already.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            relative_path (str): The file path relative to the entry path.
+
+        Returns:
+            tuple[str, list | None]: The summary, with the internal
+            dependencies as in ``document_file_node``, and the reported
+            dependencies, None if unknown.
+        """
+        source_path = os.path.join(state["entry_path"], relative_path)
+        summary = self._summarize_code(
+            state,
+            relative_path,
+            self._document_code(state, relative_path, source_path),
+        )
+        dependencies = None
+        if state["legacy_language"] in dependency_tool_supported_langs:
+            dependency_tree = self._find_dependencies(state, relative_path, source_path)
+            if dependency_tree is not None:
+                dependencies = dependency_tree["dependencies"]
+                summary += f"""\nInternal Dependencies: {json.dumps(dependencies)}"""
+        return summary, dependencies
+
+    def _refresh_readme(self, state: DocAgentState, relative_path: str) -> str:
+        """
+        Regenerate the README of a directory, as the directory walk does.
+
+        The summaries of its files and the READMEs of its sub-directories
+        come from the journal; missing ones are generated first.
+
+        Args:
+            state (DocAgentState): The current state of the agent.
+            relative_path (str): The directory path relative to the entry path.
+
+        Returns:
+            str: The README.
+        """
+        journal = get_journal(state.get("journal_path"))
+        extension = supported_langs[state["legacy_language"]]
+        directory_path = os.path.join(state["entry_path"], relative_path)
+        file_or_module_summaries = []
+        for item in os.listdir(directory_path):
+            if is_ignored(item, state["ignore_list"]):
+                continue
+            item_relative_path = os.path.join(relative_path, item)
+            item_path = os.path.join(directory_path, item)
+            if os.path.isdir(item_path):
+                readme = (
+                    journal.get(state["entry_path"], item_relative_path, "readme")
+                    if journal is not None
+                    else None
+                )
+                if readme is None:
+                    readme = self._refresh_readme(state, item_relative_path)
+                file_or_module_summaries.append(item + ":" + readme + "\n\n")
+            elif item.endswith(extension) and not self._skip_file(
+                item_path, record=False
+            ):
+                summary, _ = self._file_summary(state, item_relative_path)
+                file_or_module_summaries.append(item + ":" + summary + "\n\n")
+
+        readme = self._generate_readme(
+            state, relative_path, directory_path, file_or_module_summaries
+        ).content
+        readme_file_path = os.path.join(
+            state["output_path"], relative_path, "README.md"
+        )
+        os.makedirs(os.path.dirname(readme_file_path), exist_ok=True)
+        with open(readme_file_path + ".tmp", "w") as f:
+            f.write(readme)
+        os.replace(readme_file_path + ".tmp", readme_file_path)
+        metrics.inc(
+            "debtrazor_bytes_written_total",
+            len(readme.encode("utf-8")),
+            kind="readme",
+        )
+        return readme
+
+    def reduce_summaries(self, summaries: list[str], module_name: str) -> str:
+        """
+        Fit the summaries of a directory into the token budget of one prompt.
+
+        While the summaries exceed ``readme_batch_tokens``, they are packed
+        into batches within the budget, the batches are summarized in
+        parallel and their summaries replace them. Each round divides the
+        input by the batch size, so a directory needs a number of rounds
+        logarithmic in its fan-out. The summaries are returned over budget
+        when a round cannot shorten them: when every summary is a batch of
+        its own, or when the batch summaries are not shorter than their input.
+
+        Args:
+            summaries (list[str]): The file/module summaries of the directory.
+            module_name (str): The directory/module name.
+
+        Returns:
+            str: The summaries to create the README.md from.
+        """
+        max_rounds = 8  # Bounds the rounds of slowly shrinking summaries
+        previous_tokens = None
+        for _ in range(max_rounds):
+            joined = "\n\n".join(summaries)
+            joined_tokens = count_tokens(joined, self.model_name)
+            if (
+                self.readme_batch_tokens is None
+                or len(summaries) <= 1
+                or joined_tokens <= self.readme_batch_tokens
+            ):
+                return joined
+            if previous_tokens is not None and joined_tokens >= previous_tokens:
+                return joined  # The last round did not shorten them
+            previous_tokens = joined_tokens
+
+            # Pack consecutive summaries into batches within the budget
+            batches, batch, batch_tokens = [], [], 0
+            for summary in summaries:
+                tokens = count_tokens(summary, self.model_name)
+                if batch and batch_tokens + tokens > self.readme_batch_tokens:
+                    batches.append(batch)
+                    batch, batch_tokens = [], 0
+                batch.append(summary)
+                batch_tokens += tokens
+            batches.append(batch)
+            if len(batches) >= len(summaries):
+                return joined  # Every summary is over the budget on its own
+
+            logger.info(
+                "Summarizing %d summaries of %s in %d batches",
+                len(summaries),
+                module_name,
+                len(batches),
+            )
+            results = self.readme_batch_chain.batch(
+                [
+                    {
+                        "file_module_summaries": "\n\n".join(batch),
+                        "module_name": (
+                            f"{module_name} (part {i + 1} of {len(batches)})"
+                        ),
+                    }
+                    for i, batch in enumerate(batches)
+                ],
+                config={"max_concurrency": self.max_concurrency},
+            )
+            summaries = [
+                f"part {i + 1}:" + result.content + "\n\n"
+                for i, result in enumerate(results)
+            ]
+        return "\n\n".join(summaries)
+
+    @staticmethod
+    async def stream_events(events, log_queue):
+        """
+        Stream events and add them to the log queue.
+
+        Args:
+            events: The events to be streamed.
+            log_queue: The log queue to add the events to.
+        """
+        # The graph runs synchronously; pull each step in a worker thread so
+        # that other jobs sharing the event loop keep making progress. The
+        # nodes report the progress of streamed files to this job's queue.
+        with forward_progress(log_queue):
+            while True:
+                event = await asyncio.to_thread(next, events, None)
+                if event is None:
+                    break
+                # TODO: fix the logging here for showing information on the frontend
+                if "document_file" in event.keys() and event["document_file"].get(
+                    "messages"
+                ):
+                    await add_to_log_queue(
+                        "\n".join(
+                            [
+                                f'{event["document_file"]["messages"][-1].additional_kwargs["file_name"]}:',
+                                f'{event["document_file"]["messages"][-1].content}',
+                            ]
+                        ),
+                        log_queue,
+                    )
+                elif "readme_creator" in event.keys():
+                    await add_to_log_queue(
+                        f'{event["readme_creator"]["messages"][-1].content}', log_queue
+                    )
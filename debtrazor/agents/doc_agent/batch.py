@@ -0,0 +1,364 @@
+"""
+Batch endpoints, to document whole repositories offline at a lower cost.
+
+The prompts of a wave of files are submitted at once as a JSONL batch in the
+OpenAI batch format, one chat completion request per line, and the results
+are fetched once the provider has processed them, usually within hours.
+Backends are pluggable:
+
+- ``OpenAIBatchBackend`` uses the OpenAI Batch API;
+- ``LocalBatchBackend`` keeps the batches in a directory and answers them
+  with a chat model in-process, so batch runs can be tested offline.
+"""
+
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import NamedTuple
+
+# Roles of the chat completion API for the LangChain message types
+_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+# Endpoint the requests are sent to
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+
+
+class BatchRequest(NamedTuple):
+    """
+    One chat completion request of a batch.
+
+    Attributes:
+        custom_id (str): Identifier of the request, unique in the batch.
+        messages (list[dict]): The chat messages, ``role`` and ``content``.
+    """
+
+    custom_id: str
+    messages: list[dict]
+
+
+class BatchResult(NamedTuple):
+    """
+    The outcome of one request of a batch.
+
+    Attributes:
+        content (str | None): The model output, None if the request failed.
+        usage (dict): Token usage, ``input_tokens``, ``output_tokens`` and
+            ``cached_tokens``; empty if not reported.
+        error (str | None): Why the request failed, None if it succeeded.
+    """
+
+    content: str | None
+    usage: dict
+    error: str | None
+
+
+def to_batch_messages(messages) -> list[dict]:
+    """
+    Convert formatted prompt messages to chat completion messages.
+
+    Args:
+        messages (list[BaseMessage]): The messages, e.g. from
+            ``ChatPromptTemplate.format_messages``.
+
+    Returns:
+        list[dict]: The messages as ``role`` and ``content``.
+    """
+    return [
+        {"role": _ROLES.get(message.type, message.type), "content": message.content}
+        for message in messages
+    ]
+
+
+def request_line(request: BatchRequest, model_name: str | None) -> dict:
+    """
+    Build the JSONL line of a request, in the OpenAI batch input format.
+
+    Args:
+        request (BatchRequest): The request.
+        model_name (str | None): The model answering it.
+
+    Returns:
+        dict: The line.
+    """
+    return {
+        "custom_id": request.custom_id,
+        "method": "POST",
+        "url": CHAT_COMPLETIONS_URL,
+        "body": {"model": model_name, "messages": request.messages, "temperature": 0},
+    }
+
+
+def read_results(lines) -> dict[str, BatchResult]:
+    """
+    Read the result lines of a batch, in the OpenAI batch output format.
+
+    Args:
+        lines (Iterable[str]): The JSONL lines of the output and error files.
+
+    Returns:
+        dict[str, BatchResult]: The result of each request, by custom id.
+    """
+    results = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        response = data.get("response") or {}
+        body = response.get("body") or {}
+        error = data.get("error")
+        if error is None and response.get("status_code") != 200:
+            error = body.get("error") or f"status {response.get('status_code')}"
+        if error is not None:
+            results[data["custom_id"]] = BatchResult(None, {}, json.dumps(error))
+            continue
+        usage = body.get("usage") or {}
+        results[data["custom_id"]] = BatchResult(
+            body["choices"][0]["message"]["content"],
+            {
+                "input_tokens": usage.get("prompt_tokens", 0),
+                "output_tokens": usage.get("completion_tokens", 0),
+                "cached_tokens": (usage.get("prompt_tokens_details") or {}).get(
+                    "cached_tokens", 0
+                ),
+            },
+            None,
+        )
+    return results
+
+
+class BatchBackend(ABC):
+    """
+    Where batches are submitted and their results fetched.
+
+    Batch ids are journaled, so a backend must find the batches submitted by
+    an earlier process.
+    """
+
+    @abstractmethod
+    def submit(self, requests: list[BatchRequest]) -> str:
+        """
+        Submit a batch of requests.
+
+        Args:
+            requests (list[BatchRequest]): The requests.
+
+        Returns:
+            str: The id of the batch.
+        """
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """
+        Check the progress of a batch.
+
+        Args:
+            batch_id (str): The id of the batch.
+
+        Returns:
+            str: "pending" while it is processed, "completed" once its results
+            can be fetched (possibly with failed requests), "failed" if it
+            has none.
+        """
+
+    @abstractmethod
+    def results(self, batch_id: str) -> dict[str, BatchResult]:
+        """
+        Fetch the results of a completed batch.
+
+        Args:
+            batch_id (str): The id of the batch.
+
+        Returns:
+            dict[str, BatchResult]: The result of each request, by custom id;
+            requests without one were not processed.
+        """
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    Batches kept in a directory and answered in-process by a chat model.
+
+    Each batch is a sub-directory with the ``requests.jsonl`` input and the
+    ``output.jsonl`` results. A batch is processed when its status is first
+    checked, and the results are appended as they are generated, so an
+    interrupted batch resumes where it stopped.
+    """
+
+    def __init__(self, directory: str, model):
+        """
+        Initialize the backend.
+
+        Args:
+            directory (str): The directory of the batches.
+            model (BaseChatModel): The model answering the requests.
+        """
+        self.directory = directory
+        self.model = model
+        self.model_name = getattr(model, "model_name", None)
+
+    def _path(self, batch_id: str, name: str) -> str:
+        return os.path.join(self.directory, batch_id, name)
+
+    def submit(self, requests: list[BatchRequest]) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        os.makedirs(os.path.join(self.directory, batch_id))
+        path = self._path(batch_id, "requests.jsonl")
+        with open(path + ".tmp", "w") as f:
+            for request in requests:
+                f.write(json.dumps(request_line(request, self.model_name)) + "\n")
+        os.replace(path + ".tmp", path)
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        if os.path.exists(self._path(batch_id, "output.jsonl")):
+            return "completed"
+        if not os.path.exists(self._path(batch_id, "requests.jsonl")):
+            return "failed"
+        self._process(batch_id)
+        return "completed"
+
+    def _process(self, batch_id: str):
+        """
+        Answer the requests of a batch that have no result yet.
+
+        Args:
+            batch_id (str): The id of the batch.
+        """
+        from langchain_core.messages import convert_to_messages
+
+        partial_path = self._path(batch_id, "output.jsonl.part")
+        kept = []
+        if os.path.exists(partial_path):
+            with open(partial_path, "r") as f:
+                # The last line may be cut by a crash
+                kept = [line for line in f if line.endswith("\n")]
+        done = {json.loads(line)["custom_id"] for line in kept}
+        with open(self._path(batch_id, "requests.jsonl"), "r") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        with open(partial_path, "w") as out:
+            out.writelines(kept)
+            for line in lines:
+                if line["custom_id"] in done:
+                    continue
+                message = self.model.invoke(
+                    convert_to_messages(line["body"]["messages"])
+                )
+                usage = message.usage_metadata or {}
+                body = {
+                    "model": self.model_name,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": message.content,
+                            },
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": usage.get("input_tokens", 0),
+                        "completion_tokens": usage.get("output_tokens", 0),
+                        "total_tokens": usage.get("total_tokens", 0),
+                        "prompt_tokens_details": {
+                            "cached_tokens": (
+                                usage.get("input_token_details") or {}
+                            ).get("cache_read", 0)
+                        },
+                    },
+                }
+                result = {
+                    "id": f"{batch_id}_{line['custom_id']}",
+                    "custom_id": line["custom_id"],
+                    "response": {"status_code": 200, "body": body},
+                    "error": None,
+                }
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+        os.replace(partial_path, self._path(batch_id, "output.jsonl"))
+
+    def results(self, batch_id: str) -> dict[str, BatchResult]:
+        with open(self._path(batch_id, "output.jsonl"), "r") as f:
+            return read_results(f)
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """
+    Batches processed by the OpenAI Batch API, at a discount over
+    interactive calls.
+    """
+
+    def __init__(self, model_name: str, completion_window: str = "24h", client=None):
+        """
+        Initialize the backend.
+
+        Args:
+            model_name (str): The model answering the requests.
+            completion_window (str): Time the provider has to process a batch.
+            client (OpenAI | None): The API client. Defaults to one configured
+                from the environment.
+        """
+        if client is None:
+            from openai import OpenAI
+
+            client = OpenAI()
+        self.client = client
+        self.model_name = model_name
+        self.completion_window = completion_window
+
+    def submit(self, requests: list[BatchRequest]) -> str:
+        data = "".join(
+            json.dumps(request_line(request, self.model_name)) + "\n"
+            for request in requests
+        ).encode("utf-8")
+        batch_file = self.client.files.create(
+            file=("batch.jsonl", data), purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=CHAT_COMPLETIONS_URL,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        batch = self.client.batches.retrieve(batch_id)
+        # Expired and cancelled batches keep the results of the requests
+        # processed in time
+        if batch.status in ("completed", "expired", "cancelled"):
+            return "completed"
+        if batch.status == "failed":
+            return "failed"
+        return "pending"
+
+    def results(self, batch_id: str) -> dict[str, BatchResult]:
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                lines += self.client.files.content(file_id).text.splitlines()
+        return read_results(lines)
+
+
+def get_batch_backend(name: str, model, directory: str) -> BatchBackend:
+    """
+    Create the batch backend of a run.
+
+    Args:
+        name (str): "openai" or "local".
+        model (BaseChatModel): The model of the run.
+        directory (str): Directory of the run's files, where the local
+            backend keeps its batches.
+
+    Returns:
+        BatchBackend: The backend.
+
+    Raises:
+        ValueError: If the backend name is not recognized.
+    """
+    if name == "openai":
+        return OpenAIBatchBackend(getattr(model, "model_name", None))
+    if name == "local":
+        return LocalBatchBackend(directory, model)
+    raise ValueError(f"Batch backend {name} not recognized")
@@ -0,0 +1,279 @@
+"""
+Retention and compaction of the checkpoint database.
+
+LangGraph keeps every checkpoint of a thread, one per graph step, with the
+writes of its tasks, although a resumed run only reads the latest checkpoint
+and its pending writes. ``RetainingSqliteSaver`` deletes the older ones as
+new ones are saved, so the database, and the time to resume and insert, stay
+bounded over long runs, and gives the freed pages back to the file system a
+few at a time. ``main`` reports the space used by each thread and compacts
+the database once runs are finished::
+
+    python -m debtrazor.agents.doc_agent.checkpoints <output_path>/checkpoint.db report
+    python -m debtrazor.agents.doc_agent.checkpoints <output_path>/checkpoint.db compact
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+# Free pages given back to the file system after each pruning
+VACUUM_PAGES = 256
+
+
+def prune_checkpoints(
+    cursor: sqlite3.Cursor, thread_id: str, checkpoint_ns: str, keep: int
+) -> int:
+    """
+    Delete all but the latest checkpoints of a thread, and their writes.
+
+    Checkpoint ids increase over time; LangGraph relies on it to find the
+    latest checkpoint, and so does this.
+
+    Args:
+        cursor (sqlite3.Cursor): A cursor of the database.
+        thread_id (str): The thread.
+        checkpoint_ns (str): The checkpoint namespace, "" for the root graph.
+        keep (int): Checkpoints kept, at least 1.
+
+    Returns:
+        int: The number of checkpoints deleted.
+    """
+    row = cursor.execute(
+        "SELECT checkpoint_id FROM checkpoints"
+        " WHERE thread_id = ? AND checkpoint_ns = ?"
+        " ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+        (thread_id, checkpoint_ns, max(keep, 1) - 1),
+    ).fetchone()
+    if row is None:
+        return 0
+    cursor.execute(
+        "DELETE FROM writes"
+        " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+        (thread_id, checkpoint_ns, row[0]),
+    )
+    cursor.execute(
+        "DELETE FROM checkpoints"
+        " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+        (thread_id, checkpoint_ns, row[0]),
+    )
+    return cursor.rowcount
+
+
+class RetainingSqliteSaver(SqliteSaver):
+    """
+    SQLite checkpoint saver keeping only the latest checkpoints of a thread.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, *, serde=None, keep_last: int = 2):
+        """
+        Initialize the saver.
+
+        Args:
+            conn (sqlite3.Connection): The database connection.
+            serde (SerializerProtocol | None): The checkpoint serializer.
+            keep_last (int): Checkpoints kept per thread. The latest one is
+                all a resumed run needs; the one before it is kept by default
+                to inspect the last step.
+        """
+        super().__init__(conn, serde=serde)
+        self.keep_last = keep_last
+
+    def setup(self):
+        if not self.is_setup:
+            # Only takes effect on a new database; existing ones switch over
+            # when compacted, see ``compact``
+            self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        super().setup()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        with self.cursor() as cursor:
+            if prune_checkpoints(
+                cursor,
+                str(config["configurable"]["thread_id"]),
+                config["configurable"]["checkpoint_ns"],
+                self.keep_last,
+            ):
+                self.conn.commit()
+                cursor.execute(f"PRAGMA incremental_vacuum({VACUUM_PAGES})").fetchall()
+        return saved
+
+
+def _file_bytes(path: str) -> int:
+    """
+    Return the size of a database with its write-ahead log.
+
+    Args:
+        path (str): The database path.
+
+    Returns:
+        int: The size in bytes.
+    """
+    return sum(
+        os.path.getsize(path + suffix)
+        for suffix in ("", "-wal")
+        if os.path.exists(path + suffix)
+    )
+
+
+def thread_report(conn: sqlite3.Connection) -> list[dict]:
+    """
+    Report the checkpoints of each thread of a database.
+
+    Args:
+        conn (sqlite3.Connection): The database connection.
+
+    Returns:
+        list[dict]: Per thread, sorted by id: ``thread_id``, ``checkpoints``,
+        ``writes``, ``bytes`` of serialized data and ``finalized``, whether
+        its run documented the whole repository (None if unknown).
+    """
+    from debtrazor.agents.doc_agent.serde import CompactCheckpointSerializer
+
+    tables = {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    if not {"checkpoints", "writes"} <= tables:
+        return []
+    threads = {}
+    for thread_id, count, size in conn.execute(
+        "SELECT thread_id, COUNT(*),"
+        " SUM(LENGTH(checkpoint) + LENGTH(metadata)) FROM checkpoints"
+        " GROUP BY thread_id"
+    ):
+        threads[thread_id] = {
+            "thread_id": thread_id,
+            "checkpoints": count,
+            "writes": 0,
+            "bytes": size or 0,
+            "finalized": None,
+        }
+    for thread_id, count, size in conn.execute(
+        "SELECT thread_id, COUNT(*), SUM(LENGTH(value)) FROM writes GROUP BY thread_id"
+    ):
+        if thread_id in threads:
+            threads[thread_id]["writes"] = count
+            threads[thread_id]["bytes"] += size or 0
+
+    saver = SqliteSaver(conn, serde=CompactCheckpointSerializer())
+    saver.is_setup = True  # Reporting does not create the tables
+    for thread_id, thread in threads.items():
+        latest = saver.get_tuple(
+            {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+        )
+        if latest is not None:
+            thread["finalized"] = latest.checkpoint["channel_values"].get("finalized")
+    return [threads[thread_id] for thread_id in sorted(threads)]
+
+
+def compact(path: str, keep: int | None = None) -> tuple[int, int]:
+    """
+    Compact a checkpoint database.
+
+    Finished threads keep only their latest checkpoint, which tells a new
+    run that the repository is documented; unfinished ones keep their latest
+    ``keep`` checkpoints, or all of them. The database is then rebuilt
+    (``VACUUM``), which also enables the incremental vacuum used by
+    ``RetainingSqliteSaver`` on databases created before it, and the query
+    planner statistics are updated.
+
+    Args:
+        path (str): The database path. No run may be using it.
+        keep (int | None): Checkpoints kept per unfinished thread, None to
+            keep them all.
+
+    Returns:
+        tuple[int, int]: The number of checkpoints deleted and the bytes
+        reclaimed.
+    """
+    before = _file_bytes(path)
+    deleted = 0
+    conn = sqlite3.connect(path)
+    try:
+        for thread in thread_report(conn):
+            limit = 1 if thread["finalized"] else keep
+            if limit is None:
+                continue
+            cursor = conn.cursor()
+            namespaces = cursor.execute(
+                "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?",
+                (thread["thread_id"],),
+            ).fetchall()
+            for (checkpoint_ns,) in namespaces:
+                deleted += prune_checkpoints(
+                    cursor, thread["thread_id"], checkpoint_ns, limit
+                )
+            conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+    return deleted, before - _file_bytes(path)
+
+
+def main(argv=None) -> int:
+    """
+    Report or reclaim the space of a checkpoint database from the command
+    line.
+
+    Args:
+        argv (list[str] | None): Command line arguments.
+
+    Returns:
+        int: 0 on success, 1 if the database does not exist.
+    """
+    parser = argparse.ArgumentParser(
+        description="Report and reclaim the space of a checkpoint database"
+    )
+    parser.add_argument("database", help="Path of the database (checkpoint.db)")
+    parser.add_argument(
+        "command",
+        choices=["report", "compact"],
+        help="compact: keep only the latest checkpoint of finished threads, "
+        "then rebuild the database",
+    )
+    parser.add_argument(
+        "--keep",
+        type=int,
+        help="With compact, also keep only the latest KEEP checkpoints of "
+        "unfinished threads",
+    )
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.database):
+        print(f"{args.database} does not exist", file=sys.stderr)
+        return 1
+    if args.command == "compact":
+        deleted, reclaimed = compact(args.database, args.keep)
+        print(f"Deleted {deleted} checkpoints, reclaimed {reclaimed} bytes")
+
+    conn = sqlite3.connect(args.database)
+    try:
+        threads = thread_report(conn)
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+    print(f"{'thread':<32} {'checkpoints':>11} {'writes':>8} {'bytes':>12} finished")
+    for thread in threads:
+        print(
+            f"{thread['thread_id']:<32} {thread['checkpoints']:>11}"
+            f" {thread['writes']:>8} {thread['bytes']:>12}"
+            f" {'unknown' if thread['finalized'] is None else thread['finalized']}"
+        )
+    print(
+        f"Database: {_file_bytes(args.database)} bytes,"
+        f" {free_pages * page_size} bytes free"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
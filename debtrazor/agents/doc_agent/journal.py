@@ -0,0 +1,210 @@
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any
+
+from debtrazor.utils.logging import logger
+
+
+class Journal:
+    """
+    Durable record of the completed sub-steps of the DocAgent.
+
+    Every model output (documented file, summary, dependencies, README) is
+    recorded as soon as it is produced, keyed by repository, path and step.
+    Graph checkpoints are only written between nodes, so after a crash the
+    journal lets a resumed run redo just the steps that were not finished
+    instead of paying for the same model calls again.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open or create the journal database.
+
+        Args:
+            path (str): The SQLite database path.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS steps (
+                entry_path TEXT NOT NULL,
+                path TEXT NOT NULL,
+                step TEXT NOT NULL,
+                value TEXT,
+                PRIMARY KEY (entry_path, path, step)
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, entry_path: str, path: str, step: str) -> Any:
+        """
+        Return the recorded output of a step.
+
+        Args:
+            entry_path (str): The repository root.
+            path (str): The file or directory path relative to the root.
+            step (str): The step name, e.g. ``summary``.
+
+        Returns:
+            Any: The recorded value, or None if the step is not done.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM steps WHERE entry_path = ? AND path = ? AND step = ?",
+                (entry_path, path, step),
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def done(self, entry_path: str, path: str, step: str) -> bool:
+        """
+        Check whether a step was recorded.
+
+        Args:
+            entry_path (str): The repository root.
+            path (str): The file or directory path relative to the root.
+            step (str): The step name.
+
+        Returns:
+            bool: True if the step is done.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM steps WHERE entry_path = ? AND path = ? AND step = ?",
+                (entry_path, path, step),
+            ).fetchone()
+        return row is not None
+
+    def since(
+        self, entry_path: str, step: str, rowid: int = 0
+    ) -> tuple[list[tuple[str, Any]], int]:
+        """
+        Return the outputs of a step recorded after a given row.
+
+        Used to follow the records of other workers (shards, threads)
+        incrementally; a re-recorded output counts as new.
+
+        Args:
+            entry_path (str): The repository root.
+            step (str): The step name.
+            rowid (int): The last row already seen, 0 for all.
+
+        Returns:
+            tuple[list[tuple[str, Any]], int]: The (path, value) of each new
+            record, in order, and the last row seen.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rowid, path, value FROM steps"
+                " WHERE entry_path = ? AND step = ? AND rowid > ? ORDER BY rowid",
+                (entry_path, step, rowid),
+            ).fetchall()
+        if rows:
+            rowid = rows[-1][0]
+        return [(path, json.loads(value)) for _, path, value in rows], rowid
+
+    def record(self, entry_path: str, path: str, step: str, value: Any = None):
+        """
+        Record the output of a completed step, committing immediately.
+
+        Args:
+            entry_path (str): The repository root.
+            path (str): The file or directory path relative to the root.
+            step (str): The step name.
+            value (Any): JSON serializable output of the step.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?)",
+                (entry_path, path, step, json.dumps(value)),
+            )
+            self._conn.commit()
+
+    def forget(self, entry_path: str, path: str, subtree: bool = False):
+        """
+        Delete the recorded outputs of a path, e.g. once its file changed.
+
+        Args:
+            entry_path (str): The repository root.
+            path (str): The file or directory path relative to the root.
+            subtree (bool): Also delete the outputs of the paths below it.
+        """
+        pattern = (
+            path.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            + "/%"
+        )
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM steps WHERE entry_path = ?"
+                " AND (path = ? OR (? AND path LIKE ? ESCAPE '\\'))",
+                (entry_path, path, subtree, pattern),
+            )
+            self._conn.commit()
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._conn.close()
+
+
+_journals: dict[str, Journal] = {}
+# Number of runs holding each journal open, see hold_journal
+_holders: dict[str, int] = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path: str | None) -> Journal | None:
+    """
+    Return the shared journal of a database path.
+
+    Args:
+        path (str | None): The SQLite database path, usually the
+            ``journal_path`` of the agent state.
+
+    Returns:
+        Journal | None: The journal, or None if no path is given (e.g. state
+        checkpointed before journaling existed).
+    """
+    if path is None:
+        return None
+    with _journals_lock:
+        if path not in _journals:
+            logger.info("Journal path: %s", path)
+            _journals[path] = Journal(path)
+        return _journals[path]
+
+
+@contextmanager
+def hold_journal(path: str | None):
+    """
+    Keep the shared journal of a database path open during a run.
+
+    When the last run holding it ends, the journal is closed and dropped from
+    the cache, so long-running processes (``--serve``, ``--watch``) do not
+    keep a connection open per output path.
+
+    Args:
+        path (str | None): The SQLite database path, usually the
+            ``journal_path`` of the agent state.
+    """
+    if path is None:
+        yield
+        return
+    with _journals_lock:
+        _holders[path] = _holders.get(path, 0) + 1
+    try:
+        yield
+    finally:
+        journal = None
+        with _journals_lock:
+            _holders[path] -= 1
+            if not _holders[path]:
+                del _holders[path]
+                journal = _journals.pop(path, None)
+        if journal is not None:
+            journal.close()
@@ -0,0 +1,363 @@
+"""
+Patch-style documentation: the model only returns the comments to insert.
+
+Instead of echoing the whole documented file, the model lists comments and
+docstrings anchored to line numbers of the original code, and they are
+inserted locally. Output tokens then scale with the documentation instead of
+the file. The patched code is verified before it is used:
+
+- the original code must be byte-identical outside the inserted lines;
+- Python code must parse to the same AST once the inserted docstrings are
+  removed, so comments or strings inserted inside a string literal, in the
+  middle of a statement or at a wrong indentation are caught;
+- for languages with C-style comments, every insertion must be a ``//`` or
+  ``/* */`` comment anchored outside block comments and multi-line strings.
+
+Insertions failing the checks are dropped one by one.
+"""
+
+import ast
+import json
+import re
+
+from pydantic import ValidationError
+
+from debtrazor.schema.insertion import Insertion, Insertions
+from debtrazor.utils.util import parse_code_string
+
+# Comment syntax of each legacy language, deciding how insertions are checked
+COMMENT_SYNTAX = {
+    "python": "python",
+    "nodejs": "c",
+    "javascript": "c",
+    "typescript": "c",
+    "java": "c",
+    "rust": "c",
+    "c": "c",
+    "cpp": "c",
+}
+
+_INDENT = re.compile(r"[ \t]*")
+
+# Python nodes whose first statement is their docstring
+_DOCUMENTED = (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+def split_lines(code: str) -> list[str]:
+    """
+    Split code into lines at line feeds only, keeping the line breaks.
+
+    Args:
+        code (str): The code.
+
+    Returns:
+        list[str]: The lines; joined, they are the code again.
+    """
+    lines = [line + "\n" for line in code.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    return lines if lines[-1] else lines[:-1]
+
+
+def number_lines(code: str, first_line: int = 1) -> str:
+    """
+    Prefix each line of code with its number, as the insertions refer to them.
+
+    Args:
+        code (str): The code.
+        first_line (int): Number of the first line, for pieces of a file.
+
+    Returns:
+        str: The numbered code, ``<number>| <line>`` per line.
+    """
+    return "".join(
+        f"{number}| {line}" for number, line in enumerate(split_lines(code), first_line)
+    )
+
+
+def parse_insertions(content: str) -> list[Insertion]:
+    """
+    Read the insertions listed by the model.
+
+    Args:
+        content (str): The model output, a JSON array (or an object with an
+            ``insertions`` array), optionally in a code block.
+
+    Returns:
+        list[Insertion]: The insertions.
+
+    Raises:
+        ValueError: If the output is not a valid list of insertions.
+    """
+    try:
+        data = json.loads(parse_code_string(content.strip()))
+        if isinstance(data, list):
+            data = {"insertions": data}
+        return Insertions.model_validate(data).insertions
+    except (json.JSONDecodeError, ValidationError) as e:
+        raise ValueError(f"Invalid insertions: {e}") from None
+
+
+def _indent(line: str) -> str:
+    return _INDENT.match(line).group()
+
+
+def _segment(lines: list[str], insertion: Insertion) -> tuple[int, str]:
+    """
+    Place and indent an insertion.
+
+    Comments placed before a line take its indentation; comments placed after
+    a line take the indentation of the next line if it is deeper (the body
+    of a function or class header), the line's own otherwise.
+
+    Args:
+        lines (list[str]): The lines of the code, with their line breaks.
+        insertion (Insertion): The insertion, with a valid line number.
+
+    Returns:
+        tuple[int, str]: The index of the line the text goes before, and the
+        text to insert.
+    """
+    anchor = insertion.line - 1
+    index = anchor if insertion.placement == "before" else anchor + 1
+    following = next((line for line in lines[anchor + 1 :] if line.strip()), None)
+    if lines[anchor].strip():
+        indent = _indent(lines[anchor])
+    else:
+        indent = _indent(following) if following is not None else ""
+    if insertion.placement == "after" and following is not None:
+        if len(_indent(following)) > len(indent):
+            indent = _indent(following)
+
+    # Line breaks of the anchor line, or of the one before if it is the last
+    ending = (
+        lines[anchor]
+        if lines[anchor].endswith("\n") or not anchor
+        else lines[anchor - 1]
+    )
+    newline = "\r\n" if ending.endswith("\r\n") else "\n"
+    text = newline.join(
+        indent + line if line.strip() else ""
+        for line in insertion.text.strip("\n").splitlines()
+    )
+    if index == len(lines) and not lines[-1].endswith("\n"):
+        # After a last line without line break
+        return index, newline + text
+    return index, text + newline
+
+
+def _insert(lines: list[str], segments: list[tuple[int, str]]):
+    """
+    Insert text segments between the lines of code.
+
+    Args:
+        lines (list[str]): The lines of the code.
+        segments (list[tuple[int, str]]): The line index and text of each
+            segment; segments at the same index keep their order.
+
+    Returns:
+        tuple[list[str], list[bool]]: The parts of the patched code, and for
+        each part whether it was inserted.
+    """
+    at = {}
+    for index, text in segments:
+        at.setdefault(index, []).append(text)
+    parts, inserted = [], []
+    for index in range(len(lines) + 1):
+        for text in at.get(index, []):
+            parts.append(text)
+            inserted.append(True)
+        if index < len(lines):
+            parts.append(lines[index])
+            inserted.append(False)
+    return parts, inserted
+
+
+def _inserted_line_numbers(parts: list[str], inserted: list[bool]) -> set[int]:
+    """
+    Return the line numbers of the inserted parts in the patched code.
+
+    Args:
+        parts (list[str]): The parts of the patched code, see ``_insert``.
+        inserted (list[bool]): Whether each part was inserted.
+
+    Returns:
+        set[int]: The 1-based numbers of the inserted lines.
+    """
+    numbers = set()
+    line = 1
+    for part, is_inserted in zip(parts, inserted):
+        if is_inserted:
+            # A part after a last line without line break starts with one
+            start = line + 1 if part.startswith(("\n", "\r\n")) else line
+            numbers.update(range(start, start + len(split_lines(part.strip("\r\n")))))
+        line += part.count("\n")
+    return numbers
+
+
+def _python_dump(code: str, ignored_lines: set[int] = frozenset()) -> str | None:
+    """
+    Dump the AST of Python code, without the docstrings of some lines.
+
+    Args:
+        code (str): The code.
+        ignored_lines (set[int]): Lines whose docstrings are left out; other
+            string statements are kept, so they fail the comparison.
+
+    Returns:
+        str | None: The dump, or None if the code does not parse.
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    for node in ast.walk(tree):
+        if isinstance(node, _DOCUMENTED) and node.body:
+            first = node.body[0]
+            if (
+                isinstance(first, ast.Expr)
+                and isinstance(first.value, ast.Constant)
+                and isinstance(first.value.value, str)
+                and first.lineno in ignored_lines
+            ):
+                node.body = node.body[1:]
+    return ast.dump(tree)
+
+
+def _c_line_starts(code: str) -> list[bool]:
+    """
+    Tell for each line of C-style code whether it starts outside comments
+    and strings.
+
+    Block comments, and strings that may span lines (JavaScript template
+    literals, unterminated quotes), are tracked; raw strings are not.
+
+    Args:
+        code (str): The code.
+
+    Returns:
+        list[bool]: One entry per line, plus one for the end of the code.
+    """
+    starts = [True]
+    state = None  # None, "/*" or the quote of the current string
+    i = 0
+    while i < len(code):
+        char = code[i]
+        if state is None:
+            if code.startswith("//", i):
+                end = code.find("\n", i)
+                i = len(code) if end == -1 else end
+                continue
+            if code.startswith("/*", i):
+                state = "/*"
+                i += 2
+                continue
+            if char in "\"'`":
+                state = char
+        elif state == "/*":
+            if code.startswith("*/", i):
+                state = None
+                i += 2
+                continue
+        elif char == "\\":
+            if code.startswith("\n", i + 1):
+                starts.append(False)  # Line continuation inside the string
+            i += 2
+            continue
+        elif char == state:
+            state = None
+        elif char == "\n" and state != "`":
+            state = None  # Unterminated single-line string
+        if char == "\n":
+            starts.append(state is None)
+        i += 1
+    if not code.endswith("\n"):
+        starts.append(state is None)
+    return starts
+
+
+def _is_c_comment(text: str) -> bool:
+    """
+    Tell whether a text is only C-style comments.
+
+    Args:
+        text (str): The inserted text.
+
+    Returns:
+        bool: True if every line is a ``//`` comment, or the text is one
+        ``/* */`` block comment.
+    """
+    stripped = text.strip()
+    if all(line.strip().startswith("//") for line in text.strip().splitlines()):
+        return True
+    return (
+        stripped.startswith("/*")
+        and stripped.endswith("*/")
+        and "*/" not in stripped[2:-2]
+    )
+
+
+def apply_insertions(
+    code: str, insertions: list[Insertion], language: str
+) -> tuple[str, int] | None:
+    """
+    Insert the comments listed by the model into the code and verify it.
+
+    Args:
+        code (str): The original code.
+        insertions (list[Insertion]): The insertions.
+        language (str): The legacy language, a key of ``COMMENT_SYNTAX``.
+
+    Returns:
+        tuple[str, int] | None: The documented code and the number of
+        insertions dropped because they failed the checks, or None if the
+        code cannot be verified (unknown language, Python that does not
+        parse).
+    """
+    syntax = COMMENT_SYNTAX.get(language)
+    lines = split_lines(code)
+    if syntax is None:
+        return None
+    if not lines:
+        return code, len(insertions)  # Nothing to anchor comments to
+
+    segments = []
+    rejected = 0
+    if syntax == "python":
+        original = _python_dump(code)
+        if original is None:
+            return None
+    else:
+        starts = _c_line_starts(code)
+    for insertion in insertions:
+        if not 1 <= insertion.line <= len(lines) or not insertion.text.strip():
+            rejected += 1
+            continue
+        segment = _segment(lines, insertion)
+        if syntax == "c" and not (starts[segment[0]] and _is_c_comment(insertion.text)):
+            rejected += 1
+            continue
+        segments.append(segment)
+
+    def verified(candidates):
+        parts, inserted = _insert(lines, candidates)
+        # The original code, byte for byte, outside the inserted parts
+        if "".join(p for p, i in zip(parts, inserted) if not i) != code:
+            return None
+        patched = "".join(parts)
+        if syntax == "python" and original != _python_dump(
+            patched, _inserted_line_numbers(parts, inserted)
+        ):
+            return None
+        return patched
+
+    patched = verified(segments)
+    if patched is None:
+        # Keep the insertions that pass the checks together with the
+        # previously kept ones
+        kept = []
+        for segment in segments:
+            if verified(kept + [segment]) is not None:
+                kept.append(segment)
+        rejected += len(segments) - len(kept)
+        patched = verified(kept)
+    return patched, rejected
@@ -0,0 +1,214 @@
+"""
+Prefetching of the local work of upcoming files.
+
+The DocAgent walks the repository one file per graph step, and most of a step
+is spent waiting for the model. The local stages of the next files (reading,
+sniffing, splitting and fingerprinting them, and running the dependency tool
+on them) are run ahead in worker threads meanwhile, each stage bounded in how
+far it runs ahead, so disk and CPU work overlaps with the network waits
+instead of adding to them.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Iterable, NamedTuple
+
+from debtrazor.agents.doc_agent.similarity import Fingerprint
+
+
+def file_signature(path: str) -> tuple | None:
+    """
+    Return what identifies the version of a file, to detect changes.
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        tuple | None: The modification time and size of the file, or None if
+        it cannot be read.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class PreparedFile(NamedTuple):
+    """
+    Local work done for a source file before its model calls.
+
+    Attributes:
+        signature (tuple | None): ``file_signature`` of the file when it was
+            prepared.
+        skip_reason (str | None): Why the file is skipped, see ``FileLimits``,
+            or None if it is documented.
+        pieces (list[str] | None): The code split by the token limit; None for
+            skipped files.
+        fingerprint (Fingerprint | None): The fingerprint of the code, to
+            find copies of documented files; None for skipped files.
+    """
+
+    signature: tuple | None
+    skip_reason: str | None
+    pieces: list[str] | None
+    fingerprint: Fingerprint | None = None
+
+
+class PreparedDependencies(NamedTuple):
+    """
+    Dependencies of a source file, extracted with the dependency tool.
+
+    Attributes:
+        signature (tuple | None): ``file_signature`` of the file when the tool
+            ran.
+        dependencies (list[str] | None): The reported dependencies, relative
+            to the file's directory, or None if the tool failed.
+    """
+
+    signature: tuple | None
+    dependencies: list[str] | None
+
+
+class Prefetcher:
+    """
+    Runs a loader for upcoming keys in worker threads, ahead of their use.
+
+    At most ``capacity`` results are kept or in flight; the oldest ones are
+    dropped first, so memory stays bounded however far ahead keys are
+    submitted.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        load: Callable[..., Any],
+        max_workers: int = 2,
+        capacity: int = 8,
+    ):
+        """
+        Initialize the prefetcher.
+
+        Args:
+            name (str): Name of the stage, for the metrics and thread names.
+            load (Callable[..., Any]): Computes the result of a key; called
+                with the items of the key tuple.
+            max_workers (int): Number of worker threads.
+            capacity (int): Maximum number of results kept or in flight.
+        """
+        self.name = name
+        self.load = load
+        self.max_workers = max_workers
+        self.capacity = capacity
+        self._futures: OrderedDict[Hashable, Future] = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _evict(self):
+        # Drop the oldest finished results first; in-flight ones are only
+        # dropped (and cancelled if not started) when everything is in flight
+        while len(self._futures) > self.capacity:
+            victim = next(
+                (key for key, future in self._futures.items() if future.done()),
+                next(iter(self._futures)),
+            )
+            self._futures.pop(victim).cancel()
+
+    def prefetch(self, keys: Iterable[Hashable]):
+        """
+        Start loading keys that are not loaded or in flight yet.
+
+        Args:
+            keys (Iterable[Hashable]): The keys, most urgent first; only the
+                first ``capacity`` are considered.
+        """
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"prefetch-{self.name}",
+                )
+            for index, key in enumerate(keys):
+                if index >= self.capacity:
+                    break
+                if key in self._futures:
+                    self._futures.move_to_end(key)
+                    continue
+                self._futures[key] = self._pool.submit(self.load, *key)
+                self._evict()
+
+    def status(self, key: Hashable) -> str:
+        """
+        Tell how far the loading of a key is, without waiting.
+
+        Args:
+            key (Hashable): The key.
+
+        Returns:
+            str: "ready" if the result is loaded, "pending" if it is in
+            flight, "missing" if ``get`` would load it in the calling thread.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+        if future is None or future.cancelled():
+            return "missing"
+        return "ready" if future.done() else "pending"
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Return the result of a key, waiting for it if it is in flight.
+
+        Keys that were not prefetched (or were dropped, even while waiting
+        for them) are loaded in the calling thread and kept for later calls.
+
+        Args:
+            key (Hashable): The key.
+
+        Returns:
+            Any: The result.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+        if future is not None:
+            try:
+                return future.result()
+            except CancelledError:
+                pass  # Dropped before it started, see ``_evict``
+
+        result = self.load(*key)
+        if self.capacity > 0:
+            done = Future()
+            done.set_result(result)
+            with self._lock:
+                self._futures[key] = done
+                self._evict()
+        return result
+
+    def invalidate(self, key: Hashable):
+        """
+        Forget the result of a key, e.g. because its input changed.
+
+        Args:
+            key (Hashable): The key.
+        """
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def close(self):
+        """
+        Stop the worker threads, dropping the results.
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+            futures = list(self._futures.values())
+            self._futures.clear()
+        for future in futures:
+            future.cancel()
+        if pool is not None:
+            pool.shutdown(wait=False)
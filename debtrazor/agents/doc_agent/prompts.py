@@ -1,4 +1,14 @@
-from langchain_core.prompts.chat import ChatPromptTemplate
+import importlib
+
+# Prompts are laid out for provider-side prompt caching: system prompts are
+# static, the run context (language, framework) opens the human message and
+# the per-call content (code file, summaries, paths) comes last. Every call of
+# a chain in a run then shares the same prefix.
+
+# Run context opening every human message
+CONTEXT_PROMPT = """Language/framework of the codebase: {language} {framework}
+
+"""
 
 # System prompt template for generating detailed documentation for a code file
 SYSTEM_PROMPT = """You are playing the role of senior Google engineer. As
@@ -7,9 +17,9 @@ SYSTEM_PROMPT = """You are playing the role of senior Google engineer. As
  that it is easy to understand and maintain for anyone who reads it. It should
  be documented in such a way that anyone can get started quickly and develop
  new features. \n\n
- Current Task: Given a code file as an input in {language} {framework}, you
- need add detailed doc comment for each method in the code file. The doc
- comment should describe what the method does. The doc comment should also
+ Current Task: Given a code file as an input in the language/framework of
+ the codebase, you need add detailed doc comment for each method in the code
+ file. The doc comment should describe what the method does. The doc comment should also
  include the input and output parameters alongside small description of each
  parameter. You should also add inline comments to the code where it make sense
  to make it more readable and easier to understand. \n\n
@@ -19,20 +29,73 @@ SYSTEM_PROMPT = """You are playing the role of senior Google engineer. As
  downstream application if you do not follow the instruction properly. \n\n"""
 
 # Human prompt template for providing the code file that needs documentation
-HUMAN_PROMPT = """ Here is the code file that need to be documented: \n\n
-{code_file}
-
-### Important Instructions: Don't change the code not even a single line, and 
+HUMAN_PROMPT = (
+    CONTEXT_PROMPT
+    + """### Important Instructions: Don't change the code not even a single line, and 
  you need generate the whole code file as output.
 
 **NOTE: IF THE FILE IS EMPTY, OUTPUT NOTHING** 
+
+{dependency_summaries}Here is the code file that need to be documented: \n\n
+{code_file}
 """
+)
 
-# Creating a ChatPromptTemplate instance for the documentation task
-PROMPT = ChatPromptTemplate.from_messages(
-    [("system", SYSTEM_PROMPT), ("human", HUMAN_PROMPT)]
+# System prompt template for documenting a code file by listing the comments
+# to insert, instead of returning the whole file (output_format: insertions)
+SYSTEM_PROMPT_INSERTIONS = """You are playing the role of senior Google engineer. As
+ senior engineer at Google, you are an expert at managing the large codebase
+ with proper documentation. Your personal goal is to manage large codebase such
+ that it is easy to understand and maintain for anyone who reads it. It should
+ be documented in such a way that anyone can get started quickly and develop
+ new features. \n\n
+ Current Task: Given a code file as an input in the language/framework of
+ the codebase, with each line prefixed by its line number, you need to list
+ the detailed doc comment to add for each method in the code file. The doc
+ comment should describe what the method does. The doc comment should also
+ include the input and output parameters alongside small description of each
+ parameter. You should also list inline comments where it make sense to make
+ the code more readable and easier to understand. \n\n
+ Expected Output: A JSON array in a ```json code block, with one object per
+ comment: {{"line": <line number>, "placement": "before" or "after", "text":
+ <the comment>}}. The comment is inserted above the line ("before") or below
+ it ("after", for docstrings that go below a function or class header). The
+ text must include the comment markers of the language and no indentation,
+ it is indented like the code around it. Do not repeat the code and do not
+ add any extra verbosity. This will break the downstream application if you
+ do not follow the instruction properly. \n\n"""
+
+# Human prompt template for providing the numbered code file that needs
+# documentation
+HUMAN_PROMPT_INSERTIONS = (
+    CONTEXT_PROMPT
+    + """{dependency_summaries}Here is the code file that need to be documented, each line
+ prefixed with its number and "| ": \n\n
+{code_file}
+"""
 )
 
+# Human prompt template for documenting a near copy of a documented file: the
+# comments of the shared lines are carried over, only the changed lines are
+# left to the model (same system prompt as the insertions)
+HUMAN_PROMPT_UPDATE = (
+    CONTEXT_PROMPT
+    + """{dependency_summaries}The documentation of this code file was carried over from a
+ similar file, except for the lines {changed_lines}. List the comments to add
+ for these lines only. Here is the code file, each line
+ prefixed with its number and "| ": \n\n
+{code_file}
+"""
+)
+
+# Section of HUMAN_PROMPT with the summaries of the internal dependencies of
+# the file, when they were documented before it (empty otherwise)
+DEPENDENCY_SUMMARIES_PROMPT = """Here are the summaries of the files it depends on, for
+ context only: \n\n
+{summaries}
+
+"""
+
 # System prompt template for generating a summary of a code file
 SYSTEM_PROMPT_SUMMARY = """You are playing the role of senior Google engineer.
  As senior engineer at Google, you are an expert at managing the large codebase
@@ -40,22 +103,19 @@ SYSTEM_PROMPT_SUMMARY = """You are playing the role of senior Google engineer.
  that it is easy to understand and maintain for anyone who reads it. It should
  be documented in such a way that anyone can get started quickly and develop
  new features. \n\n
- Current Task: Given a code file as input in {language} {framework}, you need
- to generate the summary of the code file. The summary should be a
+ Current Task: Given a code file as input in the language/framework of the
+ codebase, you need to generate the summary of the code file. The summary should be a
  few lines long and concise. The code file had been commented properly so it
  should be easy to generate the summary. \n\n
  Expected Output: The summary of the code file. The summary should be a few a
  few lines long and concise. \n\n"""
 
 # Human prompt template for providing the code file that needs summarization
-HUMAN_PROMPT_SUMMARY = """ Here is the code file that need to be summarized:
+HUMAN_PROMPT_SUMMARY = (
+    CONTEXT_PROMPT + """ Here is the code file that need to be summarized:
 \n\n
 {code_file}
 """
-
-# Creating a ChatPromptTemplate instance for the summarization task
-PROMPT_SUMMARY = ChatPromptTemplate.from_messages(
-    [("system", SYSTEM_PROMPT_SUMMARY), ("human", HUMAN_PROMPT_SUMMARY)]
 )
 
 # System prompt template for generating a README.md file for a directory/module
@@ -79,23 +139,34 @@ HUMAN_PROMPT_README = """ Here is the list of file/module names along with
 {module_name}
 """
 
-# Creating a ChatPromptTemplate instance for the README.md generation task
-PROMPT_README = ChatPromptTemplate.from_messages(
-    [("system", SYSTEM_PROMPT_README), ("human", HUMAN_PROMPT_README)]
-)
+# System prompt template for summarizing one batch of a directory's file/module
+# summaries, when there are too many to fit a single README.md prompt
+SYSTEM_PROMPT_README_BATCH = """You are playing the role of senior Google.
+ As senior engineer at Google, you are an expert at managing the large codebase
+ with proper documentation. Your personal goal is to manage large codebase
+ such that it is easy to understand and maintain for anyone who reads it. It
+ should be documented in such a way that anyone can get started quickly and
+ develop new features. \n\n
+ Current Task: Given a part of the list of file/module names of a directory
+ along with the short summary of each file/module, you need to write a concise
+ summary of this part. The summaries of all the parts are combined later to
+ create the README.md file of the directory, so keep the names of the
+ important files/modules and what they do. \n\n
+ Expected Output: The summary of this part of the directory, a few short
+ paragraphs at most. \n\n"""
 
 # System prompt template for generating a dependency tree of a code file
 SYSTEM_PROMPT_DEPENDENCY_TREE = """You are a helpful AI assistant and you have
  access to the certain tools to help you with the task. Use these tools wisely
  to find/return the dependency tree of the given code file.
 
-Current Task: Given the code file path as an input in {language} {framework},
- Use the tools at your disposal to generate the dependency tree of the code
- file. If there  is no tool available for the given {language} then return
- "None" as the output.
+Current Task: Given the code file path as an input in the language/framework
+ of the codebase, Use the tools at your disposal to generate the dependency
+ tree of the code file. If there  is no tool available for the given language
+ then return "None" as the output.
 
 Expected Output: The dependency tree of the code file in JSON format or None if
- no tool is available for the given input {language}. NOTE: When you output JSON/None 
+ no tool is available for the given input language. NOTE: When you output JSON/None 
  do not add any extra sentences, words or verbosity and use the output schema tool 
  if available to output the JSON in correct format. In case of None just say "None".
  Failure to comply with these instructions will get us in huge trouble.
@@ -103,15 +174,107 @@ Expected Output: The dependency tree of the code file in JSON format or None if
 Tools: You have access to following tools: {tool_names} \n\n"""
 
 # Human prompt template for providing the path to the code file
-HUMAN_PROMPT_DEPENDENCY_TREE = """ Here is the path to the code file:
+HUMAN_PROMPT_DEPENDENCY_TREE = CONTEXT_PROMPT + """ Here is the path to the code file:
  {code_file_path}
 """
 
-# Creating a ChatPromptTemplate instance for the dependency tree generation task
-PROMPT_DEPENDENCY_TREE = ChatPromptTemplate.from_messages(
-    [
+# Messages of each ChatPromptTemplate. The templates themselves are created on
+# first access (PEP 562) because importing langchain is slow and the raw
+# strings are enough for local token estimates.
+PROMPT_MESSAGES = {
+    # Documentation task
+    "PROMPT": [("system", SYSTEM_PROMPT), ("human", HUMAN_PROMPT)],
+    # Documentation task, listing the comments to insert
+    "PROMPT_INSERTIONS": [
+        ("system", SYSTEM_PROMPT_INSERTIONS),
+        ("human", HUMAN_PROMPT_INSERTIONS),
+    ],
+    # Update of the documentation carried over from a similar file
+    "PROMPT_UPDATE": [
+        ("system", SYSTEM_PROMPT_INSERTIONS),
+        ("human", HUMAN_PROMPT_UPDATE),
+    ],
+    # Summarization task
+    "PROMPT_SUMMARY": [
+        ("system", SYSTEM_PROMPT_SUMMARY),
+        ("human", HUMAN_PROMPT_SUMMARY),
+    ],
+    # README.md generation task
+    "PROMPT_README": [("system", SYSTEM_PROMPT_README), ("human", HUMAN_PROMPT_README)],
+    # Summarization of a batch of README.md inputs
+    "PROMPT_README_BATCH": [
+        ("system", SYSTEM_PROMPT_README_BATCH),
+        ("human", HUMAN_PROMPT_README),
+    ],
+    # Dependency tree generation task
+    "PROMPT_DEPENDENCY_TREE": [
         ("system", SYSTEM_PROMPT_DEPENDENCY_TREE),
         ("human", HUMAN_PROMPT_DEPENDENCY_TREE),
         ("placeholder", "{agent_scratchpad}"),
-    ]
+    ],
+}
+
+# Variables that change from one call of a chain to the next within a run
+PER_CALL_VARIABLES = (
+    "dependency_summaries",
+    "changed_lines",
+    "code_file",
+    "code_file_path",
+    "file_module_summaries",
+    "module_name",
+    "agent_scratchpad",
 )
+
+
+def cacheable_prefix(name: str, **run_variables) -> list[tuple[str, str]]:
+    """
+    Render the part of a prompt that is the same for every call in a run.
+
+    This is the prefix a provider can serve from its prompt cache: the
+    messages up to the first per-call variable, rendered with the run
+    variables.
+
+    Args:
+        name (str): The prompt name, a key of ``PROMPT_MESSAGES``.
+        **run_variables: Values of the variables that are fixed for the run
+            (``language``, ``framework``, ``tool_names``).
+
+    Returns:
+        list[tuple[str, str]]: The (role, text) messages of the prefix.
+    """
+    prefix = []
+    for role, template in PROMPT_MESSAGES[name]:
+        positions = [
+            template.find("{" + variable + "}")
+            for variable in PER_CALL_VARIABLES
+            if "{" + variable + "}" in template
+        ]
+        if not positions:
+            prefix.append((role, template.format(**run_variables)))
+            continue
+        head = template[: min(positions)]
+        if head:
+            prefix.append((role, head.format(**run_variables)))
+        break
+    return prefix
+
+
+def __getattr__(name):
+    """
+    Create the ChatPromptTemplate instances on first access.
+
+    Args:
+        name (str): The attribute being looked up on the module.
+
+    Returns:
+        ChatPromptTemplate: The prompt template.
+
+    Raises:
+        AttributeError: If the attribute is not provided by this module.
+    """
+    if name in PROMPT_MESSAGES:
+        chat = importlib.import_module("langchain_core.prompts.chat")
+        prompt = chat.ChatPromptTemplate.from_messages(PROMPT_MESSAGES[name])
+        globals()[name] = prompt  # Cache so later lookups skip __getattr__
+        return prompt
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
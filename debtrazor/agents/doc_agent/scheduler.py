@@ -0,0 +1,142 @@
+"""
+Dependency-ordered scheduling of the files of a repository.
+
+Files are grouped into topological levels of their internal dependency graph,
+so the files a file imports are documented (and summarized) before it, and
+the files of one level can be documented in parallel.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from debtrazor.schema.tree import DependencyTree
+from debtrazor.utils.graph import topological_levels
+from debtrazor.utils.logging import logger
+from debtrazor.utils.util import is_ignored
+
+
+def list_source_files(entry_path: str, ignore_list: list[str], extension: str):
+    """
+    List the files the DocAgent documents, skipping ignored entries.
+
+    Args:
+        entry_path (str): The repository root.
+        ignore_list (list[str]): Patterns of entry names to ignore.
+        extension (str): Extension of the source files, e.g. ``.py``.
+
+    Returns:
+        list[str]: The file paths relative to ``entry_path``, sorted.
+    """
+    files = []
+    directories = [""]
+    while directories:
+        relative_directory = directories.pop()
+        try:
+            entries = list(os.scandir(os.path.join(entry_path, relative_directory)))
+        except OSError:
+            continue
+        for entry in entries:
+            if is_ignored(entry.name, ignore_list):
+                continue
+            relative_path = os.path.join(relative_directory, entry.name)
+            if entry.is_dir():
+                directories.append(relative_path)
+            elif entry.name.endswith(extension):
+                files.append(relative_path)
+    return sorted(files)
+
+
+def run_dependency_tool(
+    tool, file_path: str, entry_path: str | None = None
+) -> list[str] | None:
+    """
+    Run a dependency tool directly on one file, without the model.
+
+    Args:
+        tool (BaseTool): The dependency tool, e.g. ``pydeps``.
+        file_path (str): The path of the file.
+        entry_path (str | None): The repository root, passed to the tools
+            resolving paths against it (e.g. ``cdeps``).
+
+    Returns:
+        list[str] | None: The dependencies reported for the file, relative to
+        its directory, or None if the tool failed.
+    """
+    arguments = {"file_path": file_path}
+    if entry_path is not None and "entry_path" in tool.args:
+        arguments["entry_path"] = entry_path
+    try:
+        result = tool.func(**arguments)
+    except Exception as e:
+        logger.info("Dependency tool failed on %s: %s", file_path, e)
+        return None
+    if isinstance(result, DependencyTree):
+        return result.dependencies or []
+    logger.info("No dependencies for %s: %s", file_path, result)
+    return None
+
+
+def extract_dependencies(entry_path: str, files: list[str], tool, max_workers=4):
+    """
+    Run a dependency tool directly on every file, without the model.
+
+    Args:
+        entry_path (str): The repository root.
+        files (list[str]): File paths relative to ``entry_path``.
+        tool (BaseTool): The dependency tool, e.g. ``pydeps``.
+        max_workers (int): Number of files processed at once.
+
+    Returns:
+        dict[str, list[str] | None]: The dependencies reported for each file,
+        relative to the file's directory, or None if the tool failed.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(
+            zip(
+                files,
+                pool.map(
+                    lambda relative_path: run_dependency_tool(
+                        tool, os.path.join(entry_path, relative_path), entry_path
+                    ),
+                    files,
+                ),
+            )
+        )
+
+
+def resolve_dependencies(relative_path: str, dependencies) -> list[str]:
+    """
+    Turn the dependencies reported for a file into repository paths.
+
+    Args:
+        relative_path (str): The file path relative to the repository root.
+        dependencies (list[str] | None): Paths relative to the file's
+            directory, as reported by the dependency tools.
+
+    Returns:
+        list[str]: The dependency paths relative to the repository root.
+    """
+    directory = os.path.dirname(relative_path)
+    return [
+        os.path.normpath(os.path.join(directory, dependency))
+        for dependency in dependencies or []
+    ]
+
+
+def plan_levels(dependencies: dict) -> list[list[str]]:
+    """
+    Order files by their internal dependencies.
+
+    Args:
+        dependencies (dict[str, list[str] | None]): Reported dependencies per
+            file, see ``extract_dependencies``.
+
+    Returns:
+        list[list[str]]: Topological levels of the files; dependencies on
+        files outside ``dependencies`` are ignored.
+    """
+    graph = {
+        relative_path: resolve_dependencies(relative_path, reported)
+        for relative_path, reported in dependencies.items()
+    }
+    return [sorted(level) for level in topological_levels(graph)]
@@ -0,0 +1,276 @@
+"""
+Compact, versioned serialization of DocAgent checkpoints.
+
+The default LangGraph serializer stores every message with all of its
+metadata (ids, response metadata, token usage) and repeats the same directory
+paths in every message and dependency list, on every step. This serializer
+keeps only what a resumed run reads:
+
+- messages are reduced to their type, content and ``additional_kwargs`` (the
+  file name and directory of a summary), with the directories interned;
+- ``dependencies_per_file`` is stored as a table of the distinct paths and,
+  per file, the indexes of its dependencies.
+
+Everything is encoded with msgpack behind a version byte. Values it cannot
+encode losslessly (e.g. errors or tool calls) and checkpoints written in the
+default format are handled by the default serializer.
+"""
+
+import ormsgpack
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# Type tag stored with each checkpoint and write, and the current version of
+# the layout behind it
+FORMAT = "debtrazor-msgpack"
+VERSION = 1
+
+# Types msgpack would otherwise convert silently (dataclasses such as
+# langgraph's Interrupt to dicts, tuples to lists, UUIDs, datetimes and enums
+# to their value) are passed to ``_default``: tuples are encoded as such, the
+# others go to the fallback instead of coming back as another type
+_PACK_OPTIONS = (
+    ormsgpack.OPT_PASSTHROUGH_DATACLASS
+    | ormsgpack.OPT_PASSTHROUGH_DATETIME
+    | ormsgpack.OPT_PASSTHROUGH_UUID
+    | ormsgpack.OPT_PASSTHROUGH_ENUM
+    | ormsgpack.OPT_PASSTHROUGH_TUPLE
+)
+
+_EXT_MESSAGE = 1
+_EXT_MESSAGES = 2
+_EXT_DEPENDENCIES = 3
+_EXT_TUPLE = 4
+
+_MESSAGE_TYPES = {
+    "ai": AIMessage,
+    "human": HumanMessage,
+    "system": SystemMessage,
+}
+
+
+class _StringTable:
+    """
+    Interns strings, assigning each distinct string an index.
+    """
+
+    def __init__(self, strings=()):
+        self.strings = list(strings)
+        self.index = {string: i for i, string in enumerate(self.strings)}
+
+    def add(self, string: str) -> int:
+        if string not in self.index:
+            self.index[string] = len(self.strings)
+            self.strings.append(string)
+        return self.index[string]
+
+
+def _pack_message(message) -> list:
+    """
+    Reduce a message to its type, content and additional kwargs.
+
+    Args:
+        message (BaseMessage): The message.
+
+    Returns:
+        list: ``[type, content, additional_kwargs]``.
+
+    Raises:
+        TypeError: If the message carries data that would be lost, e.g. tool
+            calls.
+    """
+    if _MESSAGE_TYPES.get(message.type) is not type(message) or getattr(
+        message, "tool_calls", None
+    ):
+        raise TypeError(f"Message not supported by {FORMAT}: {type(message)}")
+    return [message.type, message.content, message.additional_kwargs]
+
+
+def _unpack_message(message_type: str, content, additional_kwargs: dict):
+    return _MESSAGE_TYPES[message_type](
+        content=content, additional_kwargs=additional_kwargs
+    )
+
+
+def _pack_messages(messages: list) -> ormsgpack.Ext:
+    """
+    Encode the messages of the state with their directories interned.
+
+    Args:
+        messages (list[BaseMessage]): The messages.
+
+    Returns:
+        ormsgpack.Ext: The encoded messages.
+    """
+    directories = _StringTable()
+    packed = []
+    for message in messages:
+        message_type, content, kwargs = _pack_message(message)
+        kwargs = dict(kwargs)
+        directory = kwargs.pop("directory_path", None)
+        packed.append(
+            [
+                message_type,
+                content,
+                -1 if directory is None else directories.add(directory),
+                kwargs,
+            ]
+        )
+    return ormsgpack.Ext(
+        _EXT_MESSAGES,
+        ormsgpack.packb(
+            [directories.strings, packed], default=_default, option=_PACK_OPTIONS
+        ),
+    )
+
+
+def _unpack_messages(data: bytes) -> list:
+    directories, packed = ormsgpack.unpackb(data, ext_hook=_ext_hook)
+    messages = []
+    for message_type, content, directory, kwargs in packed:
+        if directory >= 0:
+            kwargs["directory_path"] = directories[directory]
+        messages.append(_unpack_message(message_type, content, kwargs))
+    return messages
+
+
+def _pack_dependencies(dependencies_per_file: dict) -> ormsgpack.Ext:
+    """
+    Encode the dependencies per file as a path-indexed table.
+
+    Args:
+        dependencies_per_file (dict[str, list[str] | None]): Dependencies of
+            each file.
+
+    Returns:
+        ormsgpack.Ext: The encoded dependencies.
+    """
+    paths = _StringTable()
+    files = []
+    for path, dependencies in dependencies_per_file.items():
+        files.append(
+            [
+                paths.add(path),
+                (
+                    None
+                    if dependencies is None
+                    else [paths.add(dependency) for dependency in dependencies]
+                ),
+            ]
+        )
+    return ormsgpack.Ext(_EXT_DEPENDENCIES, ormsgpack.packb([paths.strings, files]))
+
+
+def _unpack_dependencies(data: bytes) -> dict:
+    paths, files = ormsgpack.unpackb(data)
+    return {
+        paths[path]: (
+            None if dependencies is None else [paths[i] for i in dependencies]
+        )
+        for path, dependencies in files
+    }
+
+
+def _default(obj):
+    # Tuples, e.g. of tasks; the fallback would return lists too
+    if type(obj) is tuple:
+        return ormsgpack.Ext(
+            _EXT_TUPLE,
+            ormsgpack.packb(list(obj), default=_default, option=_PACK_OPTIONS),
+        )
+    # Messages outside the messages channel, e.g. in pending writes
+    if hasattr(obj, "type") and hasattr(obj, "additional_kwargs"):
+        return ormsgpack.Ext(
+            _EXT_MESSAGE,
+            ormsgpack.packb(_pack_message(obj), default=_default, option=_PACK_OPTIONS),
+        )
+    raise TypeError(f"Type not supported by {FORMAT}: {type(obj)}")
+
+
+def _ext_hook(code: int, data: bytes):
+    if code == _EXT_MESSAGE:
+        return _unpack_message(*ormsgpack.unpackb(data, ext_hook=_ext_hook))
+    if code == _EXT_MESSAGES:
+        return _unpack_messages(data)
+    if code == _EXT_DEPENDENCIES:
+        return _unpack_dependencies(data)
+    if code == _EXT_TUPLE:
+        return tuple(ormsgpack.unpackb(data, ext_hook=_ext_hook))
+    raise ValueError(f"Unknown {FORMAT} extension type: {code}")
+
+
+class CompactCheckpointSerializer(SerializerProtocol):
+    """
+    Checkpoint serializer storing the DocAgent state in a compact layout.
+    """
+
+    def __init__(self, fallback: SerializerProtocol | None = None):
+        """
+        Initialize the serializer.
+
+        Args:
+            fallback (SerializerProtocol | None): Serializer of the values
+                this one does not encode and of checkpoints in other formats.
+                Defaults to the LangGraph serializer.
+        """
+        self.fallback = fallback or JsonPlusSerializer()
+
+    def _compact(self, obj):
+        # Only whole checkpoints carry the state channels
+        if not (isinstance(obj, dict) and isinstance(obj.get("channel_values"), dict)):
+            return obj
+        values = dict(obj["channel_values"])
+        if isinstance(values.get("messages"), list):
+            values["messages"] = _pack_messages(values["messages"])
+        if isinstance(values.get("dependencies_per_file"), dict):
+            values["dependencies_per_file"] = _pack_dependencies(
+                values["dependencies_per_file"]
+            )
+        return {**obj, "channel_values": values}
+
+    def dumps(self, obj) -> bytes:
+        return self.fallback.dumps(obj)
+
+    def loads(self, data: bytes):
+        return self.fallback.loads(data)
+
+    def dumps_typed(self, obj) -> tuple[str, bytes]:
+        """
+        Serialize a checkpoint or a pending write.
+
+        Args:
+            obj (Any): The value to serialize.
+
+        Returns:
+            tuple[str, bytes]: The format tag and the encoded value.
+        """
+        try:
+            data = ormsgpack.packb(
+                self._compact(obj), default=_default, option=_PACK_OPTIONS
+            )
+        except (TypeError, ormsgpack.MsgpackEncodeError):
+            return self.fallback.dumps_typed(obj)
+        return FORMAT, bytes([VERSION]) + data
+
+    def loads_typed(self, data: tuple[str, bytes]):
+        """
+        Deserialize a value written by ``dumps_typed`` or by the fallback.
+
+        Args:
+            data (tuple[str, bytes]): The format tag and the encoded value.
+
+        Returns:
+            Any: The value.
+
+        Raises:
+            ValueError: If the value was written by an unknown version.
+        """
+        type_, payload = data
+        if type_ != FORMAT:
+            return self.fallback.loads_typed(data)
+        if payload[0] != VERSION:
+            raise ValueError(
+                f"Unsupported {FORMAT} version {payload[0]}, expected {VERSION}"
+            )
+        return ormsgpack.unpackb(payload[1:], ext_hook=_ext_hook)
@@ -0,0 +1,319 @@
+"""
+Detection of duplicated source files, to reuse their documentation.
+
+Every documented file gets a fingerprint: the digest of its code, for exact
+copies, and a MinHash signature of its token shingles, for near copies
+(vendored or copy-pasted modules with small edits). The fingerprints are
+journaled with the documentation, and a ``SimilarityIndex`` built from them
+finds the already documented twin of a file:
+
+- an exact copy reuses the twin's documented code and summary as is;
+- a near copy gets the twin's comments carried over to the lines the two
+  files share (``transfer_comments``), and the model is only asked about the
+  changed lines.
+"""
+
+import difflib
+import hashlib
+import random
+import re
+import textwrap
+import threading
+from typing import NamedTuple
+
+from debtrazor.agents.doc_agent.patch import split_lines
+from debtrazor.schema.insertion import Insertion
+
+# Tokens of the normalized code: identifiers, numbers and single symbols, so
+# whitespace and layout changes do not count as differences
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Tokens per shingle
+SHINGLE_SIZE = 5
+
+# MinHash permutations, compared in LSH bands of ``ROWS_PER_BAND`` rows.
+# With 16 bands of 4 rows, files of similarity 0.8 share a band with a
+# probability over 0.99, files of similarity 0.3 with one of 0.12.
+NUM_PERMUTATIONS = 64
+ROWS_PER_BAND = 4
+
+_PRIME = (1 << 61) - 1
+_random = random.Random(42)  # Fixed, fingerprints are journaled
+_PERMUTATIONS = [
+    (_random.randrange(1, _PRIME), _random.randrange(0, _PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+class Fingerprint(NamedTuple):
+    """
+    What identifies the content of a source file.
+
+    Attributes:
+        digest (str): SHA-256 of the code.
+        minhash (tuple[int, ...]): MinHash signature of the token shingles;
+            empty for code without tokens.
+    """
+
+    digest: str
+    minhash: tuple[int, ...]
+
+
+def digest(code: str) -> str:
+    """
+    Compute the digest identifying exact copies of some code.
+
+    Args:
+        code (str): The code.
+
+    Returns:
+        str: The SHA-256 hex digest.
+    """
+    return hashlib.sha256(code.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def fingerprint(code: str) -> Fingerprint:
+    """
+    Compute the fingerprint of some code.
+
+    Args:
+        code (str): The code.
+
+    Returns:
+        Fingerprint: The fingerprint.
+    """
+    tokens = _TOKEN.findall(code)
+    shingles = {
+        " ".join(tokens[i : i + SHINGLE_SIZE])
+        for i in range(max(len(tokens) - SHINGLE_SIZE + 1, 1 if tokens else 0))
+    }
+    if not shingles:
+        return Fingerprint(digest(code), ())
+    hashes = [
+        int.from_bytes(
+            hashlib.blake2b(
+                shingle.encode("utf-8", "surrogatepass"), digest_size=8
+            ).digest(),
+            "big",
+        )
+        for shingle in shingles
+    ]
+    minhash = tuple(
+        min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS
+    )
+    return Fingerprint(digest(code), minhash)
+
+
+def similarity(a: Fingerprint, b: Fingerprint) -> float:
+    """
+    Estimate the Jaccard similarity of the shingles of two files.
+
+    Args:
+        a (Fingerprint): The first fingerprint.
+        b (Fingerprint): The second fingerprint.
+
+    Returns:
+        float: The estimate, between 0 and 1.
+    """
+    if a.digest == b.digest:
+        return 1.0
+    if not a.minhash or len(a.minhash) != len(b.minhash):
+        return 0.0
+    return sum(x == y for x, y in zip(a.minhash, b.minhash)) / len(a.minhash)
+
+
+class SimilarityIndex:
+    """
+    Fingerprints of the documented files, searchable by exact and near copy.
+    """
+
+    def __init__(self):
+        self.fingerprints: dict[str, Fingerprint] = {}
+        self._digests: dict[str, str] = {}
+        self._bands: dict[tuple, set[str]] = {}
+        self._lock = threading.Lock()
+        # Last journal row added, see DocAgent._similarity_index
+        self.rowid = 0
+
+    def add(self, path: str, fingerprint: Fingerprint):
+        """
+        Add or replace the fingerprint of a documented file.
+
+        Args:
+            path (str): The file path relative to the entry path.
+            fingerprint (Fingerprint): The fingerprint of its code.
+        """
+        with self._lock:
+            # Copies keep pointing to the first documented file, whose summary
+            # is the most likely to be done
+            twin = self._digests.get(fingerprint.digest)
+            if twin is None or self.fingerprints[twin].digest != fingerprint.digest:
+                self._digests[fingerprint.digest] = path
+            self.fingerprints[path] = fingerprint
+            for band in range(0, len(fingerprint.minhash), ROWS_PER_BAND):
+                key = (band, fingerprint.minhash[band : band + ROWS_PER_BAND])
+                self._bands.setdefault(key, set()).add(path)
+
+    def find(
+        self, fingerprint: Fingerprint, threshold: float | None, exclude: str = None
+    ) -> tuple[str, float] | None:
+        """
+        Find the documented file most similar to some code.
+
+        Args:
+            fingerprint (Fingerprint): The fingerprint of the code.
+            threshold (float | None): Minimum similarity of a near copy; None
+                only finds exact copies.
+            exclude (str): A path never returned, the file itself.
+
+        Returns:
+            tuple[str, float] | None: The path of the twin and the estimated
+            similarity (1.0 for an exact copy), or None if there is none.
+        """
+        with self._lock:
+            path = self._digests.get(fingerprint.digest)
+            # Entries replaced since (the file changed) are stale
+            if (
+                path is not None
+                and path != exclude
+                and self.fingerprints[path].digest == fingerprint.digest
+            ):
+                return path, 1.0
+            if threshold is None:
+                return None
+            candidates = set()
+            for band in range(0, len(fingerprint.minhash), ROWS_PER_BAND):
+                key = (band, fingerprint.minhash[band : band + ROWS_PER_BAND])
+                candidates.update(self._bands.get(key, ()))
+            candidates.discard(exclude)
+            scored = [
+                (similarity(fingerprint, self.fingerprints[path]), path)
+                for path in sorted(candidates)
+            ]
+        best = max(scored, default=None, key=lambda item: item[0])
+        if best is None or best[0] < threshold:
+            return None
+        return best[1], best[0]
+
+
+def _added_lines(
+    source_lines: list[str], documented_lines: list[str]
+) -> list[tuple[int, list[str]]]:
+    """
+    Find the lines the documentation added to some code.
+
+    Code lines the model appended a trailing comment to are matched to their
+    original line, so the comments above them are still found.
+
+    Args:
+        source_lines (list[str]): The lines of the code.
+        documented_lines (list[str]): The lines of the documented code.
+
+    Returns:
+        list[tuple[int, list[str]]]: The index of the code line each block of
+        added lines goes before, and the block.
+    """
+    added = []
+    matcher = difflib.SequenceMatcher(
+        None, source_lines, documented_lines, autojunk=False
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "insert":
+            added.append((i1, documented_lines[j1:j2]))
+        elif tag == "replace":
+            blocks = []
+            block = []
+            index = i1
+            for line in documented_lines[j1:j2]:
+                if (
+                    index < i2
+                    and line.rstrip().startswith(source_lines[index].rstrip())
+                    and source_lines[index].strip()
+                ):
+                    if block:
+                        blocks.append((index, block))
+                    block = []
+                    index += 1
+                else:
+                    block.append(line)
+            # Otherwise the model changed the code, its comments are dropped
+            if index == i2:
+                added.extend(blocks)
+                if block:
+                    added.append((index, block))
+    return added
+
+
+def transfer_comments(
+    source: str, documented: str, target: str
+) -> tuple[list[Insertion], list[int]]:
+    """
+    Carry the comments of a documented file over to a near copy of it.
+
+    The lines the documentation added to ``source`` are found by diffing it
+    with ``documented``, and anchored to the same code lines of ``target``.
+    Comments of code that is not in ``target`` are left out, as are the ones
+    the model wrote on code lines (trailing comments), which cannot be told
+    apart from code changes.
+
+    Args:
+        source (str): The code of the documented twin.
+        documented (str): The documented code of the twin.
+        target (str): The code of the near copy.
+
+    Returns:
+        tuple[list[Insertion], list[int]]: The insertions for ``target``, and
+        the numbers of its non-blank lines that are not in ``source``, which
+        still need documentation.
+    """
+    source_lines = split_lines(source)
+    target_lines = split_lines(target)
+
+    # Index of each source line in the target, for the lines they share
+    to_target = {}
+    matcher = difflib.SequenceMatcher(None, source_lines, target_lines, autojunk=False)
+    for i, j, size in matcher.get_matching_blocks():
+        for offset in range(size):
+            to_target[i + offset] = j + offset
+    shared = set(to_target.values())
+    changed = [
+        number
+        for number, line in enumerate(target_lines, 1)
+        if number - 1 not in shared and line.strip()
+    ]
+
+    insertions = []
+    for index, lines in _added_lines(source_lines, split_lines(documented)):
+        text = textwrap.dedent("".join(lines)).strip("\r\n")
+        if not text.strip():
+            continue
+        # Anchored to the next line, or below the previous one if the next
+        # line changed (e.g. docstrings below an unchanged header)
+        if index in to_target:
+            insertions.append(Insertion(line=to_target[index] + 1, text=text))
+        elif index - 1 in to_target:
+            insertions.append(
+                Insertion(line=to_target[index - 1] + 1, placement="after", text=text)
+            )
+    return insertions, changed
+
+
+def line_ranges(numbers: list[int]) -> str:
+    """
+    Describe line numbers as ranges, e.g. ``3-7, 12``.
+
+    Args:
+        numbers (list[int]): The line numbers, in increasing order.
+
+    Returns:
+        str: The ranges.
+    """
+    ranges = []
+    for number in numbers:
+        if ranges and ranges[-1][1] == number - 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ", ".join(
+        str(start) if start == end else f"{start}-{end}" for start, end in ranges
+    )
@@ -15,10 +15,21 @@ class DocAgentState(AgentState):
         items_to_process (list[str]): A list of items (files/directories) that need to be processed.
         directory_structure (str): The structure of the directory being processed.
         directory_stack (list[dict[str, Any]]): A stack to keep track of directory states.
-        dependencies_per_file (dict[str, Any]): A dictionary to track dependencies for each file.
+        dependencies_per_file (dict[str, Any]): A dictionary to track dependencies for each file,
+            keyed by path relative to entry_path, with the dependency paths
+            relative to entry_path too.
         legacy_language (str): The legacy programming language being documented.
         legacy_framework (str): The legacy framework being documented.
         indent (str): The indentation style used in the documentation.
+        completed_subtrees (dict[str, Any]): Subtrees documented separately, keyed
+            by path relative to entry_path, with their "readme" and
+            "directory_structure" to merge instead of walking them.
+        file_summaries (dict[str, Any]): Files documented by the schedule or
+            batch node, keyed by path relative to entry_path, with their
+            "summary" and "dependencies".
+        journal_path (str): SQLite journal of the completed sub-steps of each
+            file and directory, see ``Journal``.
+        finalized (bool): True once the README of the entry path is written.
     """
 
     entry_path: str
@@ -34,3 +45,7 @@ class DocAgentState(AgentState):
     legacy_framework: str
     indent: str
     document_or_skip_current_file: bool
+    completed_subtrees: dict[str, Any]
+    file_summaries: dict[str, Any]
+    journal_path: str
+    finalized: bool
@@ -0,0 +1,233 @@
+import time
+import functools
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+from debtrazor.utils.logging import logger
+from debtrazor.utils.metrics import (
+    TOKEN_BUCKETS,
+    MetricsRegistry,
+    metrics as default_metrics,
+)
+
+
+def timed_node(name: str, func, registry: MetricsRegistry | None = None):
+    """
+    Wrap a graph node so its run time is recorded.
+
+    Args:
+        name (str): The node name, used as the ``node`` label.
+        func (Callable): The node function.
+        registry (MetricsRegistry | None): Registry to record to. Defaults to
+            the application registry.
+
+    Returns:
+        Callable: The wrapped node with the same signature.
+    """
+    registry = registry or default_metrics
+
+    @functools.wraps(func)
+    def wrapper(state):
+        with registry.time("debtrazor_node_seconds", node=name):
+            return func(state)
+
+    return wrapper
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler recording chain latency and token usage.
+
+    Only chains whose run name is in ``chain_names`` are timed; model calls
+    are attributed to the closest such chain.
+    """
+
+    def __init__(self, chain_names, registry: MetricsRegistry | None = None):
+        """
+        Initialize the handler.
+
+        Args:
+            chain_names (Iterable[str]): Run names of the chains to track.
+            registry (MetricsRegistry | None): Registry to record to. Defaults
+                to the application registry.
+        """
+        self.chain_names = set(chain_names)
+        self.registry = registry or default_metrics
+        self._runs: dict[UUID, tuple[str, float]] = {}
+        self._parents: dict[UUID, str] = {}
+
+    def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ):
+        name = kwargs.get("name")
+        if name in self.chain_names:
+            self._runs[run_id] = (name, time.perf_counter())
+            self._parents[run_id] = name
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        self._finish_chain(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._finish_chain(run_id)
+
+    def _finish_chain(self, run_id: UUID):
+        run = self._runs.pop(run_id, None)
+        self._parents.pop(run_id, None)
+        if run is not None:
+            name, start = run
+            self.registry.observe(
+                "debtrazor_chain_seconds", time.perf_counter() - start, chain=name
+            )
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ):
+        if parent_run_id in self._parents:
+            self._parents[run_id] = self._parents[parent_run_id]
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        chain = self._parents.pop(run_id, "unknown")
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or usage
+        if not usage:
+            return
+        self.registry.inc(
+            "debtrazor_llm_prompt_tokens_total",
+            usage.get("input_tokens", 0),
+            chain=chain,
+        )
+        self.registry.inc(
+            "debtrazor_llm_completion_tokens_total",
+            usage.get("output_tokens", 0),
+            chain=chain,
+        )
+        # Prompt prefix served from the provider's cache, reported per call
+        # so the effect of the prompt layout can be checked
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        self.registry.inc(
+            "debtrazor_llm_cached_prompt_tokens_total", cached, chain=chain
+        )
+        self.registry.observe(
+            "debtrazor_llm_cached_prompt_tokens",
+            cached,
+            buckets=TOKEN_BUCKETS,
+            chain=chain,
+        )
+        logger.debug(
+            "%s call: %s prompt tokens, %s cached",
+            chain,
+            usage.get("input_tokens", 0),
+            cached,
+        )
+
+
+class InstrumentedCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpoint saver that times every operation of the saver it wraps.
+    """
+
+    def __init__(
+        self, saver: BaseCheckpointSaver, registry: MetricsRegistry | None = None
+    ):
+        """
+        Initialize the wrapper.
+
+        Args:
+            saver (BaseCheckpointSaver): The saver doing the actual work.
+            registry (MetricsRegistry | None): Registry to record to. Defaults
+                to the application registry.
+        """
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.registry = registry or default_metrics
+
+    def __getattr__(self, name):
+        # Anything not instrumented (e.g. saver specific helpers) is delegated;
+        # methods BaseCheckpointSaver defines never get here and are
+        # forwarded explicitly below
+        if name == "saver":
+            raise AttributeError(name)
+        return getattr(self.saver, name)
+
+    @property
+    def config_specs(self):
+        return self.saver.config_specs
+
+    def _timed(self, operation, func, *args, **kwargs):
+        with self.registry.time("debtrazor_checkpoint_seconds", operation=operation):
+            return func(*args, **kwargs)
+
+    async def _atimed(self, operation, func, *args, **kwargs):
+        with self.registry.time("debtrazor_checkpoint_seconds", operation=operation):
+            return await func(*args, **kwargs)
+
+    def get_tuple(self, config):
+        return self._timed("get_tuple", self.saver.get_tuple, config)
+
+    def list(self, config, **kwargs):
+        return self.saver.list(config, **kwargs)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        return self._timed(
+            "put", self.saver.put, config, checkpoint, metadata, new_versions
+        )
+
+    def put_writes(self, config, writes, task_id, *args, **kwargs):
+        return self._timed(
+            "put_writes",
+            self.saver.put_writes,
+            config,
+            writes,
+            task_id,
+            *args,
+            **kwargs,
+        )
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
+
+    def delete_thread(self, thread_id):
+        return self.saver.delete_thread(thread_id)
+
+    async def aget_tuple(self, config):
+        return await self._atimed("get_tuple", self.saver.aget_tuple, config)
+
+    def alist(self, config, **kwargs):
+        return self.saver.alist(config, **kwargs)
+
+    async def adelete_thread(self, thread_id):
+        return await self.saver.adelete_thread(thread_id)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await self._atimed(
+            "put", self.saver.aput, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(self, config, writes, task_id, *args, **kwargs):
+        return await self._atimed(
+            "put_writes",
+            self.saver.aput_writes,
+            config,
+            writes,
+            task_id,
+            *args,
+            **kwargs,
+        )
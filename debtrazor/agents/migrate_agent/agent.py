@@ -0,0 +1,597 @@
+import os
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from debtrazor.agents.agent import Agent
+from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from debtrazor.agents.migrate_agent.prompts import (
+    DEPENDENCY_CONTEXT_PROMPT,
+    PROMPT_MIGRATE,
+)
+from debtrazor.agents.migrate_agent.state import MigrateAgentState
+from debtrazor.agents.instrumentation import (
+    InstrumentedCheckpointSaver,
+    MetricsCallbackHandler,
+    timed_node,
+)
+from debtrazor.agents.doc_agent.journal import get_journal
+from debtrazor.agents.doc_agent.scheduler import list_source_files
+from debtrazor.utils.metrics import metrics
+from debtrazor.utils.tokens import count_tokens, split_by_tokens
+from debtrazor.utils.sniff import FileLimits, read_source, skip_reason
+from debtrazor.utils.graph import component_levels
+from debtrazor.utils.summary_store import STORE_FILE, SummaryStore
+from debtrazor.utils.logging import logger, add_to_log_queue, forward_progress
+from debtrazor.constants import supported_langs
+from debtrazor.utils.util import parse_code_string
+
+
+def target_path(relative_path: str, new_language: str) -> str:
+    """
+    Return the path of the migrated version of a file.
+
+    Args:
+        relative_path (str): The file path relative to the repository root.
+        new_language (str): The language to migrate to.
+
+    Returns:
+        str: The path with the extension of the new language, or unchanged if
+        the language has no known extension.
+    """
+    extension = supported_langs.get(new_language)
+    if extension is None:
+        return relative_path
+    return os.path.splitext(relative_path)[0] + extension
+
+
+def plan_waves(dependencies_per_file: dict) -> list[list[list[str]]]:
+    """
+    Group files into the waves in which they can be migrated.
+
+    The files of a dependency cycle form one unit, migrated as a whole. Every
+    unit comes after the units it depends on, so the number of waves is the
+    depth of the dependency graph and not the number of files.
+
+    Args:
+        dependencies_per_file (dict): Each file mapped to the files it depends
+            on, all relative to the repository root. Dependencies on files
+            that are not keys are ignored.
+
+    Returns:
+        list[list[list[str]]]: The waves, each a list of units, each a sorted
+        list of files.
+    """
+    return [
+        sorted(sorted(unit) for unit in level)
+        for level in component_levels(dependencies_per_file)
+    ]
+
+
+def _skip_migration(
+    path: str, file_limits: FileLimits, model_name: str | None = None
+) -> bool:
+    """
+    Decide whether a source file is left out of the migration.
+
+    Like the documentation, binary, minified and generated files are skipped,
+    and files over the token limit if ``oversize`` is "skip".
+
+    Args:
+        path (str): The path of the source file.
+        file_limits (FileLimits): The configured limits.
+        model_name (str | None): The model whose tokenizer should be used.
+
+    Returns:
+        bool: True if the file is skipped.
+    """
+    if skip_reason(path, file_limits) is not None:
+        return True
+    if file_limits.oversize != "skip":
+        return False
+    return count_tokens(read_source(path), model_name) > file_limits.max_tokens
+
+
+def migration_graph(
+    state: MigrateAgentState,
+    file_limits: FileLimits,
+    model_name: str | None = None,
+) -> dict[str, list[str]]:
+    """
+    Build the dependency graph of the files to migrate.
+
+    The files of the legacy language are restricted to those the
+    documentation does not skip, and their dependencies to the files being
+    migrated.
+
+    Args:
+        state (MigrateAgentState): The initial state of the migration.
+        file_limits (FileLimits): The limits deciding which files are skipped.
+        model_name (str | None): The model whose tokenizer should be used.
+
+    Returns:
+        dict[str, list[str]]: Each file to migrate mapped to the files it
+        depends on, all relative to the entry path.
+    """
+    entry_path = state["entry_path"]
+    files = [
+        relative_path
+        for relative_path in list_source_files(
+            entry_path,
+            state["ignore_list"],
+            supported_langs[state["legacy_language"]],
+        )
+        if not _skip_migration(
+            os.path.join(entry_path, relative_path), file_limits, model_name
+        )
+    ]
+    dependencies_per_file = state.get("dependencies_per_file") or {}
+    migrating = set(files)
+    return {
+        relative_path: sorted(
+            dependency
+            for dependency in set(dependencies_per_file.get(relative_path) or [])
+            if dependency in migrating and dependency != relative_path
+        )
+        for relative_path in files
+    }
+
+
+class MigrateAgent(Agent):
+    def __init__(
+        self,
+        model,
+        tools,
+        checkpointer=None,
+        thread_id=None,
+        max_concurrency=4,
+        context_tokens=8000,
+        file_limits=None,
+    ):
+        """
+        Initialize the MigrateAgent with the given model, tools, checkpointer, and thread_id.
+
+        Args:
+            model: The model to be used by the agent.
+            tools: The tools to be used by the agent.
+            checkpointer: Optional checkpointer for state management. Either a
+                checkpoint saver or a context manager yielding one (as returned
+                by ``setup_memory``).
+            thread_id: Optional thread identifier, see ``get_config``.
+            max_concurrency: Maximum number of units of a wave migrated at
+                once.
+            context_tokens: Token budget of the migrated code of its
+                dependencies in a file's prompt. Dependencies over the budget
+                are only described by their summary.
+            file_limits: Optional ``FileLimits`` deciding which files are
+                skipped (binary, minified, generated, too large), as for the
+                documentation, and how files over the token limit are sent to
+                the model. Since a migration cannot leave code out, they are
+                migrated in pieces unless ``oversize`` is "skip".
+        """
+        super().__init__(model, tools)
+        self.max_concurrency = max_concurrency
+        self.context_tokens = context_tokens
+        self.file_limits = file_limits or FileLimits()
+        self.model_name = getattr(model, "model_name", None)
+
+        self.thread_id = thread_id + "_migrateAgent" if thread_id is not None else None
+        self.config = self.get_config(thread_id)
+
+        # Defining the chain, named and instrumented for the metrics
+        metrics_handler = MetricsCallbackHandler(["migrate_chain"])
+        self.migrate_chain = (PROMPT_MIGRATE | self.model).with_config(
+            run_name="migrate_chain", callbacks=[metrics_handler]
+        )
+
+        # creating Agent graph
+        logger.info("Creating Migrate Agent Graph")
+        graph = StateGraph(MigrateAgentState)
+        graph.add_node("plan", timed_node("plan", self.plan_node))
+        graph.add_node("migrate_wave", timed_node("migrate_wave", self.wave_node))
+        graph.set_entry_point("plan")
+        graph.add_conditional_edges(
+            "plan", self.should_continue, {"migrate_wave": "migrate_wave", "end": END}
+        )
+        graph.add_conditional_edges(
+            "migrate_wave",
+            self.should_continue,
+            {"migrate_wave": "migrate_wave", "end": END},
+        )
+
+        # compiling graph
+        if checkpointer is not None and not isinstance(
+            checkpointer, BaseCheckpointSaver
+        ):
+            checkpointer = checkpointer.__enter__()
+        if checkpointer is not None:
+            checkpointer = InstrumentedCheckpointSaver(checkpointer)
+        self.graph = graph.compile(checkpointer=checkpointer)
+
+    @staticmethod
+    def get_config(thread_id=None):
+        """
+        Build the graph run configuration for a thread.
+
+        Args:
+            thread_id: Optional thread identifier of the job.
+
+        Returns:
+            dict: The configuration to pass to the compiled graph.
+        """
+        config = {"recursion_limit": 1000}
+        if thread_id is not None:
+            config["configurable"] = {"thread_id": str(thread_id) + "_migrateAgent"}
+        return config
+
+    def __call__(self, state: MigrateAgentState, config=None):
+        """
+        Execute the agent with the given state.
+
+        Args:
+            state (MigrateAgentState): The state to be processed by the agent.
+            config (dict, optional): Run configuration from ``get_config``.
+                Defaults to the configuration of the agent's own thread.
+
+        Returns:
+            The result of the graph execution.
+        """
+        return self.graph.stream(state, config=config or self.config)
+
+    def should_continue(self, state: MigrateAgentState):
+        """
+        Decide whether waves are left to migrate.
+
+        Args:
+            state (MigrateAgentState): The current state of the agent.
+
+        Returns:
+            str: "migrate_wave" if waves are left, otherwise "end".
+        """
+        return "end" if state["finalized"] else "migrate_wave"
+
+    def plan_node(self, state: MigrateAgentState):
+        """
+        Plan the waves of the migration from the dependency graph, see
+        ``migration_graph`` and ``plan_waves``.
+
+        Args:
+            state (MigrateAgentState): The current state of the agent.
+
+        Returns:
+            dict: The updated state.
+        """
+        logger.info("on node: plan_node")
+        graph = migration_graph(state, self.file_limits, self.model_name)
+        waves = plan_waves(graph)
+        if state["new_language"] not in supported_langs:
+            logger.warning(
+                "No file extension known for %s, migrated files keep theirs",
+                state["new_language"],
+            )
+        logger.info(
+            "Migrating %d files in %d waves (%d dependency cycles)",
+            len(graph),
+            len(waves),
+            sum(len(unit) > 1 for wave in waves for unit in wave),
+        )
+        return {
+            "dependencies_per_file": graph,
+            "waves": waves,
+            "wave": 0,
+            "migrated": dict(state.get("migrated") or {}),
+            "failed": {},
+            "finalized": not waves,
+        }
+
+    def wave_node(self, state: MigrateAgentState):
+        """
+        Migrate the units of the next wave concurrently.
+
+        Up to ``max_concurrency`` units are migrated at once; the files of a
+        unit (a dependency cycle) are migrated one after the other. Each
+        migrated file is journaled, so an interrupted wave resumes with the
+        files that were not migrated yet. A file whose migration fails is
+        recorded in ``failed`` and the rest of the wave goes on.
+
+        Args:
+            state (MigrateAgentState): The current state of the agent.
+
+        Returns:
+            dict: The updated state.
+        """
+        logger.info("on node: wave_node")
+        wave = state["waves"][state["wave"]]
+        logger.info(
+            "Migrating wave %d of %d: %d units",
+            state["wave"] + 1,
+            len(state["waves"]),
+            len(wave),
+        )
+        store_path = os.path.join(state["doc_output_path"], STORE_FILE)
+        store = SummaryStore(store_path) if os.path.exists(store_path) else None
+        migrated = dict(state["migrated"])
+        failed = dict(state.get("failed") or {})
+        # Run in copies of the node's context, which carries the progress
+        # reporting of the job
+        context = contextvars.copy_context()
+        try:
+            with metrics.time("debtrazor_migration_wave_seconds"):
+                with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+                    results = list(
+                        pool.map(
+                            lambda unit: context.copy().run(
+                                self._migrate_unit, state, unit, migrated, store
+                            ),
+                            wave,
+                        )
+                    )
+        finally:
+            if store is not None:
+                store.close()
+        for unit_migrated, unit_failed in results:
+            migrated.update(unit_migrated)
+            failed.update(unit_failed)
+
+        return {
+            "wave": state["wave"] + 1,
+            "migrated": migrated,
+            "failed": failed,
+            "finalized": state["wave"] + 1 == len(state["waves"]),
+        }
+
+    def _migrate_unit(
+        self,
+        state: MigrateAgentState,
+        unit: list[str],
+        migrated: dict,
+        store: SummaryStore | None,
+    ) -> tuple[dict[str, str], dict[str, str]]:
+        """
+        Migrate the files of a unit one after the other.
+
+        Files of a dependency cycle get the migrated code of the files of the
+        cycle migrated before them. A file whose migration raises is logged
+        and left out, and the other files of the unit are still migrated.
+
+        Args:
+            state (MigrateAgentState): The current state of the agent.
+            unit (list[str]): The file paths of the unit.
+            migrated (dict): Files migrated in earlier waves.
+            store (SummaryStore | None): The summaries of the documentation.
+
+        Returns:
+            tuple[dict[str, str], dict[str, str]]: The migrated path of each
+            migrated file of the unit, and the error of each failed one.
+        """
+        unit_migrated = {}
+        unit_failed = {}
+        for relative_path in unit:
+            try:
+                unit_migrated[relative_path] = self._migrate_file(
+                    state, relative_path, unit, {**migrated, **unit_migrated}, store
+                )
+            except Exception as e:
+                logger.exception("Failed to migrate %s", relative_path)
+                metrics.inc("debtrazor_migration_failures_total")
+                unit_failed[relative_path] = f"{type(e).__name__}: {e}"
+        return unit_migrated, unit_failed
+
+    def _migrate_file(
+        self,
+        state: MigrateAgentState,
+        relative_path: str,
+        unit: list[str],
+        migrated: dict,
+        store: SummaryStore | None,
+    ) -> str:
+        """
+        Migrate one file, calling the model only once.
+
+        Code over the token limit is migrated in pieces of ``max_tokens``,
+        see ``_migrate_code``.
+
+        The documented version of the file is migrated where it exists, as
+        its comments help the model, unless the file is over the token limit:
+        its documentation may then be truncated, so its source is migrated.
+        The output is written atomically, so an existing output file is
+        always complete and is reused as is.
+
+        Args:
+            state (MigrateAgentState): The current state of the agent.
+            relative_path (str): The file path relative to the entry path.
+            unit (list[str]): The file paths of its unit.
+            migrated (dict): Files migrated so far.
+            store (SummaryStore | None): The summaries of the documentation.
+
+        Returns:
+            str: The path of the migrated file relative to the output path.
+        """
+        entry_path = state["entry_path"]
+        journal = get_journal(state.get("journal_path"))
+        new_relative_path = target_path(relative_path, state["new_language"])
+        output_file_path = os.path.join(state["output_path"], new_relative_path)
+        if os.path.exists(output_file_path):
+            # Already migrated by an earlier (possibly interrupted) run
+            metrics.inc("debtrazor_cache_hits_total", cache="migration")
+            if journal is not None and not journal.done(
+                entry_path, relative_path, "migration"
+            ):
+                journal.record(
+                    entry_path, relative_path, "migration", new_relative_path
+                )
+            return new_relative_path
+
+        code = read_source(os.path.join(entry_path, relative_path))
+        documented_path = os.path.join(
+            state["doc_output_path"], state["legacy_language"], relative_path
+        )
+        # The documentation of files over the token limit was split, or
+        # truncated to its first piece, so only their source is complete
+        pieces = split_by_tokens(code, self.file_limits.max_tokens, self.model_name)
+        if len(pieces) == 1 and os.path.exists(documented_path):
+            pieces = split_by_tokens(
+                read_source(documented_path),
+                self.file_limits.max_tokens,
+                self.model_name,
+            )
+        migrated_code = self._migrate_code(
+            state,
+            relative_path,
+            pieces,
+            self._dependency_context(state, relative_path, unit, migrated, store),
+        )
+
+        temporary_path = output_file_path + ".tmp"
+        os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+        with open(temporary_path, "w") as f:
+            f.write(migrated_code)
+        os.replace(temporary_path, output_file_path)
+        metrics.inc(
+            "debtrazor_bytes_written_total",
+            len(migrated_code.encode("utf-8")),
+            kind="migration",
+        )
+        metrics.inc("debtrazor_migrated_files_total")
+        if journal is not None:
+            journal.record(entry_path, relative_path, "migration", new_relative_path)
+        return new_relative_path
+
+    def _migrate_code(
+        self,
+        state: MigrateAgentState,
+        relative_path: str,
+        pieces: list[str],
+        dependency_context: str,
+    ) -> str:
+        """
+        Migrate the code of a file, piece by piece if it is over the token
+        limit.
+
+        Args:
+            state (MigrateAgentState): The current state of the agent.
+            relative_path (str): The file path relative to the entry path.
+            pieces (list[str]): The code, split by ``split_by_tokens``.
+            dependency_context (str): The ``dependency_context`` prompt
+                variable, see ``_dependency_context``.
+
+        Returns:
+            str: The migrated code.
+        """
+        if len(pieces) > 1:
+            logger.info(
+                "%s is over %d tokens (%d pieces), mode: chunk",
+                relative_path,
+                self.file_limits.max_tokens,
+                len(pieces),
+            )
+            metrics.inc("debtrazor_files_split_total", mode="chunk")
+        prompts = [
+            {
+                "language": state["legacy_language"],
+                "framework": state["legacy_framework"],
+                "new_language": state["new_language"],
+                "new_framework": state["new_framework"],
+                "dependency_context": dependency_context,
+                "code_file_path": (
+                    relative_path
+                    if len(pieces) == 1
+                    else f"{relative_path} (part {index} of {len(pieces)})"
+                ),
+                "code_file": piece,
+            }
+            for index, piece in enumerate(pieces, 1)
+        ]
+        messages = self.migrate_chain.batch(
+            prompts, config={"max_concurrency": self.max_concurrency}
+        )
+        return "\n".join(parse_code_string(message.content) for message in messages)
+
+    def _dependency_context(
+        self,
+        state: MigrateAgentState,
+        relative_path: str,
+        unit: list[str],
+        migrated: dict,
+        store: SummaryStore | None,
+    ) -> str:
+        """
+        Build the prompt section describing the files a file depends on.
+
+        Each dependency, and each other file of its dependency cycle, is
+        described by its summary; the code of the migrated ones is included
+        too, in order, while it fits ``context_tokens``.
+
+        Args:
+            state (MigrateAgentState): The current state of the agent.
+            relative_path (str): The file path relative to the entry path.
+            unit (list[str]): The file paths of its unit.
+            migrated (dict): Files migrated so far.
+            store (SummaryStore | None): The summaries of the documentation.
+
+        Returns:
+            str: The ``dependency_context`` prompt variable; empty if the file
+            has no dependencies.
+        """
+        dependencies = list(
+            dict.fromkeys(
+                state["dependencies_per_file"].get(relative_path, [])
+                + [path for path in unit if path != relative_path]
+            )
+        )
+        if not dependencies:
+            return ""
+        records = store.get_many(dependencies) if store is not None else {}
+        budget = self.context_tokens
+        sections = []
+        for dependency in dependencies:
+            section = f"### {dependency}"
+            if dependency in migrated:
+                section += f" (migrated to {migrated[dependency]})"
+            if dependency in records:
+                section += f"\n{records[dependency]['summary']}"
+            if dependency in migrated:
+                try:
+                    code = read_source(
+                        os.path.join(state["output_path"], migrated[dependency])
+                    )
+                except OSError:
+                    code = None
+                if code is not None:
+                    tokens = count_tokens(code, self.model_name)
+                    if tokens <= budget:
+                        budget -= tokens
+                        section += f"\n```\n{code}\n```"
+            sections.append(section)
+        return DEPENDENCY_CONTEXT_PROMPT.format(dependencies="\n\n".join(sections))
+
+    @staticmethod
+    async def stream_events(events, log_queue):
+        """
+        Stream events and add them to the log queue.
+
+        Args:
+            events: The events to be streamed.
+            log_queue: The log queue to add the events to.
+        """
+        # The graph runs synchronously; pull each step in a worker thread so
+        # that other jobs sharing the event loop keep making progress
+        with forward_progress(log_queue):
+            while True:
+                event = await asyncio.to_thread(next, events, None)
+                if event is None:
+                    break
+                if "plan" in event:
+                    await add_to_log_queue(
+                        f"Planned {len(event['plan']['waves'])} migration waves",
+                        log_queue,
+                    )
+                elif "migrate_wave" in event:
+                    update = event["migrate_wave"]
+                    message = (
+                        f"Migrated wave {update['wave']}: "
+                        f"{len(update['migrated'])} files migrated"
+                    )
+                    if update["failed"]:
+                        message += f", {len(update['failed'])} failed"
+                    await add_to_log_queue(message, log_queue)
@@ -0,0 +1,74 @@
+import importlib
+
+# Laid out for provider-side prompt caching like the documentation prompts:
+# the system prompt is static, the run context (languages, frameworks) opens
+# the human message and the per-call content (dependencies, code) comes last.
+
+# Run context opening every human message
+CONTEXT_PROMPT = """Language/framework of the codebase: {language} {framework}
+Language/framework to migrate to: {new_language} {new_framework}
+
+"""
+
+# System prompt template for migrating a code file to the new language
+SYSTEM_PROMPT_MIGRATE = """You are playing the role of senior Google engineer. As
+ senior engineer at Google, you are an expert at migrating large codebases
+ from one language or framework to another without changing their behaviour.
+ Your personal goal is to produce idiomatic code in the new language/framework
+ that is easy to understand and maintain for anyone who reads it. \n\n
+ Current Task: Given a documented code file as input in the language/framework
+ of the codebase, you need to rewrite it in the language/framework to migrate
+ to. Keep every public function, class and constant, with the same behaviour,
+ and carry the doc comments over in the syntax of the new language. Use the
+ files it depends on as they were migrated, their names and signatures, and
+ not the original ones. \n\n
+ Expected Output: The complete migrated code file in a single code block. Do
+ not add any explanation or extra verbosity outside the code block. This will
+ break the downstream application if you do not follow the instruction
+ properly. \n\n"""
+
+# Human prompt template for providing the code file that needs migration
+HUMAN_PROMPT_MIGRATE = (
+    CONTEXT_PROMPT
+    + """{dependency_context}Here is the code file {code_file_path} that need to be migrated: \n\n
+{code_file}
+"""
+)
+
+# Section of HUMAN_PROMPT_MIGRATE with the files the file depends on: their
+# summary, and their migrated code when it fits the context budget
+DEPENDENCY_CONTEXT_PROMPT = """Here are the files it depends on, for context only: \n\n
+{dependencies}
+
+"""
+
+
+# Messages of each ChatPromptTemplate, created on first access (PEP 562)
+PROMPT_MESSAGES = {
+    # Migration task
+    "PROMPT_MIGRATE": [
+        ("system", SYSTEM_PROMPT_MIGRATE),
+        ("human", HUMAN_PROMPT_MIGRATE),
+    ],
+}
+
+
+def __getattr__(name):
+    """
+    Create the ChatPromptTemplate instances on first access.
+
+    Args:
+        name (str): The attribute being looked up on the module.
+
+    Returns:
+        ChatPromptTemplate: The prompt template.
+
+    Raises:
+        AttributeError: If the attribute is not provided by this module.
+    """
+    if name in PROMPT_MESSAGES:
+        chat = importlib.import_module("langchain_core.prompts.chat")
+        prompt = chat.ChatPromptTemplate.from_messages(PROMPT_MESSAGES[name])
+        globals()[name] = prompt  # Cache so later lookups skip __getattr__
+        return prompt
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,50 @@
+from debtrazor.agents.state import AgentState
+
+
+class MigrateAgentState(AgentState):
+    """
+    MigrateAgentState is a class that extends AgentState to manage the state of a migration agent.
+
+    Attributes:
+        entry_path (str): The root of the repository being migrated.
+        output_path (str): The path where the migrated code will be saved.
+        doc_output_path (str): The output path of the documentation run, with
+            its dependency index and summary store.
+        ignore_list (list[str]): A list of file or directory names to be ignored.
+        legacy_language (str): The language of the repository.
+        legacy_framework (str): The framework of the repository.
+        new_language (str): The language to migrate to.
+        new_framework (str): The framework to migrate to.
+        dependencies_per_file (dict[str, list[str]]): The internal dependencies
+            of each file, keyed by path relative to entry_path, with the
+            dependency paths relative to entry_path too.
+        waves (list[list[list[str]]]): The files to migrate, in waves of
+            units. The units of a wave only depend on earlier waves and are
+            migrated concurrently; a unit is a single file or the files of a
+            dependency cycle.
+        wave (int): Index of the next wave to migrate.
+        migrated (dict[str, str]): Migrated files, keyed by path relative to
+            entry_path, with their path relative to output_path.
+        failed (dict[str, str]): Files whose migration failed, keyed by path
+            relative to entry_path, with the error. They are retried by the
+            next run.
+        journal_path (str): SQLite journal of the migrated files, see
+            ``Journal``.
+        finalized (bool): True once every wave is migrated.
+    """
+
+    entry_path: str
+    output_path: str
+    doc_output_path: str
+    ignore_list: list[str]
+    legacy_language: str
+    legacy_framework: str
+    new_language: str
+    new_framework: str
+    dependencies_per_file: dict[str, list[str]]
+    waves: list[list[list[str]]]
+    wave: int
+    migrated: dict[str, str]
+    failed: dict[str, str]
+    journal_path: str
+    finalized: bool
@@ -0,0 +1,231 @@
+"""
+Deterministic offline chat model for benchmarks.
+
+It answers each DocAgent prompt with a well formed response of realistic size
+(the documented file echoes the source, or the comments to insert are listed,
+summaries and READMEs are short) after
+a configurable latency, and emits dependency tool calls when tools are bound.
+Like a provider's prompt cache, it reports the prefix a prompt shares with
+the previous prompt of the same chain as cached tokens.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from debtrazor.utils.tokens import count_tokens
+
+# Tool used for each source file extension when tools are bound
+_TOOL_FOR_EXTENSION = {".py": "pydeps", ".js": "madge", ".ts": "madge"}
+
+# Python function and class headers, documented with a docstring below them
+_PYTHON_HEADER = re.compile(r"\s*(async\s+)?(def|class)\s+\w+.*:\s*$")
+
+# Characters per chunk of a streamed response
+STREAM_CHUNK_CHARS = 64
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model returning deterministic DocAgent responses without a network.
+
+    Attributes:
+        latency (float): Seconds to wait before every response.
+        seconds_per_output_token (float): Extra wait per generated token, to
+            mimic generation speed.
+        summary_sentences (int): Sentences in every file summary.
+    """
+
+    latency: float = 0.0
+    seconds_per_output_token: float = 0.0
+    summary_sentences: int = 3
+
+    # Last prompt per system message, to derive the cached prefix
+    _last_prompts: dict = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "debtrazor-fake"
+
+    def bind_tools(self, tools, **kwargs: Any):
+        """
+        Bind tools so that responses are tool calls.
+
+        Args:
+            tools (Sequence[BaseTool]): The tools the model may call.
+
+        Returns:
+            Runnable: The model bound to the tool names.
+        """
+        return self.bind(tool_names=[tool.name for tool in tools], **kwargs)
+
+    def _respond(self, messages: list[BaseMessage], tool_names=None) -> AIMessage:
+        text = "\n".join(str(message.content) for message in messages)
+
+        if tool_names:
+            match = re.search(r"Here is the path to the code file:\s*(\S+)", text)
+            path = match.group(1) if match else ""
+            tool = next(
+                (
+                    _TOOL_FOR_EXTENSION[ext]
+                    for ext in _TOOL_FOR_EXTENSION
+                    if path.endswith(ext)
+                ),
+                None,
+            )
+            if tool in tool_names:
+                return AIMessage(
+                    content="",
+                    tool_calls=[
+                        {"name": tool, "args": {"file_path": path}, "id": "call_0"}
+                    ],
+                )
+            return AIMessage(content="None")
+
+        if "summary of the code file" in text:
+            lines = text.count("\n")
+            sentence = f"This file spans about {lines} lines of documented code."
+            return AIMessage(content=" ".join([sentence] * self.summary_sentences))
+
+        if "README.md" in text:
+            module = text.strip().splitlines()[-1].strip()
+            return AIMessage(
+                content=f"# {module or 'Project'}\n\nOverview of the module.\n"
+            )
+
+        if "prefixed with its number" in text:
+            return AIMessage(content=self._insertions(text))
+
+        # Documentation task: echo the source with a header comment
+        match = re.search(r"need to be documented:\s*\n(.*)", text, re.DOTALL)
+        code = match.group(1).strip("\n") if match else text
+        return AIMessage(
+            content=f"```code\n# Documented by the fake model\n{code}\n```"
+        )
+
+    @staticmethod
+    def _insertions(text: str) -> str:
+        # Insertions task: a header comment, and docstrings for Python
+        match = re.search(r"Language/framework of the codebase: (\S*)", text)
+        python = match is not None and match.group(1) == "python"
+        lines = re.findall(r"^(\d+)\| (.*)$", text, re.MULTILINE)
+        # Update of a near copy: only the changed lines
+        match = re.search(r"except for the lines ([\d, -]+)\.", text)
+        if match:
+            changed = set()
+            for part in match.group(1).split(","):
+                start, _, end = part.strip().partition("-")
+                changed.update(range(int(start), int(end or start) + 1))
+            lines = [(number, line) for number, line in lines if int(number) in changed]
+        insertions = []
+        if lines:
+            insertions.append(
+                {
+                    "line": int(lines[0][0]),
+                    "placement": "before",
+                    "text": ("# " if python else "// ")
+                    + "Documented by the fake model",
+                }
+            )
+        for number, line in lines if python else []:
+            if _PYTHON_HEADER.match(line):
+                insertions.append(
+                    {
+                        "line": int(number),
+                        "placement": "after",
+                        "text": '"""Documented by the fake model."""',
+                    }
+                )
+        return f"```json\n{json.dumps(insertions)}\n```"
+
+    def _cached_tokens(self, messages: list[BaseMessage]) -> int:
+        text = "\n".join(str(message.content) for message in messages)
+        key = str(messages[0].content) if messages else ""
+        with self._lock:
+            previous = self._last_prompts.get(key, "")
+            self._last_prompts[key] = text
+        return count_tokens(os.path.commonprefix([previous, text]))
+
+    def _message(self, messages: list[BaseMessage], **kwargs: Any) -> AIMessage:
+        message = self._respond(messages, kwargs.get("tool_names"))
+        input_tokens = sum(count_tokens(str(m.content)) for m in messages)
+        output_tokens = count_tokens(str(message.content))
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {
+                "cache_read": min(input_tokens, self._cached_tokens(messages))
+            },
+        }
+        return message
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager=None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = self._message(messages, **kwargs)
+        delay = (
+            self.latency
+            + self.seconds_per_output_token * message.usage_metadata["output_tokens"]
+        )
+        if delay > 0:
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager=None,
+        **kwargs: Any,
+    ):
+        # The latency is waited for the first chunk only, the generation time
+        # is spread over the chunks
+        message = self._message(messages, **kwargs)
+        if message.tool_calls:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": index,
+                        }
+                        for index, call in enumerate(message.tool_calls)
+                    ],
+                    usage_metadata=message.usage_metadata,
+                )
+            )
+            return
+        if self.latency > 0:
+            time.sleep(self.latency)
+        content = str(message.content)
+        for start in range(0, max(len(content), 1), STREAM_CHUNK_CHARS):
+            text = content[start : start + STREAM_CHUNK_CHARS]
+            if self.seconds_per_output_token > 0:
+                time.sleep(self.seconds_per_output_token * count_tokens(text))
+            last = start + STREAM_CHUNK_CHARS >= len(content)
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=text,
+                    usage_metadata=message.usage_metadata if last else None,
+                )
+            )
+            if run_manager is not None:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
@@ -0,0 +1,306 @@
+"""
+Offline benchmark of the documentation agent.
+
+Generates a synthetic repository, documents it with the deterministic fake
+chat model and reports throughput, peak memory, checkpoint size and graph
+steps. With ``--baseline`` the run fails when any of them regressed by more
+than the allowed tolerance, so it can gate changes to traversal,
+checkpointing or concurrency.
+
+Usage:
+    python -m debtrazor.benchmarks.harness --files 200 --depth 3 --fan-out 3 \\
+        --latency 0.01 --output bench.json [--baseline base.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+
+from debtrazor.utils.cfg import Config
+from debtrazor.utils.metrics import metrics
+from debtrazor.benchmarks.synthetic import generate_repository
+
+# Direction in which each reported value gets worse
+LOWER_IS_BETTER = [
+    "peak_rss_bytes",
+    "checkpoint_db_bytes",
+    "checkpoint_write_seconds",
+    "graph_steps",
+]
+HIGHER_IS_BETTER = ["files_per_second"]
+
+
+def _peak_rss_bytes() -> int:
+    """
+    Return the peak resident set size of the process.
+
+    Returns:
+        int: Peak RSS in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _db_size(path: str) -> int:
+    """
+    Return the size of a SQLite database including its WAL file.
+
+    Args:
+        path (str): The database path.
+
+    Returns:
+        int: Size in bytes.
+    """
+    return sum(
+        os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)
+    )
+
+
+def _checkpoint_write_seconds() -> float:
+    """
+    Return the time spent writing checkpoints and pending writes.
+
+    Returns:
+        float: Total seconds of the checkpoint ``put`` and ``put_writes``
+        operations recorded in the metrics.
+    """
+    series = metrics.to_dict()["histograms"].get("debtrazor_checkpoint_seconds", [])
+    return sum(
+        s["sum"] for s in series if s["labels"]["operation"] in ("put", "put_writes")
+    )
+
+
+def run_benchmark(
+    work_dir: str,
+    depth: int = 2,
+    fan_out: int = 3,
+    files: int = 50,
+    file_size: int = 1500,
+    language: str = "python",
+    latency: float = 0.0,
+    seed: int = 0,
+    readme_batch_tokens: int | None = None,
+    schedule: str = "directory",
+    checkpoint_format: str = "compact",
+    prefetch: int = 8,
+    stream_output: bool = False,
+    output_format: str = "code",
+) -> dict:
+    """
+    Document a synthetic repository with the fake model and measure the run.
+
+    Args:
+        work_dir (str): Scratch directory for the repository and the output.
+        depth (int): Levels of sub-directories of the repository.
+        fan_out (int): Sub-directories per directory.
+        files (int): Number of source files.
+        file_size (int): Approximate size of each source file in bytes.
+        language (str): Language of the generated files.
+        latency (float): Seconds the fake model waits per call.
+        seed (int): Seed of the synthetic repository.
+        readme_batch_tokens (int | None): Token budget of the summaries in
+            one README prompt, see ``DocAgent``.
+        schedule (str): File ordering of the agent, see ``DocAgent``.
+        checkpoint_format (str): Checkpoint serialization, ``compact`` or
+            ``default``, see ``setup_memory``.
+        prefetch (int): Upcoming files prepared ahead, see ``DocAgent``.
+        stream_output (bool): Stream the documented code to disk, see
+            ``DocAgent``.
+        output_format (str): What the model returns, ``code`` or
+            ``insertions``, see ``DocAgent``.
+
+    Returns:
+        dict: The scenario and its measurements.
+    """
+    from debtrazor.agents.doc_agent.agent import DocAgent
+    from debtrazor.benchmarks.fake_llm import FakeChatModel
+    from debtrazor.migrate_utils.setup import setup_initial_state, setup_memory
+    from debtrazor.tools.tree.node_js import madge
+    from debtrazor.tools.tree.python import pydeps
+    from debtrazor.tools.tree.java import javadeps
+    from debtrazor.tools.tree.rust import rustdeps
+    from debtrazor.tools.tree.c import cdeps
+
+    repo_path = os.path.join(work_dir, "repo")
+    output_path = os.path.join(work_dir, "output")
+    shutil.rmtree(output_path, ignore_errors=True)
+    os.makedirs(output_path)
+    repo = generate_repository(
+        repo_path, depth, fan_out, files, file_size, language, seed=seed
+    )
+
+    cfg = Config(
+        {
+            "entry_path": repo_path,
+            "output_path": output_path,
+            "legacy_language": language,
+            "legacy_framework": "",
+            "thread_id": "benchmark",
+            "checkpoint": {"format": checkpoint_format},
+        }
+    )
+    metrics.reset()
+    memory = setup_memory(cfg)
+    agent = DocAgent(
+        FakeChatModel(latency=latency),
+        [madge, pydeps, javadeps, rustdeps, cdeps],
+        checkpointer=memory,
+        thread_id=str(cfg.thread_id),
+        readme_batch_tokens=readme_batch_tokens,
+        schedule=schedule,
+        prefetch=prefetch,
+        stream_output=stream_output,
+        output_format=output_format,
+        # Batches are answered by the fake model in-process
+        batch_backend="local",
+    )
+
+    steps = 0
+    start = time.perf_counter()
+    for _ in agent(setup_initial_state(cfg)):
+        steps += 1
+    elapsed = time.perf_counter() - start
+    agent.close()
+    memory.__exit__(None, None, None)
+
+    return {
+        "scenario": {
+            "depth": depth,
+            "fan_out": fan_out,
+            "files": files,
+            "file_size": file_size,
+            "language": language,
+            "latency": latency,
+            "seed": seed,
+            "readme_batch_tokens": readme_batch_tokens,
+            "schedule": schedule,
+            "checkpoint_format": checkpoint_format,
+            "prefetch": prefetch,
+            "stream_output": stream_output,
+            "output_format": output_format,
+            "directories": repo["directories"],
+        },
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(files / elapsed, 3) if elapsed else None,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "checkpoint_db_bytes": _db_size(os.path.join(output_path, "checkpoint.db")),
+        "checkpoint_write_seconds": round(_checkpoint_write_seconds(), 4),
+        "graph_steps": steps,
+        "metrics": metrics.to_dict(),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compare a result with a baseline.
+
+    Args:
+        result (dict): The current measurements.
+        baseline (dict): The reference measurements of the same scenario.
+        tolerance (float): Allowed relative regression, e.g. 0.2 for 20%.
+
+    Returns:
+        list[str]: One message per regressed value; empty if none regressed.
+    """
+    regressions = []
+    for key in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+        old, new = baseline.get(key), result.get(key)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        if key in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append(
+                f"{key}: {old} -> {new} ({change:+.1%} worse, tolerance {tolerance:.0%})"
+            )
+    return regressions
+
+
+def main(argv=None) -> int:
+    """
+    Run the benchmark from the command line.
+
+    Args:
+        argv (list[str] | None): Command line arguments.
+
+    Returns:
+        int: 0 on success, 1 if a regression against the baseline was found.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the DocAgent offline")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fan-out", type=int, default=3)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--file-size", type=int, default=1500)
+    parser.add_argument("--language", default="python")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--readme-batch-tokens", type=int)
+    parser.add_argument(
+        "--schedule",
+        choices=["directory", "topological", "batch"],
+        default="directory",
+    )
+    parser.add_argument(
+        "--checkpoint-format", choices=["compact", "default"], default="compact"
+    )
+    parser.add_argument("--prefetch", type=int, default=8)
+    parser.add_argument("--stream-output", action="store_true")
+    parser.add_argument(
+        "--output-format", choices=["code", "insertions"], default="code"
+    )
+    parser.add_argument("--work-dir", help="Scratch directory (default: temporary)")
+    parser.add_argument("--output", help="Write the result as JSON to this file")
+    parser.add_argument("--baseline", help="Result JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="debtrazor-bench-")
+    try:
+        result = run_benchmark(
+            work_dir,
+            depth=args.depth,
+            fan_out=args.fan_out,
+            files=args.files,
+            file_size=args.file_size,
+            language=args.language,
+            latency=args.latency,
+            seed=args.seed,
+            readme_batch_tokens=args.readme_batch_tokens,
+            schedule=args.schedule,
+            checkpoint_format=args.checkpoint_format,
+            prefetch=args.prefetch,
+            stream_output=args.stream_output,
+            output_format=args.output_format,
+        )
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    summary = {k: v for k, v in result.items() if k != "metrics"}
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("scenario") != result["scenario"]:
+            print("FAIL: baseline was recorded for a different scenario")
+            return 1
+        regressions = compare(result, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION: {message}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
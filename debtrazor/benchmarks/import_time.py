@@ -0,0 +1,99 @@
+"""
+Import-time benchmark for the CLI entry point.
+
+Imports the module in fresh interpreters and fails when the best time exceeds
+the budget or when any heavy dependency is loaded eagerly, so that startup
+regressions are caught before they ship.
+
+Usage:
+    python -m debtrazor.benchmarks.import_time [--max-seconds 0.5]
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+
+# Dependencies that must only be imported once an agent actually runs
+HEAVY_MODULES = [
+    "langchain",
+    "langchain_core",
+    "langchain_openai",
+    "langgraph",
+    "openai",
+    "github",
+    "yaml",
+    "pydantic",
+]
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+heavy = sorted(m for m in {heavy!r} if m in sys.modules)
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_import(module: str, runs: int = 5) -> dict:
+    """
+    Measure the import time of a module in fresh interpreters.
+
+    Args:
+        module (str): Dotted name of the module to import.
+        runs (int): Number of interpreters to start; the best time is kept.
+
+    Returns:
+        dict: The best and all measured times in seconds and the heavy
+        modules that were loaded by the import.
+    """
+    times = []
+    heavy = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        times.append(probe["seconds"])
+        heavy = probe["heavy"]
+    return {"module": module, "best": min(times), "times": times, "heavy": heavy}
+
+
+def main(argv=None) -> int:
+    """
+    Run the benchmark and check it against the budget.
+
+    Args:
+        argv (list[str] | None): Command line arguments.
+
+    Returns:
+        int: 0 if the import is within budget, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark CLI import time")
+    parser.add_argument("--module", default="debtrazor.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    result = measure_import(args.module, args.runs)
+    print(json.dumps(result, indent=2))
+
+    failed = False
+    if result["best"] > args.max_seconds:
+        print(
+            f"FAIL: importing {args.module} took {result['best']:.3f}s "
+            f"(budget {args.max_seconds:.3f}s)"
+        )
+        failed = True
+    if result["heavy"]:
+        print(f"FAIL: {args.module} eagerly imports {', '.join(result['heavy'])}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Deterministic synthetic repositories for benchmarks.
+
+A repository is a directory tree of a given depth and fan-out with a fixed
+number of source files spread round-robin over its directories. Files import
+a few of the files generated before them in the same directory, so
+dependency tools have a real graph to walk: Java files import them from
+their package, Rust files use them from the crate root, which declares every
+module, and C and C++ files get the headers they include.
+"""
+
+import os
+import random
+import shutil
+
+from debtrazor.constants import supported_langs
+
+
+def _python_file(name, imports, size, rng, package):
+    lines = [f"from . import {module}" for module in imports]
+    lines.append("")
+    index = 0
+    while sum(len(line) + 1 for line in lines) < size:
+        lines += [
+            f"def {name}_func_{index}(value):",
+            f"    total = value * {rng.randint(1, 99)}",
+            f"    for step in range({rng.randint(2, 9)}):",
+            "        total += step",
+            "    return total",
+            "",
+        ]
+        index += 1
+    return "\n".join(lines) + "\n"
+
+
+def _js_file(name, imports, size, rng, package):
+    lines = [f"const {module} = require('./{module}');" for module in imports]
+    lines.append("")
+    index = 0
+    while sum(len(line) + 1 for line in lines) < size:
+        lines += [
+            f"function {name}Func{index}(value) {{",
+            f"  let total = value * {rng.randint(1, 99)};",
+            f"  for (let step = 0; step < {rng.randint(2, 9)}; step++) {{",
+            "    total += step;",
+            "  }",
+            "  return total;",
+            "}",
+            "",
+        ]
+        index += 1
+    lines.append(f"module.exports = {{ {name}Func0 }};")
+    return "\n".join(lines) + "\n"
+
+
+def _c_like_file(name, imports, size, rng, package):
+    lines = [f'#include "{module}.h"' for module in imports]
+    lines.append("")
+    index = 0
+    while sum(len(line) + 1 for line in lines) < size:
+        lines += [
+            f"int {name}_func_{index}(int value) {{",
+            f"    int total = value * {rng.randint(1, 99)};",
+            f"    for (int step = 0; step < {rng.randint(2, 9)}; step++) {{",
+            "        total += step;",
+            "    }",
+            "    return total;",
+            "}",
+            "",
+        ]
+        index += 1
+    return "\n".join(lines) + "\n"
+
+
+def _java_file(name, imports, size, rng, package):
+    lines = []
+    if package:
+        # Classes of the default package cannot be imported, only used
+        lines += [f"package {'.'.join(package)};", ""]
+        lines += [f"import {'.'.join(package + [module])};" for module in imports]
+        lines.append("")
+    lines.append(f"public class {name} {{")
+    index = 0
+    while sum(len(line) + 1 for line in lines) < size:
+        used = imports[index % len(imports)] if imports else None
+        lines += [
+            f"    public static int func{index}(int value) {{",
+            f"        int total = value * {rng.randint(1, 99)};",
+            f"        for (int step = 0; step < {rng.randint(2, 9)}; step++) {{",
+            "            total += step;",
+            "        }",
+            f"        return {used}.func0(total);" if used else "        return total;",
+            "    }",
+            "",
+        ]
+        index += 1
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _rust_file(name, imports, size, rng, package):
+    lines = [f"use crate::{'::'.join(package + [module])};" for module in imports]
+    lines.append("")
+    index = 0
+    while sum(len(line) + 1 for line in lines) < size:
+        lines += [
+            f"pub fn {name}_func_{index}(value: i32) -> i32 {{",
+            f"    let mut total = value * {rng.randint(1, 99)};",
+            f"    for step in 0..{rng.randint(2, 9)} {{",
+            "        total += step;",
+            "    }",
+            "    total",
+            "}",
+            "",
+        ]
+        index += 1
+    return "\n".join(lines) + "\n"
+
+
+def _c_header(name, code):
+    guard = f"{name.upper()}_H"
+    lines = [f"#ifndef {guard}", f"#define {guard}", ""]
+    lines += [
+        line.removesuffix(" {") + ";"
+        for line in code.splitlines()
+        if line.startswith("int ")
+    ]
+    lines += ["", f"#endif /* {guard} */"]
+    return "\n".join(lines) + "\n"
+
+
+_GENERATORS = {
+    "python": _python_file,
+    "nodejs": _js_file,
+    "javascript": _js_file,
+    "typescript": _js_file,
+    "java": _java_file,
+    "rust": _rust_file,
+}
+
+
+def generate_repository(
+    root: str,
+    depth: int = 2,
+    fan_out: int = 3,
+    files: int = 50,
+    file_size: int = 1500,
+    language: str = "python",
+    imports_per_file: int = 2,
+    seed: int = 0,
+) -> dict:
+    """
+    Generate a synthetic repository.
+
+    Args:
+        root (str): Directory to create. It is replaced if it exists.
+        depth (int): Levels of sub-directories below the root.
+        fan_out (int): Sub-directories per directory.
+        files (int): Number of source files in the whole tree.
+        file_size (int): Approximate size of each source file in bytes.
+        language (str): Key of ``supported_langs`` to generate files for.
+        imports_per_file (int): Sibling files each file imports, at most.
+        seed (int): Seed making the repository reproducible.
+
+    Returns:
+        dict: The generated ``root``, ``directories`` and ``files`` counts.
+    """
+    rng = random.Random(seed)
+    extension = supported_langs[language]
+    generator = _GENERATORS.get(language, _c_like_file)
+
+    shutil.rmtree(root, ignore_errors=True)
+    directories = [root]
+    level = [root]
+    for d in range(depth):
+        next_level = []
+        for parent in level:
+            for i in range(fan_out):
+                next_level.append(os.path.join(parent, f"dir_{d}_{i}"))
+        directories += next_level
+        level = next_level
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+        if language == "python":
+            # Packages so dependency tools can resolve imports between files
+            open(os.path.join(directory, "__init__.py"), "w").close()
+
+    modules_per_directory = {directory: [] for directory in directories}
+    for index in range(files):
+        directory = directories[index % len(directories)]
+        # Java class names are those of their files
+        name = f"Module{index}" if language == "java" else f"module_{index}"
+        siblings = modules_per_directory[directory]
+        imports = rng.sample(siblings, min(imports_per_file, len(siblings)))
+        package = os.path.relpath(directory, root).split(os.sep)
+        package = [] if package == ["."] else package
+        code = generator(name, imports, file_size, rng, package)
+        with open(os.path.join(directory, name + extension), "w") as f:
+            f.write(code)
+        if language in ("c", "cpp"):
+            # The headers the files include, so cdeps resolves them
+            with open(os.path.join(directory, name + ".h"), "w") as f:
+                f.write(_c_header(name, code))
+        siblings.append(name)
+
+    if language == "rust":
+        # A crate root and module files, so `use crate::...` paths resolve
+        children = {directory: [] for directory in directories}
+        for directory in directories[1:]:
+            children[os.path.dirname(directory)].append(os.path.basename(directory))
+        for directory in directories:
+            children[directory] += modules_per_directory[directory]
+        for directory in directories:
+            name = "lib.rs" if directory == root else "mod.rs"
+            with open(os.path.join(directory, name), "w") as f:
+                f.writelines(f"pub mod {child};\n" for child in children[directory])
+
+    return {"root": root, "directories": len(directories), "files": files}
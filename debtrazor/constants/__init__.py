@@ -1,6 +1,11 @@
-from debtrazor.constants.supported_langs import supported_langs, dependency_tool_supported_langs
+from debtrazor.constants.supported_langs import (
+    supported_langs,
+    dependency_tool_supported_langs,
+    dependency_tools,
+)
 
 __all__ = [
     "supported_langs",
-    "dependency_tool_supported_langs"
+    "dependency_tool_supported_langs",
+    "dependency_tools",
 ]
\ No newline at end of file
@@ -9,4 +9,14 @@ supported_langs = {
     "cpp": ".cpp"
 }
 
-dependency_tool_supported_langs = ["nodejs", "python"]
+dependency_tool_supported_langs = ["nodejs", "python", "java", "rust", "c", "cpp"]
+
+# Tool extracting the internal dependencies of a file, per language
+dependency_tools = {
+    "nodejs": "madge",
+    "python": "pydeps",
+    "java": "javadeps",
+    "rust": "rustdeps",
+    "c": "cdeps",
+    "cpp": "cdeps",
+}
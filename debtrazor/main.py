@@ -1,15 +1,14 @@
 import asyncio
 from dotenv import load_dotenv
 from debtrazor.utils import load_and_validate_config
+from debtrazor.utils.load import load_config, parse_arguments
 
 from debtrazor.migrate_utils.setup import (
     setup_environment,
     setup_initial_state,
+    setup_migration_state,
     setup_memory,
-)
-
-from debtrazor.migrate_utils import (
-    run_documentation_agent,
+    setup_metrics,
 )
 
 
@@ -24,24 +23,77 @@ async def main():
     4. Creates the initial state for the migration.
     5. Runs the documentation agent.
 
+    With ``--serve`` it instead keeps the models and the compiled agent
+    loaded and documents every job read from stdin. With ``--sharded`` the
+    subtrees of the repository are documented in parallel processes first.
+    With ``--watch`` the documentation is then kept up to date as the
+    repository changes. With ``--migrate`` the documented repository is then
+    migrated to the new language.
+
     Returns:
         None
     """
 
     # Load and validate configuration
-    cfg = await load_and_validate_config()
+    args = parse_arguments()
+    config_data = load_config(args.config_path)
+    cfg = await load_and_validate_config(config_data)
+
+    if args.estimate:
+        # Dry run: walk and tokenize the repository locally
+        from debtrazor.migrate_utils.estimate import (
+            estimate_documentation,
+            format_estimate,
+        )
+
+        estimate = estimate_documentation(
+            cfg, concurrency=args.concurrency, requests_per_minute=args.rpm
+        )
+        print(format_estimate(estimate))
+        return
+
+    # Agents pull in langchain and langgraph, so only import them once the
+    # configuration is known to be valid
+    from debtrazor.migrate_utils import run_documentation_agent
+
+    # Serve live metrics if configured
+    setup_metrics(cfg)
+
+    if args.serve:
+        # Serve jobs using the config file as defaults for every job
+        from debtrazor.migrate_utils.service import serve
+
+        await serve(cfg, config_data)
+        return
 
     # Setup environment
     await setup_environment(cfg, log_queue=None)
 
-    # Setup long-term memory for the agents
-    memory = setup_memory(cfg)
+    if args.sharded:
+        from debtrazor.migrate_utils.shard import run_sharded_documentation
+
+        await run_sharded_documentation(cfg, config_data)
+    elif args.watch:
+        from debtrazor.migrate_utils.watch import watch_documentation
+
+        await watch_documentation(cfg)
+        return
+    else:
+        # Setup long-term memory for the agents
+        memory = setup_memory(cfg)
+
+        # Create initial state
+        init_state = setup_initial_state(cfg)
+
+        # Run the documentation agent
+        await run_documentation_agent(init_state, memory, cfg)
 
-    # Create initial state
-    init_state = setup_initial_state(cfg)
+    if args.migrate:
+        # Migrate in waves of the dependency graph collected by the
+        # documentation
+        from debtrazor.migrate_utils import run_migration_agent
 
-    # Run the documentation agent
-    await run_documentation_agent(init_state, memory, cfg)
+        await run_migration_agent(setup_migration_state(cfg), setup_memory(cfg), cfg)
 
 
 def dbr():
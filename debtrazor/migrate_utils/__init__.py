@@ -1,15 +1,55 @@
+import importlib
+
 from debtrazor.migrate_utils.setup import (
     setup_environment,
     setup_memory,
     setup_initial_state,
+    setup_migration_state,
+    setup_metrics,
+    setup_output_path,
 )
-from debtrazor.migrate_utils.run_doc_agent import run_documentation_agent
+
+# Agent runners pull in langchain, langgraph and the model clients, so they are
+# only imported on first access (PEP 562) to keep CLI startup fast.
+_lazy_attributes = {
+    "run_documentation_agent": "debtrazor.migrate_utils.run_doc_agent",
+    "run_sharded_documentation": "debtrazor.migrate_utils.shard",
+    "watch_documentation": "debtrazor.migrate_utils.watch",
+    "run_migration_agent": "debtrazor.migrate_utils.run_migrate_agent",
+    "run_migration_order_agent": "debtrazor.migrate_utils.run_migrate_agent",
+}
+
+
+def __getattr__(name):
+    """
+    Import agent runners lazily on first attribute access.
+
+    Args:
+        name (str): The attribute being looked up on the module.
+
+    Returns:
+        Any: The requested attribute.
+
+    Raises:
+        AttributeError: If the attribute is not provided by this module.
+    """
+    if name in _lazy_attributes:
+        value = getattr(importlib.import_module(_lazy_attributes[name]), name)
+        globals()[name] = value  # Cache so later lookups skip __getattr__
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "setup_environment",
     "setup_memory",
     "setup_initial_state",
+    "setup_migration_state",
+    "setup_metrics",
+    "setup_output_path",
     "run_documentation_agent",
+    "run_sharded_documentation",
+    "watch_documentation",
     "run_migration_agent",
     "run_dir_struct_agent",
     "run_migration_order_agent",
@@ -0,0 +1,455 @@
+import os
+import math
+
+from debtrazor.utils.logging import logger
+from debtrazor.utils.tokens import count_tokens
+from debtrazor.utils.util import read_gitignore
+from debtrazor.utils.sniff import FileLimits, read_source, skip_reason
+from debtrazor.utils.walk import walk_tree
+from debtrazor.constants import (
+    supported_langs,
+    dependency_tool_supported_langs,
+    dependency_tools,
+)
+from debtrazor.migrate_utils.llm import get_llm_config
+from debtrazor.agents.doc_agent.prompts import PROMPT_MESSAGES, cacheable_prefix
+from debtrazor.agents.doc_agent.similarity import digest
+
+# Assumptions used to project model output and latency. Each can be
+# overridden from the `estimate` section of the config file.
+DEFAULT_ASSUMPTIONS = {
+    "doc_output_ratio": 1.35,  # Commented file size relative to the source
+    "insertions_output_ratio": 0.35,  # Listed comments relative to the source
+    "numbered_input_ratio": 1.15,  # Line-numbered code relative to the source
+    "summary_tokens": 150,  # Output tokens of a file summary
+    "dependency_tool_tokens": 150,  # Tool schema sent with the dependency call
+    "dependency_output_tokens": 60,  # Tool call emitted by the model
+    "readme_tokens": 450,  # Output tokens of a directory README
+    "message_overhead_tokens": 4,  # Chat formatting tokens per message
+    "base_latency_seconds": 1.0,  # Time to first token per call
+    "output_tokens_per_second": 60.0,  # Generation speed of the model
+    "concurrency": 1,  # Model calls in flight at once
+    "requests_per_minute": None,  # Provider request rate limit
+    "tokens_per_minute": None,  # Provider token rate limit
+    "prompt_cache_min_tokens": 1024,  # Shortest prefix the provider caches
+}
+
+
+def _prompt_prefix_tokens(messages, model_name, **variables):
+    """
+    Count the tokens a prompt adds on top of its variable fields.
+
+    Args:
+        messages (list[tuple[str, str]]): The (role, template) messages of the
+            prompt, see ``PROMPT_MESSAGES``.
+        model_name (str): The model whose tokenizer should be used.
+        **variables: The template variables, rendered empty.
+
+    Returns:
+        int: The number of static tokens of the prompt.
+    """
+    return sum(
+        count_tokens(template.format(**variables), model_name)
+        + DEFAULT_ASSUMPTIONS["message_overhead_tokens"]
+        for role, template in messages
+        if role != "placeholder"
+    )
+
+
+def _cacheable_prefix_tokens(name, model_name, **run_variables):
+    """
+    Count the tokens of the prompt prefix shared by every call of a chain.
+
+    Args:
+        name (str): The prompt name, a key of ``PROMPT_MESSAGES``.
+        model_name (str): The model whose tokenizer should be used.
+        **run_variables: The variables fixed for the run.
+
+    Returns:
+        int: The number of tokens a provider can serve from its prompt cache.
+    """
+    return sum(
+        count_tokens(text, model_name) + DEFAULT_ASSUMPTIONS["message_overhead_tokens"]
+        for role, text in cacheable_prefix(name, **run_variables)
+    )
+
+
+def _add_call(calls, kind, input_tokens, output_tokens):
+    """
+    Accumulate one projected model call.
+
+    Args:
+        calls (dict): Per-kind call totals to update.
+        kind (str): The chain the call belongs to.
+        input_tokens (int): Projected prompt tokens.
+        output_tokens (int): Projected completion tokens.
+    """
+    entry = calls.setdefault(kind, {"count": 0, "input_tokens": 0, "output_tokens": 0})
+    entry["count"] += 1
+    entry["input_tokens"] += int(input_tokens)
+    entry["output_tokens"] += int(output_tokens)
+
+
+def estimate_documentation(
+    cfg, concurrency=None, requests_per_minute=None, tokens_per_minute=None
+):
+    """
+    Estimate the tokens, cost and time of documenting a repository.
+
+    The repository is walked the way the DocAgent walks it (same ignore list
+    and language filter) and every file is tokenized locally, so no model is
+    called.
+
+    Args:
+        cfg (Config): Configuration object of the run.
+        concurrency (int | None): Model calls in flight at once.
+        requests_per_minute (int | None): Provider request rate limit.
+        tokens_per_minute (int | None): Provider token rate limit.
+
+    Returns:
+        dict: The projected calls, tokens, cost and wall-clock time.
+    """
+    assumptions = dict(DEFAULT_ASSUMPTIONS)
+    estimate_cfg = getattr(cfg, "estimate", None)
+    if estimate_cfg is not None:
+        assumptions.update(
+            {k: v for k, v in estimate_cfg.__dict__.items() if v is not None}
+        )
+    for key, value in (
+        ("concurrency", concurrency),
+        ("requests_per_minute", requests_per_minute),
+        ("tokens_per_minute", tokens_per_minute),
+    ):
+        if value is not None:
+            assumptions[key] = value
+
+    model_name = cfg.document.model.name
+    language = cfg.legacy_language
+    extension = supported_langs[language]
+    ignore_list = read_gitignore(cfg.entry_path)
+    limits = FileLimits.from_config(cfg.document)
+
+    insertions = getattr(cfg.document, "output_format", None) == "insertions"
+    # Sent through a batch endpoint, at its price and latency
+    batched = (
+        ("doc", "summary") if getattr(cfg.document, "schedule", None) == "batch" else ()
+    )
+    doc_prompt = "PROMPT_INSERTIONS" if insertions else "PROMPT"
+
+    variables = {"language": "", "framework": ""}
+    run_variables = {
+        "language": language,
+        "framework": cfg.legacy_framework or "",
+        "tool_names": "madge, pydeps, javadeps, rustdeps, cdeps",
+    }
+    doc_prefix = _prompt_prefix_tokens(
+        PROMPT_MESSAGES[doc_prompt],
+        model_name,
+        code_file="",
+        dependency_summaries="",
+        **variables,
+    )
+    summary_prefix = _prompt_prefix_tokens(
+        PROMPT_MESSAGES["PROMPT_SUMMARY"], model_name, code_file="", **variables
+    )
+    readme_prefix = _prompt_prefix_tokens(
+        PROMPT_MESSAGES["PROMPT_README"],
+        model_name,
+        file_module_summaries="",
+        module_name="",
+    )
+    readme_batch_prefix = _prompt_prefix_tokens(
+        PROMPT_MESSAGES["PROMPT_README_BATCH"],
+        model_name,
+        file_module_summaries="",
+        module_name="",
+    )
+    batch_tokens = getattr(cfg.document, "readme_batch_tokens", None)
+    dependency_prefix = _prompt_prefix_tokens(
+        PROMPT_MESSAGES["PROMPT_DEPENDENCY_TREE"],
+        model_name,
+        code_file_path="",
+        tool_names="madge, pydeps, javadeps, rustdeps, cdeps",
+        **variables,
+    )
+
+    # Exact copies reuse the documentation of the first one, near copies
+    # are counted as unique files
+    reuse_duplicates = getattr(cfg.document, "reuse_duplicates", None) is not False
+    digests = set()
+
+    calls = {}
+    files = 0
+    duplicate_files = 0
+    skipped_files = 0
+    directories = 1  # The root
+    source_tokens = 0
+    largest_files = []
+
+    def count_file(item, item_path):
+        """
+        Project the calls for a file and return its tokens in the README prompt.
+        """
+        nonlocal files, duplicate_files, skipped_files, source_tokens
+        if not item.endswith(extension):
+            skipped_files += 1
+            return 0
+
+        # Skipped like the DocAgent skips them, see FileLimits
+        if skip_reason(item_path, limits) is not None:
+            skipped_files += 1
+            return 0
+        try:
+            code = read_source(item_path)
+        except OSError as e:
+            logger.info("Could not read %s: %s", item_path, e)
+            return 0
+        code_tokens = count_tokens(code, model_name)
+        pieces = 1
+        if code_tokens > limits.max_tokens:
+            if limits.oversize == "skip":
+                skipped_files += 1
+                return 0
+            if limits.oversize == "truncate":
+                code_tokens = limits.max_tokens
+            else:
+                pieces = math.ceil(code_tokens / limits.max_tokens)
+
+        files += 1
+        readme_tokens = assumptions["summary_tokens"] + count_tokens(item, model_name)
+        # Languages with a dependency tool run it without the model
+        if (
+            language in dependency_tool_supported_langs
+            and language not in dependency_tools
+        ):
+            _add_call(
+                calls,
+                "dependencies",
+                dependency_prefix
+                + assumptions["dependency_tool_tokens"]
+                + count_tokens(item_path, model_name),
+                assumptions["dependency_output_tokens"],
+            )
+        code_digest = digest(code)
+        if reuse_duplicates and code_digest in digests:
+            duplicate_files += 1
+            return readme_tokens
+        digests.add(code_digest)
+        source_tokens += code_tokens
+        largest_files.append((code_tokens, os.path.relpath(item_path, cfg.entry_path)))
+
+        doc_tokens = code_tokens * assumptions["doc_output_ratio"]
+        # In insertions mode the model reads numbered code and only lists
+        # the comments; the summaries still read the documented code
+        doc_input = code_tokens
+        doc_output = doc_tokens
+        if insertions:
+            doc_input = code_tokens * assumptions["numbered_input_ratio"]
+            doc_output = code_tokens * assumptions["insertions_output_ratio"]
+        for _ in range(pieces):
+            _add_call(
+                calls,
+                "doc",
+                doc_prefix + doc_input / pieces,
+                doc_output / pieces,
+            )
+            _add_call(
+                calls,
+                "summary",
+                summary_prefix + doc_tokens / pieces,
+                assumptions["summary_tokens"],
+            )
+        return readme_tokens
+
+    def count_directory(readme_input):
+        """
+        Project the README calls for a directory whose entries are counted.
+        """
+        # Directories too large for one README prompt are summarized in
+        # batches first, see DocAgent.reduce_summaries
+        while batch_tokens and readme_input - readme_prefix > batch_tokens:
+            batches = math.ceil((readme_input - readme_prefix) / batch_tokens)
+            if batches * assumptions["readme_tokens"] >= readme_input - readme_prefix:
+                break  # Batch summaries would not be shorter than their input
+            for _ in range(batches):
+                _add_call(
+                    calls,
+                    "readme_batch",
+                    readme_batch_prefix + batch_tokens,
+                    assumptions["readme_tokens"],
+                )
+            readme_input = readme_prefix + batches * assumptions["readme_tokens"]
+
+        _add_call(calls, "readme", readme_input, assumptions["readme_tokens"])
+
+    # README prompt tokens of the directories being walked, the root first
+    readme_inputs = [
+        readme_prefix + count_tokens(os.path.basename(cfg.entry_path), model_name)
+    ]
+    for entry in walk_tree(cfg.entry_path, ignore_list, match_names_only=True):
+        # The walk left the directories deeper than the entry
+        while len(readme_inputs) > entry.depth + 1:
+            count_directory(readme_inputs.pop())
+            readme_inputs[-1] += assumptions["readme_tokens"]
+        if entry.is_dir:
+            directories += 1
+            readme_inputs[-1] += count_tokens(entry.name, model_name)
+            readme_inputs.append(readme_prefix + count_tokens(entry.name, model_name))
+        else:
+            readme_inputs[-1] += count_file(entry.name, entry.path)
+    while readme_inputs:
+        count_directory(readme_inputs.pop())
+        if readme_inputs:
+            readme_inputs[-1] += assumptions["readme_tokens"]
+
+    # Prompt prefix shared by the calls of each chain. Providers only cache
+    # prefixes above a minimum length, and the first call always misses.
+    prompt_names = {
+        "doc": doc_prompt,
+        "summary": "PROMPT_SUMMARY",
+        "dependencies": "PROMPT_DEPENDENCY_TREE",
+        "readme": "PROMPT_README",
+        "readme_batch": "PROMPT_README_BATCH",
+    }
+    for kind, c in calls.items():
+        prefix = _cacheable_prefix_tokens(
+            prompt_names[kind], model_name, **run_variables
+        )
+        c["cacheable_prefix_tokens"] = prefix
+        c["cached_input_tokens"] = (
+            prefix * (c["count"] - 1)
+            if prefix >= assumptions["prompt_cache_min_tokens"]
+            else 0
+        )
+
+    total = {
+        "count": sum(c["count"] for c in calls.values()),
+        "input_tokens": sum(c["input_tokens"] for c in calls.values()),
+        "cached_input_tokens": sum(c["cached_input_tokens"] for c in calls.values()),
+        "output_tokens": sum(c["output_tokens"] for c in calls.values()),
+    }
+
+    # Cost from the prices in llm.yaml, when known
+    llm_params = get_llm_config(model_name)
+    input_price = llm_params.get("input_cost_per_million")
+    output_price = llm_params.get("output_cost_per_million")
+    cached_price = llm_params.get("cached_input_cost_per_million", input_price)
+    batch_ratio = llm_params.get("batch_cost_ratio", 1.0)
+    if input_price is not None and output_price is not None:
+        total["cost_usd"] = round(
+            sum(
+                (
+                    (c["input_tokens"] - c["cached_input_tokens"]) * input_price
+                    + c["cached_input_tokens"] * cached_price
+                    + c["output_tokens"] * output_price
+                )
+                * (batch_ratio if kind in batched else 1.0)
+                for kind, c in calls.items()
+            )
+            / 1_000_000,
+            4,
+        )
+    else:
+        total["cost_usd"] = None
+
+    # Wall-clock time is bounded by whichever of concurrency, request rate and
+    # token rate is the tightest. Batched calls take up to the completion
+    # window of the provider instead, which is not included.
+    interactive = {kind: c for kind, c in calls.items() if kind not in batched}
+    call_seconds = sum(
+        c["count"] * assumptions["base_latency_seconds"]
+        + c["output_tokens"] / assumptions["output_tokens_per_second"]
+        for c in interactive.values()
+    )
+    bounds = {"concurrency": call_seconds / max(1, assumptions["concurrency"])}
+    if assumptions["requests_per_minute"]:
+        bounds["requests_per_minute"] = (
+            sum(c["count"] for c in interactive.values())
+            / assumptions["requests_per_minute"]
+            * 60
+        )
+    if assumptions["tokens_per_minute"]:
+        bounds["tokens_per_minute"] = (
+            sum(c["input_tokens"] + c["output_tokens"] for c in interactive.values())
+            / assumptions["tokens_per_minute"]
+            * 60
+        )
+    bottleneck = max(bounds, key=bounds.get)
+
+    return {
+        "model": model_name,
+        "entry_path": cfg.entry_path,
+        "files": files,
+        "duplicate_files": duplicate_files,
+        "skipped_files": skipped_files,
+        "directories": directories,
+        "source_tokens": source_tokens,
+        "largest_files": [
+            {"path": path, "tokens": tokens}
+            for tokens, path in sorted(largest_files, reverse=True)[:10]
+        ],
+        "calls": calls,
+        "batched_calls": list(batched),
+        "total": total,
+        "wall_clock_seconds": round(bounds[bottleneck], 1),
+        "bottleneck": bottleneck,
+        "assumptions": assumptions,
+    }
+
+
+def format_estimate(estimate):
+    """
+    Render an estimate as a human readable report.
+
+    Args:
+        estimate (dict): The result of ``estimate_documentation``.
+
+    Returns:
+        str: The report.
+    """
+    total = estimate["total"]
+    cost = total["cost_usd"]
+    lines = [
+        f"Estimate for {estimate['entry_path']} with {estimate['model']}",
+        f"  files to document: {estimate['files']} "
+        f"({estimate.get('duplicate_files', 0)} exact copies reusing documentation, "
+        f"{estimate['skipped_files']} other files skipped)",
+        f"  directories (README calls): {estimate['directories']}",
+        f"  source tokens: {estimate['source_tokens']:,}",
+        "",
+        f"  {'chain':<14}{'calls':>8}{'input tokens':>16}{'output tokens':>16}",
+    ]
+    for kind, c in estimate["calls"].items():
+        lines.append(
+            f"  {kind:<14}{c['count']:>8}{c['input_tokens']:>16,}{c['output_tokens']:>16,}"
+        )
+    lines.append(
+        f"  {'total':<14}{total['count']:>8}{total['input_tokens']:>16,}"
+        f"{total['output_tokens']:>16,}"
+    )
+    lines.append("")
+    lines.append(
+        "  cacheable prompt prefix per call: "
+        + ", ".join(
+            f"{kind} {c['cacheable_prefix_tokens']:,}"
+            for kind, c in estimate["calls"].items()
+        )
+        + f" tokens ({total['cached_input_tokens']:,} input tokens cached)"
+    )
+    lines.append("")
+    lines.append(
+        "  cost: "
+        + (f"${cost:,.2f}" if cost is not None else "unknown (no prices in llm.yaml)")
+    )
+    hours, rest = divmod(int(estimate["wall_clock_seconds"]), 3600)
+    lines.append(
+        f"  wall-clock: {hours}h {rest // 60}m {rest % 60}s "
+        f"(bound by {estimate['bottleneck']}, "
+        f"concurrency {estimate['assumptions']['concurrency']})"
+    )
+    if estimate.get("batched_calls"):
+        lines.append(
+            f"  batched: {', '.join(estimate['batched_calls'])} calls, at the batch "
+            "price, plus the batch completion time per wave"
+        )
+    return "\n".join(lines)
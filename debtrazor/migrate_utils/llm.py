@@ -1,6 +1,4 @@
 import os
-import yaml
-from langchain_openai import ChatOpenAI
 
 # Define the directory paths for package, root, and configuration files
 PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -8,25 +6,20 @@ ROOT_DIR = os.path.dirname(PACKAGE_DIR)
 CONFIG_DIR = os.path.join(ROOT_DIR, "configs")
 
 
-def get_llm(model_params):
+def get_llm_config(name):
     """
-    Retrieves a language model (LLM) based on the provided model parameters.
+    Retrieves the llm.yaml entry of a language model.
 
     Args:
-        model_params (object): An object containing model parameters.
-                               The object should have a 'name' attribute.
+        name (str): The name of the model, e.g. ``gpt-4o-mini``.
 
     Returns:
-        ChatOpenAI: An instance of the ChatOpenAI class configured with the specified model.
+        dict: The parameters of the model from the llm.yaml configuration file.
 
     Raises:
         ValueError: If the LLM name is not found in the llm.yaml configuration file.
-        ValueError: If the type specified in the llm.yaml is not recognized.
-        ValueError: If the API specified in the llm.yaml is not recognized.
     """
-    # Convert model parameters to a dictionary
-    model_params = model_params.__dict__
-    name = model_params["name"]
+    import yaml
 
     # Load the LLM configuration from the llm.yaml file
     llm_yaml_path = os.path.join(CONFIG_DIR, "llm.yaml")
@@ -35,17 +28,43 @@ def get_llm(model_params):
 
     try:
         # Retrieve the parameters for the specified LLM name
-        llm_yaml_params = llm_yaml[name]
+        return llm_yaml[name]
     except KeyError:
         # Raise an error if the LLM name is not found in the configuration file
         raise ValueError(f"LLM name {name} not found in llm.yaml")
 
+
+def get_llm(model_params):
+    """
+    Retrieves a language model (LLM) based on the provided model parameters.
+
+    Args:
+        model_params (object): An object containing model parameters.
+                               The object should have a 'name' attribute.
+
+    Returns:
+        ChatOpenAI: An instance of the ChatOpenAI class configured with the specified model.
+
+    Raises:
+        ValueError: If the LLM name is not found in the llm.yaml configuration file.
+        ValueError: If the type specified in the llm.yaml is not recognized.
+        ValueError: If the API specified in the llm.yaml is not recognized.
+    """
+    from langchain_openai import ChatOpenAI
+
+    # Convert model parameters to a dictionary
+    model_params = model_params.__dict__
+    name = model_params["name"]
+
+    llm_yaml_params = get_llm_config(name)
+
     # Only supports OpenAI for now and only completion for now
     # TODO: Other types and non OpenAI models
     if llm_yaml_params["api"] == "openai":
         if llm_yaml_params["type"] == "completion":
-            # Return an instance of ChatOpenAI with the specified model name and temperature
-            return ChatOpenAI(model=name, temperature=0)
+            # Return an instance of ChatOpenAI with the specified model name and temperature.
+            # Streamed responses report their token usage too.
+            return ChatOpenAI(model=name, temperature=0, stream_usage=True)
         else:
             # Raise an error if the type is not recognized
             raise ValueError(f'type {llm_yaml_params["type"]} not recognized')
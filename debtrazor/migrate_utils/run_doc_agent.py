@@ -1,14 +1,56 @@
 import asyncio
 from debtrazor.migrate_utils.llm import get_llm
 from debtrazor.agents.doc_agent.agent import DocAgent
+from debtrazor.agents.doc_agent.journal import hold_journal
 from debtrazor.tools.tree.node_js import madge
 from debtrazor.tools.tree.python import pydeps
+from debtrazor.tools.tree.java import javadeps
+from debtrazor.tools.tree.rust import rustdeps
+from debtrazor.tools.tree.c import cdeps
 from debtrazor.utils.logging import add_to_log_queue, logger
+from debtrazor.utils.metrics import metrics
+from debtrazor.utils.sniff import FileLimits
+from debtrazor.utils.dependency_index import save_dependency_index
+from debtrazor.utils.summary_store import save_summary_store
 from debtrazor.tools.git.git_commit import push_changes_to_github
 
 
+def get_doc_agent_options(cfg) -> dict:
+    """
+    Read the optional DocAgent settings of the ``document`` config section.
+
+    Args:
+        cfg: Configuration object of the run.
+
+    Returns:
+        dict: Keyword arguments for ``DocAgent``.
+    """
+    document = cfg.document
+    prefetch = getattr(document, "prefetch_files", None)
+    threshold = getattr(document, "near_duplicate_threshold", 0.8)
+    batch = getattr(document, "batch", None)
+    return {
+        "readme_batch_tokens": getattr(document, "readme_batch_tokens", None),
+        "max_concurrency": getattr(document, "max_concurrency", None) or 4,
+        "schedule": getattr(document, "schedule", None) or "directory",
+        "file_limits": FileLimits.from_config(document),
+        "prefetch": 8 if prefetch is None else prefetch,
+        "stream_output": bool(getattr(document, "stream_output", False)),
+        "output_format": getattr(document, "output_format", None) or "code",
+        "reuse_duplicates": getattr(document, "reuse_duplicates", None) is not False,
+        "near_duplicate_threshold": threshold,
+        "batch_backend": getattr(batch, "backend", None) or "openai",
+        "batch_size": getattr(batch, "max_files", None) or 1000,
+        "batch_poll_seconds": getattr(batch, "poll_seconds", None) or 60,
+    }
+
+
 async def run_documentation_agent(
-    init_state, memory, cfg, log_queue: asyncio.Queue | None = None
+    init_state,
+    memory,
+    cfg,
+    log_queue: asyncio.Queue | None = None,
+    doc_agent: DocAgent | None = None,
 ):
     """
     Process documentation using DocAgent.
@@ -23,29 +65,49 @@ async def run_documentation_agent(
         memory: The memory object used for checkpointing.
         cfg: Configuration object containing settings for the DocAgent.
         log_queue (asyncio.Queue | None): Optional queue for logging messages.
+        doc_agent (DocAgent | None): Optional already compiled agent to reuse,
+            e.g. one shared by the service across jobs. When given, ``memory``
+            is ignored and the agent's own checkpointer is used, and closing
+            the agent is left to the caller.
 
     Returns:
         dict: The final state of the documentation process.
     """
 
     # Initialize the documentation model and agent
-    doc_model = get_llm(cfg.document.model)
-    doc_agent = DocAgent(
-        doc_model, [madge, pydeps], checkpointer=memory, thread_id=str(cfg.thread_id)
-    )
+    own_agent = doc_agent is None
+    if own_agent:
+        doc_model = get_llm(cfg.document.model)
+        doc_agent = DocAgent(
+            doc_model,
+            [madge, pydeps, javadeps, rustdeps, cdeps],
+            checkpointer=memory,
+            thread_id=str(cfg.thread_id),
+            **get_doc_agent_options(cfg),
+        )
+    config = doc_agent.get_config(cfg.thread_id)
 
     # Get the current state of the documentation process
-    current_state = doc_agent.graph.get_state(doc_agent.config)
+    snapshot = doc_agent.graph.get_state(config)
 
     # Determine if the agent is running for the first time
-    if current_state.created_at is None:  # Agent is running for the first time
+    if snapshot.created_at is None:  # Agent is running for the first time
         current_state = init_state
+        graph_input = init_state
         should_call_doc_agent = True
     else:  # Agent has run before
-        current_state = current_state.values
-        should_call_doc_agent = bool(
-            current_state.get("items_to_process")
-        )  # If there are items remaining to process i.e. agent ran partially
+        current_state = snapshot.values
+        if current_state.get("finalized") is None:
+            # Checkpoint from before completion was tracked: assume done
+            # unless items remain to process
+            should_call_doc_agent = bool(current_state.get("items_to_process"))
+        else:
+            # Unfinished until the root README is written, which also covers
+            # a crash during the final README pass
+            should_call_doc_agent = not current_state["finalized"]
+        # Continue from the interrupted node, if any; its journaled sub-steps
+        # are not repeated
+        graph_input = None if snapshot.next else current_state
 
     logger.info("Updated Current State: %s", current_state)
 
@@ -55,15 +117,36 @@ async def run_documentation_agent(
             "Calling Doc agent to Document the repository", log_queue
         )
         logger.info("Calling Doc Agent")
-        events = doc_agent(current_state)
-        await DocAgent.stream_events(events, log_queue)
-        result = doc_agent.graph.get_state(doc_agent.config).values
+        # The journal is closed once the run no longer needs it
+        with hold_journal(current_state.get("journal_path")):
+            try:
+                events = doc_agent(graph_input, config)
+                await DocAgent.stream_events(events, log_queue)
+                result = doc_agent.graph.get_state(config).values
+            finally:
+                if own_agent:
+                    doc_agent.close()  # Stop its prefetch threads
+            # Persist the dependency graph for impact analysis and migration order
+            index_path = save_dependency_index(
+                result.get("dependencies_per_file"), cfg.output_path
+            )
+            logger.info("Dependency index written to %s", index_path)
+            # Persist the summaries for the later stages
+            store_path = save_summary_store(
+                doc_agent.summary_records(result), cfg.output_path
+            )
+            logger.info("Summary store written to %s", store_path)
+        if getattr(getattr(cfg, "metrics", None), "export", True):
+            # Export the run metrics next to the checkpoint database
+            metrics.current().write(cfg.output_path)
+            logger.info("Metrics written to %s", cfg.output_path)
         if cfg.document.commit_to_git:
             # Commit the documentation changes to the repository
             await add_to_log_queue(
                 "Committing documentation changes to the repository", log_queue
             )
-            push_changes_to_github(
+            await asyncio.to_thread(
+                push_changes_to_github,
                 cfg.entry_path, 
                 current_state["output_path"], 
                 cfg.github_token, 
@@ -0,0 +1,141 @@
+import asyncio
+from debtrazor.migrate_utils.llm import get_llm
+from debtrazor.agents.migrate_agent.agent import (
+    MigrateAgent,
+    migration_graph,
+    plan_waves,
+)
+from debtrazor.agents.doc_agent.journal import hold_journal
+from debtrazor.utils.logging import add_to_log_queue, logger
+from debtrazor.utils.metrics import metrics
+from debtrazor.utils.sniff import FileLimits
+
+
+def get_migrate_agent_options(cfg) -> dict:
+    """
+    Read the optional MigrateAgent settings of the ``migrate`` config section.
+
+    Args:
+        cfg: Configuration object of the run.
+
+    Returns:
+        dict: Keyword arguments for ``MigrateAgent``.
+    """
+    migrate = getattr(cfg, "migrate", None)
+    return {
+        "max_concurrency": getattr(migrate, "max_concurrency", None) or 4,
+        "context_tokens": getattr(migrate, "context_tokens", None) or 8000,
+        # The files the documentation skips are not migrated either
+        "file_limits": FileLimits.from_config(cfg.document),
+    }
+
+
+def run_migration_order_agent(init_state, cfg) -> list[list[list[str]]]:
+    """
+    Plan the order of a migration without calling the model.
+
+    Args:
+        init_state: The initial state of the migration, see
+            ``setup_migration_state``.
+        cfg: Configuration object of the run.
+
+    Returns:
+        list[list[list[str]]]: The waves of the migration, see ``plan_waves``.
+    """
+    options = get_migrate_agent_options(cfg)
+    model_cfg = getattr(getattr(cfg, "migrate", None), "model", None)
+    model_name = getattr(model_cfg or cfg.document.model, "name", None)
+    return plan_waves(migration_graph(init_state, options["file_limits"], model_name))
+
+
+async def run_migration_agent(
+    init_state,
+    memory,
+    cfg,
+    log_queue: asyncio.Queue | None = None,
+    migrate_agent: MigrateAgent | None = None,
+):
+    """
+    Migrate a documented repository using MigrateAgent.
+
+    The files are migrated in waves of the dependency graph collected by the
+    documentation, and a run resumes from its last checkpoint and the
+    journaled files.
+
+    Args:
+        init_state: The initial state of the migration, see
+            ``setup_migration_state``.
+        memory: The memory object used for checkpointing.
+        cfg: Configuration object containing settings for the MigrateAgent.
+            The ``migrate.model`` defaults to the ``document.model``.
+        log_queue (asyncio.Queue | None): Optional queue for logging messages.
+        migrate_agent (MigrateAgent | None): Optional already compiled agent
+            to reuse. When given, ``memory`` is ignored and the agent's own
+            checkpointer is used.
+
+    Returns:
+        dict: The final state of the migration.
+    """
+
+    # Initialize the migration model and agent
+    if migrate_agent is None:
+        model_cfg = getattr(getattr(cfg, "migrate", None), "model", None)
+        migrate_agent = MigrateAgent(
+            get_llm(model_cfg or cfg.document.model),
+            [],
+            checkpointer=memory,
+            thread_id=str(cfg.thread_id),
+            **get_migrate_agent_options(cfg),
+        )
+    config = migrate_agent.get_config(cfg.thread_id)
+
+    # Get the current state of the migration
+    snapshot = migrate_agent.graph.get_state(config)
+    if snapshot.created_at is None:  # Agent is running for the first time
+        current_state = init_state
+        graph_input = init_state
+    else:  # Agent has run before
+        current_state = snapshot.values
+        # Continue from the interrupted wave, if any; its journaled files are
+        # not migrated again
+        graph_input = None if snapshot.next else current_state
+
+    if current_state.get("finalized") and current_state.get("failed"):
+        # Plan again; the migrated files are reused from the output path and
+        # only the failed ones call the model
+        logger.info(
+            "Retrying the %d files whose migration failed",
+            len(current_state["failed"]),
+        )
+        current_state = init_state
+        graph_input = init_state
+
+    if not current_state.get("finalized"):
+        await add_to_log_queue(
+            "Calling Migrate agent to migrate the repository", log_queue
+        )
+        logger.info("Calling Migrate Agent")
+        # The journal is closed once the run no longer needs it
+        with hold_journal(current_state.get("journal_path")):
+            events = migrate_agent(graph_input, config)
+            await MigrateAgent.stream_events(events, log_queue)
+            result = migrate_agent.graph.get_state(config).values
+        logger.info("Migrated code written to %s", result["output_path"])
+        if result.get("failed"):
+            logger.warning(
+                "%d files could not be migrated and are retried by the next run: %s",
+                len(result["failed"]),
+                ", ".join(sorted(result["failed"])),
+            )
+        if getattr(getattr(cfg, "metrics", None), "export", True):
+            # Export the run metrics next to the checkpoint database
+            metrics.current().write(cfg.output_path)
+    else:
+        await add_to_log_queue(
+            "The migrate agent has already finalized migrating the repository. "
+            "Skipping the migrate agent execution.",
+            log_queue,
+        )
+        result = current_state
+
+    return result
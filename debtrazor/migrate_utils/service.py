@@ -0,0 +1,338 @@
+import os
+import sys
+import copy
+import json
+import asyncio
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any
+
+from debtrazor.schema.request import AgentRequest
+from debtrazor.utils.load import load_and_validate_config
+from debtrazor.utils.logging import add_to_log_queue, logger
+from debtrazor.utils.metrics import metrics
+from debtrazor.migrate_utils.llm import get_llm
+from debtrazor.migrate_utils.setup import (
+    setup_environment,
+    setup_initial_state,
+    setup_memory,
+    setup_output_path,
+)
+from debtrazor.migrate_utils.run_doc_agent import (
+    get_doc_agent_options,
+    run_documentation_agent,
+)
+from debtrazor.agents.doc_agent.agent import DocAgent
+from debtrazor.tools.tree.node_js import madge
+from debtrazor.tools.tree.python import pydeps
+from debtrazor.tools.tree.java import javadeps
+from debtrazor.tools.tree.rust import rustdeps
+from debtrazor.tools.tree.c import cdeps
+
+
+@dataclass
+class Job:
+    """
+    A documentation job queued on the service.
+
+    Attributes:
+        data (dict[str, Any]): The job configuration, merged over the service
+            defaults.
+        tenant (str): Key used to share the concurrency limit fairly.
+        log_queue (asyncio.Queue | None): Optional queue for job progress.
+        future (asyncio.Future): Resolves with the final state of the job.
+    """
+
+    data: dict[str, Any]
+    tenant: str
+    log_queue: asyncio.Queue | None
+    future: asyncio.Future = field(repr=False)
+
+
+class DocService:
+    """
+    Long-running service that documents many repositories in one process.
+
+    Models, compiled ``DocAgent`` graphs and the checkpoint saver are created
+    once and shared by every job; each job only gets its own LangGraph thread.
+    Jobs are grouped by tenant and picked round-robin, so one tenant with a
+    long queue cannot starve the others of the global concurrency limit.
+
+    The process-wide settings (LangChain verbosity and tracing) are set up
+    once, by ``serve``, and not per job.
+    """
+
+    def __init__(self, cfg, defaults: dict[str, Any] | None = None):
+        """
+        Initialize the service.
+
+        Args:
+            cfg (Config): Service configuration. ``output_path`` holds the shared
+                checkpoint database and ``service.max_concurrent_jobs`` (default
+                4) bounds the number of jobs running at once.
+            defaults (dict[str, Any] | None): Configuration every job is merged
+                over, usually the parsed ``config.yaml``.
+        """
+        self.cfg = cfg
+        self.defaults = defaults or {}
+        service_cfg = getattr(cfg, "service", None)
+        self.max_concurrent_jobs = getattr(service_cfg, "max_concurrent_jobs", 4)
+
+        os.makedirs(cfg.output_path, exist_ok=True)
+        self._memory = setup_memory(cfg)
+        self._checkpointer = self._memory.__enter__()
+        self._models = {}
+        self._agents = {}
+
+        self._queues: OrderedDict[str, deque[Job]] = OrderedDict()
+        # Threads of the queued and running jobs, see submit
+        self._threads: set[str] = set()
+        self._ready = asyncio.Condition()
+        self._workers: list[asyncio.Task] = []
+        self._closed = False
+
+    def get_model(self, model_params):
+        """
+        Return the shared chat model for the given model parameters.
+
+        Args:
+            model_params: Model parameters with a ``name`` attribute.
+
+        Returns:
+            The cached chat model instance.
+        """
+        if model_params.name not in self._models:
+            logger.info("Loading model: %s", model_params.name)
+            self._models[model_params.name] = get_llm(model_params)
+        return self._models[model_params.name]
+
+    def get_doc_agent(self, cfg):
+        """
+        Return the shared, compiled ``DocAgent`` for the job's model and options.
+
+        Args:
+            cfg (Config): The job configuration.
+
+        Returns:
+            DocAgent: The cached agent bound to the shared checkpointer.
+        """
+        name = cfg.document.model.name
+        options = get_doc_agent_options(cfg)
+        key = (name, tuple(sorted(options.items())))
+        if key not in self._agents:
+            logger.info("Compiling DocAgent graph for model: %s", name)
+            self._agents[key] = DocAgent(
+                self.get_model(cfg.document.model),
+                [madge, pydeps, javadeps, rustdeps, cdeps],
+                checkpointer=self._checkpointer,
+                **options,
+            )
+        return self._agents[key]
+
+    async def submit(
+        self,
+        request: AgentRequest | dict[str, Any],
+        tenant: str | None = None,
+        log_queue: asyncio.Queue | None = None,
+    ) -> asyncio.Future:
+        """
+        Queue a documentation job.
+
+        Args:
+            request (AgentRequest | dict[str, Any]): The job, as a request model
+                or a dict of configuration keys overriding the defaults.
+            tenant (str | None): Fairness key. Defaults to the job's ``tenant``
+                key, then to its ``github_username``.
+            log_queue (asyncio.Queue | None): Optional queue for job progress.
+
+        Returns:
+            asyncio.Future: Resolves with the final state of the job.
+
+        Raises:
+            RuntimeError: If the service has been closed.
+            ValueError: If the job has no ``thread_id`` of its own, or one of
+                a job that is queued or running: jobs share the checkpointer,
+                so they would run on, or skip as finalized, the same thread.
+        """
+        if self._closed:
+            raise RuntimeError("DocService is closed")
+        if isinstance(request, AgentRequest):
+            request = request.model_dump(exclude_none=True)
+
+        data = copy.deepcopy(self.defaults)
+        _merge(data, request)
+        tenant = tenant or data.pop("tenant", None) or data.get("github_username")
+        thread_id = request.get("thread_id")
+        if thread_id is None or thread_id == self.defaults.get("thread_id"):
+            raise ValueError("Every job needs a thread_id of its own")
+        if thread_id in self._threads:
+            raise ValueError(f"A job for thread_id {thread_id!r} is already running")
+        job = Job(
+            data=data,
+            tenant=str(tenant or "default"),
+            log_queue=log_queue,
+            future=asyncio.get_running_loop().create_future(),
+        )
+
+        async with self._ready:
+            self._threads.add(thread_id)
+            self._queues.setdefault(job.tenant, deque()).append(job)
+            self._ready.notify()
+        return job.future
+
+    async def start(self):
+        """
+        Start the worker tasks that run queued jobs.
+        """
+        for _ in range(self.max_concurrent_jobs - len(self._workers)):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def close(self):
+        """
+        Stop the workers once the queued jobs are done and release resources.
+        """
+        self._closed = True
+        async with self._ready:
+            self._ready.notify_all()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for agent in self._agents.values():
+            agent.close()
+        self._memory.__exit__(None, None, None)
+
+    async def _next_job(self) -> Job | None:
+        """
+        Wait for the next job, taking one from each tenant in turn.
+
+        Returns:
+            Job | None: The next job, or None once the service is closed and
+            every queue is drained.
+        """
+        async with self._ready:
+            while not self._queues:
+                if self._closed:
+                    return None
+                await self._ready.wait()
+            tenant, queue = self._queues.popitem(last=False)
+            job = queue.popleft()
+            if queue:
+                # Put the tenant at the back of the rotation
+                self._queues[tenant] = queue
+            return job
+
+    async def _worker(self):
+        """
+        Run jobs until the service is closed.
+        """
+        while True:
+            job = await self._next_job()
+            if job is None:
+                return
+            try:
+                result = await self._run_job(job)
+            except Exception as e:
+                logger.exception("Job failed for tenant %s", job.tenant)
+                await add_to_log_queue(f"ERROR: {e}", job.log_queue)
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._threads.discard(job.data["thread_id"])
+
+    async def _run_job(self, job: Job):
+        """
+        Run a single documentation job on the shared agent.
+
+        The job's metrics are recorded in a registry of its own, so its
+        exported metrics leave out the other jobs.
+
+        Args:
+            job (Job): The job to run.
+
+        Returns:
+            dict: The final state of the documentation process.
+        """
+        cfg = await load_and_validate_config(job.data, job.log_queue)
+        await setup_output_path(cfg, log_queue=job.log_queue)
+        init_state = setup_initial_state(cfg)
+        with metrics.run():
+            return await run_documentation_agent(
+                init_state,
+                None,
+                cfg,
+                log_queue=job.log_queue,
+                doc_agent=self.get_doc_agent(cfg),
+            )
+
+
+def _merge(base: dict[str, Any], overrides: dict[str, Any]) -> dict[str, Any]:
+    """
+    Recursively merge ``overrides`` into ``base`` in place.
+
+    Args:
+        base (dict[str, Any]): The dictionary to update.
+        overrides (dict[str, Any]): The values taking precedence.
+
+    Returns:
+        dict[str, Any]: The updated ``base``.
+    """
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _merge(base[key], value)
+        else:
+            base[key] = value
+    return base
+
+
+async def serve(cfg, defaults: dict[str, Any], stream=None):
+    """
+    Run the service on JSON jobs read line by line from a stream.
+
+    Every line is a JSON object of configuration keys overriding ``defaults``
+    (at least a distinct ``thread_id`` and ``entry_path`` per repository). One
+    JSON line with the outcome is printed to stdout per finished job.
+
+    Args:
+        cfg (Config): Service configuration.
+        defaults (dict[str, Any]): Configuration every job is merged over.
+        stream: Text stream to read jobs from. Defaults to stdin.
+    """
+    stream = stream or sys.stdin
+    await setup_environment(cfg, log_queue=None)
+    service = DocService(cfg, defaults)
+    await service.start()
+
+    async def report(data, future):
+        status = {"thread_id": data.get("thread_id"), "status": "done"}
+        try:
+            await future
+        except Exception as e:
+            status.update(status="failed", error=str(e))
+        print(json.dumps(status), flush=True)
+
+    reports = []
+    try:
+        while True:
+            line = await asyncio.to_thread(stream.readline)
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.error("Skipping malformed job line: %s", e)
+                continue
+            try:
+                future = await service.submit(data)
+            except ValueError as e:
+                logger.error("Rejecting job: %s", e)
+                status = {"thread_id": data.get("thread_id"), "status": "failed"}
+                print(json.dumps({**status, "error": str(e)}), flush=True)
+                continue
+            reports.append(asyncio.create_task(report(data, future)))
+        await asyncio.gather(*reports)
+    finally:
+        await service.close()
@@ -1,10 +1,10 @@
 import os
 import asyncio
+import sqlite3
+from contextlib import closing, contextmanager
 from debtrazor.utils.cfg import Config
-from langchain.globals import set_verbose
 from debtrazor.utils.logging import add_to_log_queue, logger
 from debtrazor.utils.util import read_gitignore
-from langgraph.checkpoint.sqlite import SqliteSaver
 
 
 def setup_langchain_tracing(cfg: Config) -> None:
@@ -28,18 +28,17 @@ def setup_langchain_tracing(cfg: Config) -> None:
             os.environ["LANGCHAIN_PROJECT"] = cfg.project_name
 
 
-async def setup_environment(cfg, log_queue: asyncio.Queue | None = None):
+async def setup_output_path(cfg, log_queue: asyncio.Queue | None = None):
     """
-    Setup the environment, including directories and logging.
+    Create the output directory and check that it is writable.
 
     Args:
-        cfg (Config): Configuration object containing environment settings.
+        cfg (Config): Configuration object with the ``output_path``.
         log_queue (asyncio.Queue, optional): Queue for logging messages. Defaults to None.
 
     Raises:
         PermissionError: If the output directory is not writable.
     """
-    # Ensure output directory exists and is writable
     os.makedirs(cfg.output_path, exist_ok=True)
     if not os.access(cfg.output_path, os.W_OK):
         await add_to_log_queue(
@@ -50,23 +49,86 @@ async def setup_environment(cfg, log_queue: asyncio.Queue | None = None):
             f"No write permission for the directory: {cfg.output_path}"
         )
 
+
+async def setup_environment(cfg, log_queue: asyncio.Queue | None = None):
+    """
+    Setup the environment, including directories and logging.
+
+    Args:
+        cfg (Config): Configuration object containing environment settings.
+        log_queue (asyncio.Queue, optional): Queue for logging messages. Defaults to None.
+
+    Raises:
+        PermissionError: If the output directory is not writable.
+    """
+    # Ensure output directory exists and is writable
+    await setup_output_path(cfg, log_queue)
+
+    from langchain.globals import set_verbose
+
     set_verbose(cfg.langchain_verbose)  # Set Langchain Verbosity
     setup_langchain_tracing(cfg)  # Setup langchain tracing
 
 
+def setup_metrics(cfg):
+    """
+    Serve live metrics over HTTP if a port is configured.
+
+    Args:
+        cfg (Config): Configuration object with an optional ``metrics.port``.
+
+    Returns:
+        ThreadingHTTPServer | None: The metrics server, if started.
+    """
+    from debtrazor.utils.metrics import metrics, start_metrics_server
+
+    port = getattr(getattr(cfg, "metrics", None), "port", None)
+    if port is None:
+        return None
+    return start_metrics_server(metrics, int(port))
+
+
 def setup_memory(cfg):
     """
     Setup memory using SqliteSaver.
 
     Args:
         cfg (Config): Configuration object containing memory settings.
+            ``checkpoint.format`` selects the checkpoint serialization:
+            ``compact`` (default) or ``default`` for the LangGraph one.
+            ``checkpoint.keep_last`` (default 2) is the number of checkpoints
+            kept per thread, null to keep them all.
 
     Returns:
         SqliteSaver: An instance of SqliteSaver initialized with the database path.
     """
+    from langgraph.checkpoint.sqlite import SqliteSaver
+
     db_path = os.path.join(cfg.output_path, "checkpoint.db")
     logger.info("Database path: %s", db_path)
-    memory = SqliteSaver.from_conn_string(db_path)
+
+    serde = None
+    checkpoint_cfg = getattr(cfg, "checkpoint", None)
+    checkpoint_format = getattr(checkpoint_cfg, "format", None)
+    keep_last = getattr(checkpoint_cfg, "keep_last", 2)
+    if (checkpoint_format or "compact") == "compact":
+        from debtrazor.agents.doc_agent.serde import CompactCheckpointSerializer
+
+        # Also reads checkpoints written in the default format
+        serde = CompactCheckpointSerializer()
+
+    @contextmanager
+    def open_saver():
+        with closing(sqlite3.connect(db_path, check_same_thread=False)) as conn:
+            if keep_last is None:
+                yield SqliteSaver(conn, serde=serde)
+                return
+            from debtrazor.agents.doc_agent.checkpoints import RetainingSqliteSaver
+
+            # Older checkpoints are deleted as new ones are saved
+            yield RetainingSqliteSaver(conn, serde=serde, keep_last=keep_last)
+
+    memory = open_saver()
     return memory
 
 
@@ -92,5 +154,53 @@ def setup_initial_state(cfg):
         "indent": "",
         "current_path": None,
         "items_to_process": [],
+        "completed_subtrees": {},
+        "file_summaries": {},
+        "journal_path": os.path.join(cfg.output_path, "journal.db"),
+        "finalized": False,
+    }
+    return init_state
+
+
+def setup_migration_state(cfg):
+    """
+    Create initial state for MigrateAgent.
+
+    The dependency graph is read from the dependency index written by the
+    documentation run.
+
+    Args:
+        cfg (Config): Configuration object containing initial state settings.
+
+    Returns:
+        dict: A dictionary representing the initial state.
+    """
+    from debtrazor.utils.dependency_index import INDEX_FILE, DependencyIndex
+
+    index_path = os.path.join(cfg.output_path, INDEX_FILE)
+    if os.path.exists(index_path):
+        dependencies_per_file = DependencyIndex.load(index_path).to_dict()
+    else:
+        logger.warning(
+            "No dependency index at %s, files are migrated in a single wave",
+            index_path,
+        )
+        dependencies_per_file = {}
+    init_state = {
+        "entry_path": cfg.entry_path,
+        "output_path": os.path.join(cfg.output_path, "migrated", cfg.new_language),
+        "doc_output_path": cfg.output_path,
+        "ignore_list": read_gitignore(cfg.entry_path),
+        "legacy_language": cfg.legacy_language,
+        "legacy_framework": cfg.legacy_framework,
+        "new_language": cfg.new_language,
+        "new_framework": cfg.new_framework,
+        "dependencies_per_file": dependencies_per_file,
+        "waves": [],
+        "wave": 0,
+        "migrated": {},
+        "failed": {},
+        "journal_path": os.path.join(cfg.output_path, "journal.db"),
+        "finalized": False,
     }
     return init_state
@@ -0,0 +1,194 @@
+"""
+Sharded mode: document independent subtrees of a repository in parallel.
+
+Directories at a given depth below ``entry_path`` (e.g. ``services/a`` and
+``services/b`` of a monorepo) are documented by separate agent threads in a
+process pool, each with its own checkpoint database. A final run over the
+repository then documents the remaining files and merges the shards' READMEs
+and directory structures into the parent READMEs.
+"""
+
+import os
+import copy
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from debtrazor.utils.load import load_and_validate_config
+from debtrazor.utils.logging import add_to_log_queue, logger
+from debtrazor.utils.util import is_ignored, read_gitignore
+from debtrazor.utils.summary_store import STORE_FILE, SummaryStore
+from debtrazor.migrate_utils.setup import (
+    setup_environment,
+    setup_initial_state,
+    setup_memory,
+)
+from debtrazor.migrate_utils.run_doc_agent import run_documentation_agent
+
+
+def plan_shards(entry_path: str, ignore_list: list[str], depth: int = 1) -> list[str]:
+    """
+    List the directories to document as separate shards.
+
+    Args:
+        entry_path (str): The repository root.
+        ignore_list (list[str]): Patterns of entries to ignore, as used by the
+            DocAgent.
+        depth (int): Depth of the shard directories below the root, 1 for its
+            top-level sub-directories.
+
+    Returns:
+        list[str]: The shard paths relative to ``entry_path``.
+    """
+    level = [""]
+    for _ in range(depth):
+        next_level = []
+        for relative_path in level:
+            try:
+                names = sorted(os.listdir(os.path.join(entry_path, relative_path)))
+            except OSError:
+                continue
+            for name in names:
+                if is_ignored(name, ignore_list):
+                    continue
+                child = os.path.join(relative_path, name) if relative_path else name
+                if os.path.isdir(os.path.join(entry_path, child)):
+                    next_level.append(child)
+        level = next_level
+    return level
+
+
+async def _document_shard_async(config_data: dict[str, Any], shard: str) -> dict:
+    """
+    Document one shard as its own agent thread.
+
+    Args:
+        config_data (dict[str, Any]): Configuration of the whole run.
+        shard (str): The shard path relative to ``entry_path``.
+
+    Returns:
+        dict: The shard ``path``, its root ``readme``, its
+        ``directory_structure``, its ``dependencies_per_file`` and the
+        ``output_path`` of its run files (e.g. its summary store).
+    """
+    base = await load_and_validate_config(config_data)
+
+    # Each shard gets its own thread, checkpoint database and metrics, and
+    # leaves committing to the final merge run
+    shard_data = copy.deepcopy(config_data)
+    shard_data["entry_path"] = os.path.join(base.entry_path, shard)
+    shard_data["output_path"] = os.path.join(
+        base.output_path, "shards", shard.replace(os.sep, "__")
+    )
+    shard_data["thread_id"] = f"{base.thread_id}:{shard}"
+    shard_data["document"]["commit_to_git"] = False
+    cfg = await load_and_validate_config(shard_data)
+    await setup_environment(cfg)
+
+    init_state = setup_initial_state(cfg)
+    # Write the documentation where an unsharded run would, with the ignore
+    # list of the repository
+    init_state["output_path"] = os.path.join(
+        base.output_path, base.legacy_language, shard
+    )
+    init_state["ignore_list"] = read_gitignore(base.entry_path)
+
+    memory = setup_memory(cfg)
+    result = await run_documentation_agent(init_state, memory, cfg)
+    messages = result.get("messages") or []
+    return {
+        "path": shard,
+        "readme": messages[-1].content if messages else "",
+        "directory_structure": result.get("directory_structure", ""),
+        "dependencies_per_file": result.get("dependencies_per_file") or {},
+        "output_path": cfg.output_path,
+    }
+
+
+def _document_shard(config_data: dict[str, Any], shard: str) -> dict:
+    """
+    Process pool entry point of ``_document_shard_async``.
+
+    Args:
+        config_data (dict[str, Any]): Configuration of the whole run.
+        shard (str): The shard path relative to ``entry_path``.
+
+    Returns:
+        dict: The shard result.
+    """
+    return asyncio.run(_document_shard_async(config_data, shard))
+
+
+async def run_sharded_documentation(
+    cfg, config_data: dict[str, Any], log_queue: asyncio.Queue | None = None
+):
+    """
+    Document a repository by shards in parallel processes, then merge them.
+
+    Args:
+        cfg (Config): Configuration object of the run. ``shard.depth``
+            (default 1) sets the depth of the shard directories and
+            ``shard.processes`` (default: CPU count) the pool size.
+        config_data (dict[str, Any]): The raw configuration, sent to the
+            worker processes.
+        log_queue (asyncio.Queue | None): Optional queue for logging messages.
+
+    Returns:
+        dict: The final state of the merge run.
+    """
+    shard_cfg = getattr(cfg, "shard", None)
+    depth = getattr(shard_cfg, "depth", None) or 1
+    processes = getattr(shard_cfg, "processes", None) or os.cpu_count() or 1
+
+    shards = plan_shards(cfg.entry_path, read_gitignore(cfg.entry_path), depth)
+    await add_to_log_queue(
+        f"Documenting {len(shards)} shards in up to {processes} processes", log_queue
+    )
+    logger.info("Shards: %s", shards)
+
+    results = []
+    if shards:
+        loop = asyncio.get_running_loop()
+        # Spawn so workers do not inherit threads (e.g. the metrics server)
+        with ProcessPoolExecutor(
+            max_workers=min(processes, len(shards)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            results = await asyncio.gather(
+                *(
+                    loop.run_in_executor(pool, _document_shard, config_data, shard)
+                    for shard in shards
+                )
+            )
+
+    # Merge run: documents the files outside the shards and builds the parent
+    # READMEs from the shard READMEs
+    await add_to_log_queue("Merging the documented shards", log_queue)
+    init_state = setup_initial_state(cfg)
+    for result in results:
+        init_state["completed_subtrees"][result["path"]] = {
+            "readme": result["readme"],
+            "directory_structure": result["directory_structure"],
+        }
+        # Paths of a shard are relative to the shard root
+        for path, dependencies in result["dependencies_per_file"].items():
+            init_state["dependencies_per_file"][os.path.join(result["path"], path)] = [
+                os.path.normpath(os.path.join(result["path"], dependency))
+                for dependency in dependencies or []
+            ]
+
+    memory = setup_memory(cfg)
+    result = await run_documentation_agent(init_state, memory, cfg, log_queue)
+
+    # The merge run only journaled the files outside the shards
+    store_path = os.path.join(cfg.output_path, STORE_FILE)
+    if os.path.exists(store_path):
+        with SummaryStore(store_path) as store:
+            for shard in results:
+                shard_store_path = os.path.join(shard["output_path"], STORE_FILE)
+                if not os.path.exists(shard_store_path):
+                    continue
+                with SummaryStore(shard_store_path) as shard_store:
+                    store.add(shard_store.records(), prefix=shard["path"])
+    return result
@@ -0,0 +1,453 @@
+"""
+Watch mode: keep the documentation of a repository up to date as it changes.
+
+After a first documentation run, the repository is watched and only the
+changed files, and the READMEs of their directories up to the root, are
+documented again (``DocAgent.refresh``). Changes are read from inotify on
+Linux, or found by polling the modification times of the files elsewhere.
+Bursts of changes (a git checkout, a formatter run) are coalesced: a refresh
+starts once the repository has been quiet for ``debounce_seconds``, or at
+the latest ``max_delay_seconds`` after the first change. The agent, its
+models, the journal and the dependencies stay loaded between refreshes.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import asyncio
+import ctypes
+import ctypes.util
+
+from debtrazor.utils.logging import logger
+from debtrazor.utils.metrics import metrics
+from debtrazor.utils.util import is_ignored
+
+# inotify event masks, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# wd, mask, cookie and name length of an inotify event, followed by the name
+_EVENT = struct.Struct("iIII")
+
+
+def _walk(root: str, relative_path: str, ignore_list: list[str], exclude: str):
+    """
+    Yield a directory and the files and directories below it.
+
+    Args:
+        root (str): The repository root.
+        relative_path (str): The directory relative to the root.
+        ignore_list (list[str]): Patterns of the ignored names.
+        exclude (str): A real path left out, e.g. the output inside the
+            repository.
+
+    Yields:
+        tuple[str, os.DirEntry | None]: Each path relative to the root, with
+        its directory entry (None for ``relative_path`` itself).
+    """
+    yield relative_path, None
+    stack = [relative_path]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = list(os.scandir(os.path.join(root, directory)))
+        except OSError:
+            continue  # Deleted meanwhile
+        for entry in entries:
+            if is_ignored(entry.name, ignore_list):
+                continue
+            path = os.path.join(directory, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                if os.path.realpath(entry.path) == exclude:
+                    continue
+                stack.append(path)
+            yield path, entry
+
+
+class PollingWatcher:
+    """
+    Find changes by comparing the modification times and sizes of the files
+    between scans of the repository.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        ignore_list: list[str],
+        exclude: str | None = None,
+        interval: float = 2.0,
+    ):
+        """
+        Initialize the watcher with a first scan.
+
+        Args:
+            root (str): The repository root.
+            ignore_list (list[str]): Patterns of the names not watched.
+            exclude (str | None): A directory not watched, e.g. the output.
+            interval (float): Seconds between scans.
+        """
+        self.root = root
+        self.ignore_list = ignore_list
+        self.exclude = os.path.realpath(exclude) if exclude else ""
+        self.interval = interval
+        self._snapshot = self._scan()
+        self._last_scan = time.monotonic()
+
+    def _scan(self) -> dict[str, tuple | None]:
+        snapshot = {}
+        for path, entry in _walk(self.root, "", self.ignore_list, self.exclude):
+            if entry is None or entry.is_dir(follow_symlinks=False):
+                snapshot[path] = None
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def read(self, timeout: float | None) -> set[str] | None:
+        """
+        Wait for changes.
+
+        Args:
+            timeout (float | None): Maximum seconds to wait, None to wait for
+                the first change.
+
+        Returns:
+            set[str] | None: The created, modified or deleted paths relative
+            to the root, empty if none changed in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self._last_scan + self.interval - time.monotonic()
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+            if delay > 0:
+                time.sleep(delay)
+            if time.monotonic() >= self._last_scan + self.interval:
+                snapshot = self._scan()
+                self._last_scan = time.monotonic()
+                changed = {
+                    path
+                    for path in snapshot.keys() | self._snapshot.keys()
+                    if snapshot.get(path, 0) != self._snapshot.get(path, 0)
+                }
+                self._snapshot = snapshot
+                if changed:
+                    return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Read changes from Linux inotify, with a watch on every directory.
+    """
+
+    def __init__(self, root: str, ignore_list: list[str], exclude: str | None = None):
+        """
+        Initialize the watcher and watch the repository.
+
+        Args:
+            root (str): The repository root.
+            ignore_list (list[str]): Patterns of the names not watched.
+            exclude (str | None): A directory not watched, e.g. the output.
+
+        Raises:
+            OSError: If inotify is not available or out of watches.
+        """
+        self.root = root
+        self.ignore_list = ignore_list
+        self.exclude = os.path.realpath(exclude) if exclude else ""
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1: {os.strerror(error)}")
+        self._paths: dict[int, str] = {}
+        try:
+            self._add_tree("")
+        except OSError:
+            self.close()
+            raise
+
+    def _add_tree(self, relative_path: str) -> set[str]:
+        """
+        Watch a directory and the directories below it.
+
+        Args:
+            relative_path (str): The directory relative to the root.
+
+        Returns:
+            set[str]: The paths found below it, which may have been created
+            before the watches were added.
+        """
+        found = set()
+        for path, entry in _walk(
+            self.root, relative_path, self.ignore_list, self.exclude
+        ):
+            if entry is not None and not entry.is_dir(follow_symlinks=False):
+                found.add(path)
+                continue
+            wd = self._libc.inotify_add_watch(
+                self._fd,
+                os.fsencode(os.path.join(self.root, path)),
+                WATCH_MASK | IN_ONLYDIR,
+            )
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error in (errno.ENOENT, errno.ENOTDIR):
+                    continue  # Deleted meanwhile
+                raise OSError(error, f"inotify_add_watch: {os.strerror(error)}")
+            self._paths[wd] = path
+            found.add(path)
+        return found
+
+    def _remove_tree(self, relative_path: str):
+        """
+        Stop watching a directory moved away, and the directories below it.
+
+        Args:
+            relative_path (str): The former directory path.
+        """
+        prefix = relative_path + os.sep
+        for wd, path in list(self._paths.items()):
+            if path == relative_path or path.startswith(prefix):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._paths[wd]
+
+    def read(self, timeout: float | None) -> set[str] | None:
+        """
+        Wait for changes.
+
+        Args:
+            timeout (float | None): Maximum seconds to wait, None to wait for
+                the first change.
+
+        Returns:
+            set[str] | None: The created, modified or deleted paths relative
+            to the root, empty if none changed in time, or None if events
+            were lost and the repository must be rescanned.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        lost = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                lost = True
+                continue
+            if mask & IN_IGNORED:
+                self._paths.pop(wd, None)  # Its directory was deleted
+                continue
+            directory = self._paths.get(wd)
+            if directory is None or not name or is_ignored(name, self.ignore_list):
+                continue
+            path = os.path.join(directory, name)
+            changed.add(path)
+            if mask & IN_ISDIR:
+                if mask & IN_MOVED_FROM:
+                    self._remove_tree(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    changed |= self._add_tree(path)
+        return None if lost else changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(
+    backend: str,
+    root: str,
+    ignore_list: list[str],
+    exclude: str | None = None,
+    poll_interval: float = 2.0,
+):
+    """
+    Create the watcher of a repository.
+
+    Args:
+        backend (str): "inotify", "polling", or "auto" for inotify where it
+            is available and polling otherwise.
+        root (str): The repository root.
+        ignore_list (list[str]): Patterns of the names not watched.
+        exclude (str | None): A directory not watched, e.g. the output.
+        poll_interval (float): Seconds between scans of the polling watcher.
+
+    Returns:
+        InotifyWatcher | PollingWatcher: The watcher.
+
+    Raises:
+        ValueError: If the backend name is not recognized.
+    """
+    if backend not in ("auto", "inotify", "polling"):
+        raise ValueError(f"Watch backend {backend} not recognized")
+    if backend != "polling" and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, ignore_list, exclude)
+        except (OSError, AttributeError) as e:
+            # E.g. out of watches on a large repository
+            if backend == "inotify":
+                raise
+            logger.warning("inotify unavailable (%s), polling for changes", e)
+    return PollingWatcher(root, ignore_list, exclude, poll_interval)
+
+
+async def next_changes(
+    watcher, debounce_seconds: float, max_delay_seconds: float
+) -> tuple[set[str] | None, float]:
+    """
+    Wait for the next burst of changes and coalesce it.
+
+    Args:
+        watcher (InotifyWatcher | PollingWatcher): The watcher.
+        debounce_seconds (float): Quiet time ending a burst.
+        max_delay_seconds (float): Longest time a burst is collected.
+
+    Returns:
+        tuple[set[str] | None, float]: The changed paths, or None if the
+        repository must be rescanned, and the monotonic time of the first
+        change.
+    """
+    changes = set()
+    first = last = None
+    while True:
+        if first is None:
+            # Bounded, so the loop stays responsive to cancellation
+            timeout = 1.0
+        else:
+            timeout = min(last + debounce_seconds, first + max_delay_seconds)
+            timeout = max(timeout - time.monotonic(), 0)
+        paths = await asyncio.to_thread(watcher.read, timeout)
+        now = time.monotonic()
+        if paths is None or paths:
+            first = now if first is None else first
+            last = now
+            changes = None if paths is None or changes is None else changes | paths
+        if first is not None and (
+            now >= last + debounce_seconds or now >= first + max_delay_seconds
+        ):
+            return changes, first
+
+
+async def watch_documentation(cfg):
+    """
+    Document a repository, then keep its documentation up to date.
+
+    The repository is first documented (or the previous run resumed), and
+    the files changed since its documentation was written are refreshed.
+    Changes are then refreshed as they happen, until the process is stopped.
+
+    Args:
+        cfg (Config): Configuration of the run. The optional ``watch``
+            section sets ``backend`` (auto, inotify or polling),
+            ``debounce_seconds``, ``max_delay_seconds`` and
+            ``poll_interval_seconds``.
+    """
+    from debtrazor.agents.doc_agent.agent import DocAgent
+    from debtrazor.agents.doc_agent.journal import hold_journal
+    from debtrazor.migrate_utils.llm import get_llm
+    from debtrazor.migrate_utils.run_doc_agent import (
+        get_doc_agent_options,
+        run_documentation_agent,
+    )
+    from debtrazor.migrate_utils.setup import setup_initial_state, setup_memory
+    from debtrazor.tools.tree.node_js import madge
+    from debtrazor.tools.tree.python import pydeps
+    from debtrazor.tools.tree.java import javadeps
+    from debtrazor.tools.tree.rust import rustdeps
+    from debtrazor.tools.tree.c import cdeps
+    from debtrazor.utils.dependency_index import save_dependency_index
+    from debtrazor.utils.summary_store import save_summary_store
+
+    watch_cfg = getattr(cfg, "watch", None)
+    backend = getattr(watch_cfg, "backend", None) or "auto"
+    debounce_seconds = getattr(watch_cfg, "debounce_seconds", None)
+    debounce_seconds = 2.0 if debounce_seconds is None else debounce_seconds
+    max_delay_seconds = getattr(watch_cfg, "max_delay_seconds", None) or 30.0
+    poll_interval = getattr(watch_cfg, "poll_interval_seconds", None) or 2.0
+    export = getattr(getattr(cfg, "metrics", None), "export", True)
+
+    with setup_memory(cfg) as checkpointer:
+        agent = DocAgent(
+            get_llm(cfg.document.model),
+            [madge, pydeps, javadeps, rustdeps, cdeps],
+            checkpointer=checkpointer,
+            thread_id=str(cfg.thread_id),
+            **get_doc_agent_options(cfg),
+        )
+        # Watch from before the first run, so no change is missed
+        init_state = setup_initial_state(cfg)
+        watcher = create_watcher(
+            backend,
+            init_state["entry_path"],
+            init_state["ignore_list"],
+            exclude=cfg.output_path,
+            poll_interval=poll_interval,
+        )
+        logger.info("Watching %s with %s", cfg.entry_path, type(watcher).__name__)
+        # The journal stays open between refreshes, and is closed on exit
+        with hold_journal(init_state["journal_path"]):
+            try:
+                state = await run_documentation_agent(
+                    init_state, None, cfg, doc_agent=agent
+                )
+                # Changes made while the repository was not watched
+                changes, first = None, None
+                while True:
+                    if changes is None:
+                        changes = await asyncio.to_thread(agent.stale_files, state)
+                    if changes:
+                        logger.info("Refreshing %d changed paths", len(changes))
+                        update = await asyncio.to_thread(agent.refresh, state, changes)
+                        state = {**state, **update}
+                        save_dependency_index(
+                            state["dependencies_per_file"], cfg.output_path
+                        )
+                        save_summary_store(
+                            agent.summary_records(state), cfg.output_path
+                        )
+                        if first is not None:
+                            metrics.observe(
+                                "debtrazor_watch_refresh_seconds",
+                                time.monotonic() - first,
+                            )
+                        if export:
+                            metrics.current().write(cfg.output_path)
+                        logger.info("Documentation up to date")
+                    changes, first = await next_changes(
+                        watcher, debounce_seconds, max_delay_seconds
+                    )
+            finally:
+                watcher.close()
+                agent.close()
@@ -0,0 +1,22 @@
+from typing import List, Literal
+from pydantic import BaseModel, Field
+
+
+class Insertion(BaseModel):
+    """For Outputting a comment to insert into a code file in JSON format"""
+
+    line: int = Field(description="Number of the line the comment belongs to")
+    placement: Literal["before", "after"] = Field(
+        default="before",
+        description="Insert the comment above (before) or below (after) the line",
+    )
+    text: str = Field(description="The comment or docstring, without indentation")
+
+    # The 'line' attribute is the 1-based line number of the original code.
+    # 'after' is used for docstrings, which go below a function/class header.
+
+
+class Insertions(BaseModel):
+    """For Outputting the comments to insert into a code file in JSON format"""
+
+    insertions: List[Insertion] = Field(description="The comments to insert")
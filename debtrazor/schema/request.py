@@ -47,6 +47,8 @@ class AgentRequest(BaseModel):
         A flag indicating whether to enable verbose logging for langchain. Default is False.
     langchain_tracing : Optional[str]
         A string for langchain tracing configuration. Default is None.
+    thread_id : Optional[str]
+        The thread identifier used to checkpoint and resume the job. Default is None.
     """
 
     document: AgentParams
@@ -60,3 +62,4 @@ class AgentRequest(BaseModel):
     new_framework: Optional[str]
     langchain_verbose: bool = False
     langchain_tracing: Optional[str] = None
+    thread_id: Optional[str] = None
@@ -2,14 +2,14 @@ import os
 import shutil
 import subprocess
 import filecmp
-import yaml
-from github import Github, GithubException
 
 
 def load_config(config_path: str) -> dict:
     """
     Load and return the configuration from a YAML file.
     """
+    import yaml
+
     with open(config_path, "r") as f:
         return yaml.safe_load(f)
 
@@ -64,6 +64,7 @@ def push_changes_to_github(entry_path, output_path, github_token, github_usernam
     """
     Push changes to the specified GitHub repo and branch using PyGithub and subprocess for Git commands.
     """
+    from github import Github, GithubException
 
     try:
         # Authenticate using PyGithub and get the repo object
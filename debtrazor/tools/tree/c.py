@@ -0,0 +1,99 @@
+import os
+import re
+from langchain_core.tools import tool
+from debtrazor.schema.tree import DependencyTree
+from debtrazor.tools.tree.source import (
+    blank_comments_and_strings,
+    dependency_tree,
+    find_in_repository,
+    find_unique,
+)
+from debtrazor.utils.sniff import read_source
+
+_INCLUDE = re.compile(r'^[ \t]*#[ \t]*include[ \t]*([<"])([^>"\n]+)[>"]', re.MULTILINE)
+
+# Extensions of the files implementing what a header declares
+SOURCE_EXTENSIONS = (".c", ".cc", ".cpp", ".cxx", ".c++")
+
+
+def _implementation(header: str, entry_path: str | None) -> str | None:
+    """
+    Find the source file implementing a header.
+
+    Args:
+        header (str): The absolute path of the header, e.g. ``net/socket.h``.
+        entry_path (str | None): The repository root, to find an
+            implementation in another directory (e.g. ``include`` and
+            ``src``).
+
+    Returns:
+        str | None: The source file of the same name next to the header, or
+        the only one in the repository, or None.
+    """
+    stem = os.path.splitext(header)[0]
+    for extension in SOURCE_EXTENSIONS:
+        if os.path.isfile(stem + extension):
+            return stem + extension
+    if entry_path is not None:
+        for extension in SOURCE_EXTENSIONS:
+            found = find_unique(entry_path, os.path.basename(stem) + extension)
+            if found is not None:
+                return found
+    return None
+
+
+def c_dependencies(file_path: str, entry_path: str | None = None) -> list[str]:
+    """
+    Extract the internal dependencies of a C or C++ file.
+
+    Included headers are resolved next to the file (``#include "..."`` only),
+    then anywhere in the repository, which covers the include directories of
+    the build. Since only source files are documented, the file implementing
+    each header is a dependency too. Headers that are not part of the
+    repository, e.g. of the standard library, are left out.
+
+    Args:
+        file_path (str): The path of the C or C++ file.
+        entry_path (str | None): The repository root.
+
+    Returns:
+        list[str]: The absolute paths of the files it depends on.
+    """
+    file_path = os.path.abspath(file_path)
+    directory = os.path.dirname(file_path)
+    code = blank_comments_and_strings(read_source(file_path), "c", keep_strings=True)
+
+    dependencies = []
+    for delimiter, name in _INCLUDE.findall(code):
+        header = None
+        if delimiter == '"' and os.path.isfile(os.path.join(directory, name)):
+            header = os.path.normpath(os.path.join(directory, name))
+        elif entry_path is not None:
+            header = find_in_repository(entry_path, name, file_path)
+        if header is None:
+            continue
+        dependencies.append(header)
+        implementation = _implementation(header, entry_path)
+        if implementation is not None:
+            dependencies.append(implementation)
+    return dependencies
+
+
+@tool
+def cdeps(file_path: str, entry_path: str | None = None) -> DependencyTree:
+    """
+    Tool for generating internal dependency-tree for C and C++ projects.
+
+    Args:
+        file_path (str): The path to the C or C++ file for which the dependency tree is to be generated.
+        entry_path (str | None): The root of the repository, to resolve headers of include directories.
+
+    Returns:
+        DependencyTree: An object representing the root file and its dependencies.
+        If the file cannot be read, a string message is returned instead.
+    """
+    try:
+        dependencies = c_dependencies(file_path, entry_path)
+    except OSError as e:
+        return f"An error occurred while reading {file_path}: {e}"
+    return dependency_tree(file_path, dependencies, entry_path)
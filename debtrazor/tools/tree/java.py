@@ -0,0 +1,156 @@
+import os
+import re
+from langchain_core.tools import tool
+from debtrazor.schema.tree import DependencyTree
+from debtrazor.tools.tree.source import (
+    blank_comments_and_strings,
+    dependency_tree,
+    find_directory,
+    find_in_repository,
+)
+from debtrazor.utils.sniff import read_source
+
+_PACKAGE = re.compile(r"^\s*package\s+([\w.]+)\s*;", re.MULTILINE)
+_IMPORT = re.compile(r"^\s*import\s+(static\s+)?([\w.]+?)(\.\*)?\s*;", re.MULTILINE)
+# Names of the types a file may refer to
+_TYPE_NAME = re.compile(r"\b[A-Z]\w*")
+
+
+def _source_root(directory: str, package: list[str]) -> str:
+    """
+    Return the source root of a file from its package.
+
+    Args:
+        directory (str): The absolute directory of the file.
+        package (list[str]): The names of its package, e.g. ["com", "acme"].
+
+    Returns:
+        str: The directory the package path starts from, or the file's own
+        directory if it does not end with the package path.
+    """
+    parts = directory.split(os.sep)
+    if package and parts[-len(package) :] == package:
+        return os.sep.join(parts[: -len(package)]) or os.sep
+    return directory
+
+
+def _find_class(
+    root: str, names: list[str], file_path: str, entry_path: str | None
+) -> str | None:
+    """
+    Find the file of an imported class.
+
+    The longest prefix of the names naming a file is taken, as an import may
+    name a nested class or, when static, a member of a class.
+
+    Args:
+        root (str): The source root of the importing file.
+        names (list[str]): The qualified name, e.g. ["com", "acme", "Util"].
+        file_path (str): The absolute path of the importing file.
+        entry_path (str | None): The repository root, to find classes of other
+            source roots (modules).
+
+    Returns:
+        str | None: The absolute path of the class file, or None if it is not
+        part of the repository.
+    """
+    for end in range(len(names), 1, -1):
+        relative_path = os.path.join(*names[:end]) + ".java"
+        if os.path.isfile(os.path.join(root, relative_path)):
+            return os.path.join(root, relative_path)
+        if entry_path is not None:
+            found = find_in_repository(entry_path, relative_path, file_path)
+            if found is not None:
+                return found
+    return None
+
+
+def _package_classes(
+    root: str, names: list[str], file_path: str, entry_path: str | None
+) -> list[str]:
+    """
+    List the class files of an imported package (``import a.b.*;``).
+
+    Args:
+        root (str): The source root of the importing file.
+        names (list[str]): The package names, e.g. ["com", "acme"].
+        file_path (str): The absolute path of the importing file.
+        entry_path (str | None): The repository root, to find packages of
+            other source roots (modules).
+
+    Returns:
+        list[str]: The absolute paths of the class files of the package.
+    """
+    directory = os.path.join(root, *names)
+    if not os.path.isdir(directory) and entry_path is not None:
+        directory = find_directory(entry_path, os.path.join(*names), file_path)
+    if directory is None:
+        return []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return []
+    return sorted(
+        entry.path
+        for entry in entries
+        if entry.name.endswith(".java") and entry.is_file()
+    )
+
+
+def java_dependencies(file_path: str, entry_path: str | None = None) -> list[str]:
+    """
+    Extract the internal dependencies of a Java file.
+
+    The imported classes and packages are resolved against the source root
+    of the file's package, then anywhere in the repository. Classes of the
+    same package are used without imports, so those whose name appears in
+    the code are dependencies too.
+
+    Args:
+        file_path (str): The path of the Java file.
+        entry_path (str | None): The repository root.
+
+    Returns:
+        list[str]: The absolute paths of the files it depends on.
+    """
+    file_path = os.path.abspath(file_path)
+    directory = os.path.dirname(file_path)
+    code = blank_comments_and_strings(read_source(file_path), "java")
+    package = _PACKAGE.search(code)
+    root = _source_root(directory, package.group(1).split(".") if package else [])
+
+    dependencies = []
+    for static, name, wildcard in _IMPORT.findall(code):
+        names = name.split(".")
+        if wildcard and not static:
+            dependencies.extend(_package_classes(root, names, file_path, entry_path))
+            continue
+        found = _find_class(root, names, file_path, entry_path)
+        if found is not None:
+            dependencies.append(found)
+
+    type_names = set(_TYPE_NAME.findall(code))
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        if entry.name.endswith(".java") and entry.name[:-5] in type_names:
+            dependencies.append(entry.path)
+    return dependencies
+
+
+@tool
+def javadeps(file_path: str, entry_path: str | None = None) -> DependencyTree:
+    """
+    Tool for generating internal dependency-tree for Java projects.
+
+    Args:
+        file_path (str): The path to the Java file for which the dependency tree is to be generated.
+        entry_path (str | None): The root of the repository, to resolve imports of other source roots.
+
+    Returns:
+        DependencyTree: An object representing the root file and its dependencies.
+        If the file cannot be read, a string message is returned instead.
+    """
+    try:
+        dependencies = java_dependencies(file_path, entry_path)
+    except OSError as e:
+        return f"An error occurred while reading {file_path}: {e}"
+    return dependency_tree(file_path, dependencies, entry_path)
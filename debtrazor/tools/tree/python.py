@@ -13,7 +13,7 @@ def pydeps(file_path: str) -> DependencyTree:
 
     Returns:
         DependencyTree: An object representing the root file and its dependencies.
-        If the required package 'import_deps' is not found, a string message is returned instead.
+        If the required package 'import_deps' is not found or the file cannot be parsed, a string message is returned instead.
     """
     try:
         from import_deps import __version__, PyModule, ModuleSet
@@ -33,7 +33,11 @@ def pydeps(file_path: str) -> DependencyTree:
     mset = ModuleSet(base_path.glob("**/*.py"))
 
     # Get the imports for the module, without returning fully qualified names
-    imports = mset.get_imports(module, return_fqn=False)
+    try:
+        imports = mset.get_imports(module, return_fqn=False)
+    except (SyntaxError, UnicodeDecodeError) as e:
+        # The file is not valid Python 3 source, e.g. not UTF-8
+        return f"An error occurred while parsing {file_path}: {e}"
 
     # Convert the import paths to strings
     imports = [str(path) for path in imports]
@@ -0,0 +1,280 @@
+import os
+import re
+from langchain_core.tools import tool
+from debtrazor.schema.tree import DependencyTree
+from debtrazor.tools.tree.source import (
+    blank_comments_and_strings,
+    dependency_tree,
+    repository_files,
+)
+from debtrazor.utils.sniff import read_source
+
+# Files of a module whose submodules are in their own directory
+_MODULE_ROOTS = ("lib.rs", "main.rs", "mod.rs")
+
+# Module declaration with its body in another file: `mod name;`
+_MOD = re.compile(r"(?:^|[;{}()\s])mod\s+(?:r#)?(\w+)\s*;")
+# The tree of a use declaration: `use a::b::{c, d::*};`
+_USE = re.compile(r"(?:^|[;{}()\s])use\s+([^;]+);")
+_RENAME = re.compile(r"\s+as\s+\w+")
+_PACKAGE_SECTION = re.compile(r"^\s*\[package\]([^\[]*)", re.MULTILINE)
+_PACKAGE_NAME = re.compile(r'^\s*name\s*=\s*"([^"]+)"', re.MULTILINE)
+
+
+def _split_group(text: str) -> list[str]:
+    """
+    Split the items of a use group at its top-level commas.
+
+    Args:
+        text (str): The inside of the braces, e.g. ``a, b::{c, d}``.
+
+    Returns:
+        list[str]: The items, e.g. ["a", "b::{c, d}"].
+    """
+    items = []
+    depth = 0
+    start = 0
+    for position, character in enumerate(text):
+        if character == "{":
+            depth += 1
+        elif character == "}":
+            depth -= 1
+        elif character == "," and depth == 0:
+            items.append(text[start:position])
+            start = position + 1
+    items.append(text[start:])
+    return [item for item in items if item]
+
+
+def use_paths(tree: str) -> list[list[str]]:
+    """
+    Expand the tree of a use declaration into its paths.
+
+    Args:
+        tree (str): The tree, e.g. ``crate::a::{b, c::{self, d as e}}``.
+
+    Returns:
+        list[list[str]]: The segments of each path, e.g. [["crate", "a",
+        "b"], ["crate", "a", "c"], ["crate", "a", "c", "d"]]. ``self`` and
+        glob imports name the module they are in.
+    """
+    tree = re.sub(r"\s+", "", _RENAME.sub("", tree)).lstrip(":")
+    paths = []
+    pending = [([], tree)]
+    while pending:
+        prefix, text = pending.pop()
+        for item in _split_group(text):
+            brace = item.find("{")
+            if brace >= 0:
+                head = [segment for segment in item[:brace].split("::") if segment]
+                pending.append((prefix + head, item[brace + 1 : item.rfind("}")]))
+                continue
+            segments = prefix + [segment for segment in item.split("::") if segment]
+            if segments and segments[-1] in ("self", "*"):
+                segments = segments[:-1]
+            if segments:
+                paths.append(segments)
+    return paths
+
+
+def _module_file(path: str) -> str | None:
+    """
+    Return the file of a module from its path without extension.
+
+    Args:
+        path (str): The module path, e.g. ``src/net/socket``.
+
+    Returns:
+        str | None: ``socket.rs`` or ``socket/mod.rs``, whichever exists.
+    """
+    for candidate in (path + ".rs", os.path.join(path, "mod.rs")):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _module_directory(file_path: str) -> str:
+    """
+    Return the directory holding the files of a module's submodules.
+
+    Args:
+        file_path (str): The absolute path of the module file.
+
+    Returns:
+        str: Its own directory for crate roots and ``mod.rs``, otherwise the
+        directory named after the module.
+    """
+    if os.path.basename(file_path) in _MODULE_ROOTS:
+        return os.path.dirname(file_path)
+    return os.path.splitext(file_path)[0]
+
+
+def _root_file(directory: str) -> str | None:
+    """
+    Return the crate root file of a source directory.
+
+    Args:
+        directory (str): The ``src`` directory of a crate.
+
+    Returns:
+        str | None: Its ``lib.rs``, or ``main.rs``, if any.
+    """
+    for name in ("lib.rs", "main.rs"):
+        if os.path.isfile(os.path.join(directory, name)):
+            return os.path.join(directory, name)
+    return None
+
+
+def _crate_source(directory: str, entry_path: str | None) -> str:
+    """
+    Find the source directory of the crate a file belongs to.
+
+    Args:
+        directory (str): The absolute directory of the file.
+        entry_path (str | None): The repository root, where the search stops.
+
+    Returns:
+        str: The ``src`` directory next to the nearest ``Cargo.toml``, else
+        the nearest directory with a crate root file, else ``directory``.
+    """
+    stop = None if entry_path is None else os.path.abspath(entry_path)
+    current = directory
+    nearest_root = None
+    while True:
+        if nearest_root is None and _root_file(current) is not None:
+            nearest_root = current
+        if os.path.isfile(os.path.join(current, "Cargo.toml")):
+            source = os.path.join(current, "src")
+            return source if os.path.isdir(source) else current
+        parent = os.path.dirname(current)
+        if current == stop or parent == current:
+            return nearest_root or directory
+        current = parent
+
+
+def _workspace_crates(entry_path: str) -> dict[str, str]:
+    """
+    Map the crates of a repository (e.g. a Cargo workspace) to their sources.
+
+    Args:
+        entry_path (str): The repository root.
+
+    Returns:
+        dict[str, str]: The ``src`` directory of each crate, by the name
+        other crates use it by (dashes replaced by underscores).
+    """
+    crates = {}
+    for manifest in repository_files(entry_path, "Cargo.toml"):
+        try:
+            with open(manifest, "r", errors="replace") as f:
+                section = _PACKAGE_SECTION.search(f.read())
+        except OSError:
+            continue
+        name = section and _PACKAGE_NAME.search(section.group(1))
+        if name:
+            source = os.path.join(os.path.dirname(manifest), "src")
+            crates[name.group(1).replace("-", "_")] = source
+    return crates
+
+
+def _resolve(directory: str, module_file: str | None, segments: list[str]):
+    """
+    Find the file defining the item a path names, from a module.
+
+    Args:
+        directory (str): The directory of the submodules of the module.
+        module_file (str | None): The file of the module.
+        segments (list[str]): The path from the module, e.g. ["net", "Socket"].
+
+    Returns:
+        str | None: The file of the deepest module of the path, or the
+        module's own file if the item is defined there.
+    """
+    for end in range(len(segments), 0, -1):
+        found = _module_file(os.path.join(directory, *segments[:end]))
+        if found is not None:
+            return found
+    return module_file
+
+
+def rust_dependencies(file_path: str, entry_path: str | None = None) -> list[str]:
+    """
+    Extract the internal dependencies of a Rust file.
+
+    The files of the modules it declares (``mod name;``) and of the modules
+    its use declarations import from are dependencies. Paths are resolved
+    from the crate root (``crate::``), the module itself (``self::`` and
+    child modules), its parents (``super::``), or the other crates of the
+    repository; other paths name external crates and are left out.
+
+    Args:
+        file_path (str): The path of the Rust file.
+        entry_path (str | None): The repository root, to find the other
+            crates of a workspace.
+
+    Returns:
+        list[str]: The absolute paths of the files it depends on.
+    """
+    file_path = os.path.abspath(file_path)
+    code = blank_comments_and_strings(read_source(file_path), "rust")
+    module_directory = _module_directory(file_path)
+    crate_source = _crate_source(os.path.dirname(file_path), entry_path)
+    crates = None
+
+    dependencies = []
+    for name in _MOD.findall(code):
+        found = _module_file(os.path.join(module_directory, name))
+        if found is not None:
+            dependencies.append(found)
+
+    for tree in _USE.findall(code):
+        for segments in use_paths(tree):
+            first = segments[0]
+            if first == "crate":
+                directory, module_file = crate_source, _root_file(crate_source)
+                segments = segments[1:]
+            elif first in ("self", "super"):
+                directory, module_file = module_directory, file_path
+                while segments and segments[0] in ("self", "super"):
+                    if segments.pop(0) == "super":
+                        directory = os.path.dirname(directory)
+                        module_file = (
+                            _root_file(directory)
+                            if directory == crate_source
+                            else _module_file(directory)
+                        )
+            elif _module_file(os.path.join(module_directory, first)) is not None:
+                # A child module in scope
+                directory, module_file = module_directory, file_path
+            else:
+                if crates is None:
+                    crates = {} if entry_path is None else _workspace_crates(entry_path)
+                if first not in crates:
+                    continue  # An external crate, e.g. std
+                directory = crates[first]
+                module_file = _root_file(directory)
+                segments = segments[1:]
+            found = _resolve(directory, module_file, segments)
+            if found is not None:
+                dependencies.append(found)
+    return dependencies
+
+
+@tool
+def rustdeps(file_path: str, entry_path: str | None = None) -> DependencyTree:
+    """
+    Tool for generating internal dependency-tree for Rust projects.
+
+    Args:
+        file_path (str): The path to the Rust file for which the dependency tree is to be generated.
+        entry_path (str | None): The root of the repository, to resolve imports of the other crates of a workspace.
+
+    Returns:
+        DependencyTree: An object representing the root file and its dependencies.
+        If the file cannot be read, a string message is returned instead.
+    """
+    try:
+        dependencies = rust_dependencies(file_path, entry_path)
+    except OSError as e:
+        return f"An error occurred while reading {file_path}: {e}"
+    return dependency_tree(file_path, dependencies, entry_path)
@@ -0,0 +1,332 @@
+"""
+Helpers of the in-process dependency extractors (Java, Rust, C and C++).
+
+Imports and includes are matched on the code with its comments and string
+literals blanked out, so commented-out imports and import-like text in
+strings are not reported. Paths that cannot be resolved next to the file are
+looked up in an index of the files of the repository (``entry_path``), e.g.
+headers of an ``include`` directory or classes of another source root.
+"""
+
+import os
+import re
+import threading
+import time
+
+from debtrazor.schema.tree import DependencyTree
+
+# Directories left out of the repository index: version control, build
+# output and vendored packages
+IGNORED_DIRECTORIES = {"target", "node_modules", "__pycache__"}
+
+# Seconds a listing of a repository is reused, so long-running processes
+# (service, watch mode) see the files added since
+INDEX_SECONDS = 60
+# Repositories whose listing is kept
+MAX_INDEXES = 8
+
+# Listings of the repositories, by root: (creation time, files by name)
+_indexes: dict[str, tuple[float, dict]] = {}
+_indexes_lock = threading.Lock()
+
+# Start of a comment or a string or character literal, per language. Raw
+# string prefixes are only raw strings if no identifier ends before them.
+_LITERAL_START = {
+    "java": re.compile(r'//|/\*|"""|"|\''),
+    "rust": re.compile(r'//|/\*|b?r#*"|b?"|\''),
+    "c": re.compile(r'//|/\*|(?:u8|[uUL])?R"|"|\''),
+}
+
+_STRING_END = re.compile(r'(?:\\.|[^"\\])*"', re.DOTALL)
+_TEXT_BLOCK_END = re.compile(r'(?:\\.|[^\\])*?"""', re.DOTALL)
+# A character literal; a quote not followed by one is a Rust lifetime or label
+_CHAR_END = re.compile(r"(?:\\.[^'\n]{0,9}|[^'\\\n])'")
+_NESTED_COMMENT = re.compile(r"/\*|\*/")
+_NOT_NEWLINE = re.compile(r"[^\n]")
+
+
+def _literal_end(code: str, start: int, token: str, language: str) -> int | None:
+    """
+    Find the end of a comment or literal.
+
+    Args:
+        code (str): The source code.
+        start (int): Position of the token starting it.
+        token (str): The token, see ``_LITERAL_START``.
+        language (str): "java", "rust" or "c".
+
+    Returns:
+        int | None: The position after it, or None if the token does not
+        start a comment or literal (e.g. a Rust lifetime).
+    """
+    after = start + len(token)
+    if token == "//":
+        end = code.find("\n", after)
+        return len(code) if end < 0 else end
+    if token == "/*":
+        if language != "rust":
+            end = code.find("*/", after)
+            return len(code) if end < 0 else end + 2
+        # Rust block comments nest
+        depth = 1
+        for match in _NESTED_COMMENT.finditer(code, after):
+            depth += 1 if match.group() == "/*" else -1
+            if depth == 0:
+                return match.end()
+        return len(code)
+    if token == "'":
+        match = _CHAR_END.match(code, after)
+        return None if match is None else match.end()
+    if token == '"""':
+        match = _TEXT_BLOCK_END.match(code, after)
+        return len(code) if match is None else match.end()
+    if token.endswith('R"'):
+        # C++ raw string: R"delimiter( ... )delimiter"
+        opening = code.find("(", after)
+        if opening < 0:
+            return len(code)
+        closing = code.find(")" + code[after:opening] + '"', opening)
+        return len(code) if closing < 0 else closing + opening - after + 2
+    if "r" in token:
+        # Rust raw string: r#"..."#, closed by a quote and as many hashes
+        end = code.find('"' + "#" * token.count("#"), after)
+        return len(code) if end < 0 else end + 1 + token.count("#")
+    match = _STRING_END.match(code, after)
+    return len(code) if match is None else match.end()
+
+
+def blank_comments_and_strings(
+    code: str, language: str, keep_strings: bool = False
+) -> str:
+    """
+    Replace the comments and string literals of a source file by spaces.
+
+    Line breaks are kept, so line-anchored patterns still match and positions
+    map to the same lines.
+
+    Args:
+        code (str): The source code.
+        language (str): "java", "rust" or "c" (also for C++).
+        keep_strings (bool): Only blank the comments, e.g. to read the
+            quoted paths of ``#include`` lines.
+
+    Returns:
+        str: The code with the comments (and strings) blanked.
+    """
+    pattern = _LITERAL_START[language]
+    pieces = []
+    position = 0
+    while True:
+        match = pattern.search(code, position)
+        if match is None:
+            pieces.append(code[position:])
+            break
+        start, token = match.start(), match.group()
+        if len(token) > 1 and token[0] not in "/\"'" and start > 0:
+            if code[start - 1].isalnum() or code[start - 1] == "_":
+                # An identifier ending in r, R, b, u8... before a plain string
+                pieces.append(code[position : match.end() - 1])
+                position = match.end() - 1
+                continue
+        end = _literal_end(code, start, token, language)
+        if end is None:
+            pieces.append(code[position : match.end()])
+            position = match.end()
+            continue
+        pieces.append(code[position:start])
+        literal = code[start:end]
+        if keep_strings and not token.startswith("/"):
+            pieces.append(literal)
+        else:
+            pieces.append(_NOT_NEWLINE.sub(" ", literal))
+        position = end
+    return "".join(pieces)
+
+
+def _list_repository(entry_path: str) -> dict[str, tuple[str, ...]]:
+    """
+    List the files of a repository by name.
+
+    Args:
+        entry_path (str): The absolute repository root.
+
+    Returns:
+        dict[str, tuple[str, ...]]: The absolute paths of the files of each
+        name, sorted.
+    """
+    index = {}
+    directories = [entry_path]
+    while directories:
+        directory = directories.pop()
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if not entry.name.startswith(".") and (
+                    entry.name not in IGNORED_DIRECTORIES
+                ):
+                    directories.append(entry.path)
+            elif entry.is_file():
+                index.setdefault(entry.name, []).append(entry.path)
+    return {name: tuple(sorted(paths)) for name, paths in index.items()}
+
+
+def _repository_index(entry_path: str) -> dict[str, tuple[str, ...]]:
+    """
+    Return the files of a repository by name.
+
+    The repository is listed once for all the files whose dependencies are
+    extracted at about the same time, see ``INDEX_SECONDS``.
+
+    Args:
+        entry_path (str): The repository root.
+
+    Returns:
+        dict[str, tuple[str, ...]]: The absolute paths of the files of each
+        name, sorted.
+    """
+    entry_path = os.path.abspath(entry_path)
+    with _indexes_lock:
+        created, index = _indexes.get(entry_path, (None, None))
+        if created is None or time.monotonic() - created > INDEX_SECONDS:
+            index = _list_repository(entry_path)
+            _indexes[entry_path] = (time.monotonic(), index)
+            while len(_indexes) > MAX_INDEXES:
+                del _indexes[next(iter(_indexes))]
+    return index
+
+
+def repository_files(entry_path: str, name: str) -> tuple[str, ...]:
+    """
+    Return the files of a repository with a given name.
+
+    Args:
+        entry_path (str): The repository root.
+        name (str): The file name, e.g. ``util.h``.
+
+    Returns:
+        tuple[str, ...]: Their absolute paths, sorted.
+    """
+    return _repository_index(entry_path).get(name, ())
+
+
+def _nearest(paths, file_path: str) -> str:
+    """
+    Pick the path sharing the longest directory prefix with a file.
+
+    Args:
+        paths (Iterable[str]): Candidate absolute paths, at least one.
+        file_path (str): The absolute path of the file.
+
+    Returns:
+        str: The nearest candidate; ties go to the shortest path.
+    """
+    return min(
+        paths,
+        key=lambda path: (
+            -len(os.path.commonpath([path, file_path])),
+            len(path),
+            path,
+        ),
+    )
+
+
+def find_in_repository(
+    entry_path: str, relative_path: str, file_path: str
+) -> str | None:
+    """
+    Find the file a relative path refers to anywhere in a repository.
+
+    Args:
+        entry_path (str): The repository root.
+        relative_path (str): The path as written in the source, e.g.
+            ``net/socket.h`` or ``com/acme/Util.java``.
+        file_path (str): The absolute path of the file referring to it; the
+            nearest match is preferred.
+
+    Returns:
+        str | None: The absolute path of the file whose path ends with
+        ``relative_path``, or None if there is none.
+    """
+    relative_path = os.path.normpath(relative_path)
+    if relative_path.startswith(".."):
+        return None
+    suffix = os.sep + relative_path
+    matches = [
+        path
+        for path in repository_files(entry_path, os.path.basename(relative_path))
+        if path.endswith(suffix)
+    ]
+    return _nearest(matches, file_path) if matches else None
+
+
+def find_directory(entry_path: str, relative_path: str, file_path: str) -> str | None:
+    """
+    Find the directory a relative path refers to anywhere in a repository.
+
+    Args:
+        entry_path (str): The repository root.
+        relative_path (str): The directory path as written in the source,
+            e.g. ``com/acme`` for a Java package.
+        file_path (str): The absolute path of the file referring to it; the
+            nearest match is preferred.
+
+    Returns:
+        str | None: The absolute path of a directory with files whose path
+        ends with ``relative_path``, or None if there is none.
+    """
+    suffix = os.sep + os.path.normpath(relative_path)
+    matches = {
+        os.path.dirname(path)
+        for paths in _repository_index(entry_path).values()
+        for path in paths
+        if os.path.dirname(path).endswith(suffix)
+    }
+    return _nearest(matches, file_path) if matches else None
+
+
+def find_unique(entry_path: str, name: str) -> str | None:
+    """
+    Return the only file of a repository with a given name.
+
+    Args:
+        entry_path (str): The repository root.
+        name (str): The file name.
+
+    Returns:
+        str | None: Its absolute path, or None if no file or several files
+        have this name.
+    """
+    paths = repository_files(entry_path, name)
+    return paths[0] if len(paths) == 1 else None
+
+
+def dependency_tree(
+    file_path: str, dependencies, entry_path: str | None = None
+) -> DependencyTree:
+    """
+    Build the dependency tree reported by a dependency tool.
+
+    Args:
+        file_path (str): The path of the file.
+        dependencies (Iterable[str]): The absolute paths of its dependencies.
+        entry_path (str | None): The repository root; dependencies outside it
+            are left out.
+
+    Returns:
+        DependencyTree: The file name and its dependencies, relative to its
+        directory like those of ``pydeps``, without duplicates.
+    """
+    file_path = os.path.abspath(file_path)
+    directory = os.path.dirname(file_path)
+    root = None if entry_path is None else os.path.abspath(entry_path)
+    relative_paths = []
+    for path in dict.fromkeys(dependencies):
+        if path == file_path:
+            continue
+        if root is not None and os.path.commonpath([path, root]) != root:
+            continue
+        relative_paths.append(os.path.relpath(path, directory))
+    return DependencyTree(root=os.path.basename(file_path), dependencies=relative_paths)
@@ -0,0 +1,404 @@
+"""
+Path-keyed index of the internal dependency graph of a repository.
+
+The edges are stored in compressed sparse row form (an offset per file into
+one array of dependency ids), together with the reverse edges, so the
+dependencies and the dependents of a file are both a slice lookup. The index
+is saved next to the documentation and answers the questions of incremental
+re-documentation and migration ordering: which files are affected by a
+change, which files depend on each other cyclically, and in which order the
+files can be processed.
+
+Usage:
+    python -m debtrazor.utils.dependency_index output/dependencies.msgpack \\
+        impact path/to/changed_file.py
+"""
+
+import os
+import sys
+import argparse
+from array import array
+from collections import deque
+from typing import Iterable, Mapping
+
+import ormsgpack
+
+from debtrazor.utils.graph import strongly_connected_components, topological_levels
+
+# Name of the index file in the output path, and the version of its layout
+INDEX_FILE = "dependencies.msgpack"
+VERSION = 1
+
+
+def _to_bytes(values: array) -> bytes:
+    # Stored little-endian whatever the platform
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(data: bytes) -> array:
+    values = array("I")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _transpose(offsets: array, targets: array) -> tuple[array, array]:
+    """
+    Build the reverse edges of a graph in compressed sparse row form.
+
+    Args:
+        offsets (array): Start of the edges of each node in ``targets``, plus
+            the total number of edges.
+        targets (array): The target of each edge.
+
+    Returns:
+        tuple[array, array]: The offsets and targets of the reversed graph.
+    """
+    size = len(offsets) - 1
+    counts = array("I", bytes(4 * (size + 1)))
+    for target in targets:
+        counts[target + 1] += 1
+    for node in range(size):
+        counts[node + 1] += counts[node]
+
+    reverse_targets = array("I", bytes(4 * len(targets)))
+    cursor = array("I", counts)
+    for node in range(size):
+        for edge in range(offsets[node], offsets[node + 1]):
+            target = targets[edge]
+            reverse_targets[cursor[target]] = node
+            cursor[target] += 1
+    return counts, reverse_targets
+
+
+class DependencyIndex:
+    """
+    Dependency graph of the files of a repository, keyed by path.
+
+    Paths are relative to the repository root. Files that are only known as
+    a dependency of another file are part of the graph too.
+    """
+
+    def __init__(self, paths: list[str], offsets: array, targets: array):
+        """
+        Initialize the index from its compressed sparse row form.
+
+        Args:
+            paths (list[str]): The path of each node id.
+            offsets (array): Start of the dependencies of each node in
+                ``targets``, plus the total number of edges.
+            targets (array): The node id of each dependency.
+        """
+        self.paths = paths
+        self._ids = {path: node for node, path in enumerate(paths)}
+        self._offsets = offsets
+        self._targets = targets
+        self._reverse_offsets, self._reverse_targets = _transpose(offsets, targets)
+
+    @classmethod
+    def from_dependencies(
+        cls, dependencies_per_file: Mapping[str, Iterable[str] | None]
+    ) -> "DependencyIndex":
+        """
+        Build the index from the dependencies of each file.
+
+        Args:
+            dependencies_per_file (Mapping[str, Iterable[str] | None]): Each
+                file mapped to the files it depends on, as the
+                ``dependencies_per_file`` of the DocAgent state.
+
+        Returns:
+            DependencyIndex: The index.
+        """
+        files = sorted(dependencies_per_file)
+        ids = {path: node for node, path in enumerate(files)}
+        paths = list(files)
+        edges = []
+        for path in files:
+            node_edges = set()
+            for dependency in dependencies_per_file[path] or []:
+                if dependency not in ids:
+                    ids[dependency] = len(paths)
+                    paths.append(dependency)
+                node_edges.add(ids[dependency])
+            edges.append(sorted(node_edges))
+
+        offsets = array("I", [0])
+        targets = array("I")
+        for node in range(len(paths)):
+            if node < len(edges):
+                targets.extend(edges[node])
+            offsets.append(len(targets))
+        return cls(paths, offsets, targets)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._ids
+
+    def _node(self, path: str) -> int:
+        try:
+            return self._ids[path]
+        except KeyError:
+            raise KeyError(f"Not in the dependency index: {path}") from None
+
+    def _adjacent(self, node: int, reverse: bool = False) -> array:
+        offsets, targets = (
+            (self._reverse_offsets, self._reverse_targets)
+            if reverse
+            else (self._offsets, self._targets)
+        )
+        return targets[offsets[node] : offsets[node + 1]]
+
+    def _reachable(self, paths: Iterable[str], reverse: bool) -> list[str]:
+        # Breadth-first search from all the given files at once
+        seen = bytearray(len(self.paths))
+        queue = deque()
+        for path in paths:
+            node = self._node(path)
+            if not seen[node]:
+                seen[node] = 1
+                queue.append(node)
+        starts = set(queue)
+        reached = []
+        while queue:
+            node = queue.popleft()
+            for adjacent in self._adjacent(node, reverse):
+                if not seen[adjacent]:
+                    seen[adjacent] = 1
+                    reached.append(adjacent)
+                    queue.append(adjacent)
+        return sorted(self.paths[node] for node in reached if node not in starts)
+
+    def dependencies(self, path: str) -> list[str]:
+        """
+        List the files a file depends on directly.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            list[str]: The dependency paths.
+
+        Raises:
+            KeyError: If the file is not in the index.
+        """
+        return [self.paths[node] for node in self._adjacent(self._node(path))]
+
+    def dependents(self, path: str) -> list[str]:
+        """
+        List the files depending directly on a file.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            list[str]: The dependent paths.
+
+        Raises:
+            KeyError: If the file is not in the index.
+        """
+        return [
+            self.paths[node] for node in self._adjacent(self._node(path), reverse=True)
+        ]
+
+    def transitive_dependencies(self, paths: Iterable[str]) -> list[str]:
+        """
+        List every file the given files depend on, directly or not.
+
+        Args:
+            paths (Iterable[str]): The file paths.
+
+        Returns:
+            list[str]: The dependency paths, sorted, without the given files.
+
+        Raises:
+            KeyError: If a file is not in the index.
+        """
+        return self._reachable(paths, reverse=False)
+
+    def transitive_dependents(self, paths: Iterable[str]) -> list[str]:
+        """
+        List every file affected by a change of the given files.
+
+        Args:
+            paths (Iterable[str]): The changed file paths.
+
+        Returns:
+            list[str]: The paths of the files depending on them, directly or
+            not, sorted, without the given files.
+
+        Raises:
+            KeyError: If a file is not in the index.
+        """
+        return self._reachable(paths, reverse=True)
+
+    def _graph(self) -> dict[int, array]:
+        return {node: self._adjacent(node) for node in range(len(self.paths))}
+
+    def strongly_connected_components(
+        self, cycles_only: bool = True
+    ) -> list[list[str]]:
+        """
+        Find the groups of files depending on each other.
+
+        Args:
+            cycles_only (bool): If True, only return the components of more
+                than one file, i.e. the dependency cycles.
+
+        Returns:
+            list[list[str]]: The components, each sorted, listed after the
+            components they depend on.
+        """
+        components = []
+        for component in strongly_connected_components(self._graph()):
+            if len(component) > 1 or not cycles_only:
+                components.append(sorted(self.paths[node] for node in component))
+        return components
+
+    def levels(self) -> list[list[str]]:
+        """
+        Group the files in the order they can be processed, e.g. migrated.
+
+        Returns:
+            list[list[str]]: Topological levels of the files; every file comes
+            after its dependencies and the files of a dependency cycle share a
+            level.
+        """
+        return [
+            sorted(self.paths[node] for node in level)
+            for level in topological_levels(self._graph())
+        ]
+
+    def to_dict(self) -> dict[str, list[str]]:
+        """
+        Return the dependencies of every file.
+
+        Returns:
+            dict[str, list[str]]: Each path mapped to its dependency paths.
+        """
+        return {path: self.dependencies(path) for path in self.paths}
+
+    def save(self, path: str):
+        """
+        Write the index to a file.
+
+        Args:
+            path (str): The file path, usually ``INDEX_FILE`` in the output
+                path.
+        """
+        data = ormsgpack.packb(
+            {
+                "version": VERSION,
+                "paths": self.paths,
+                "offsets": _to_bytes(self._offsets),
+                "targets": _to_bytes(self._targets),
+            }
+        )
+        # Replace the previous index only once the new one is complete
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(data)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DependencyIndex":
+        """
+        Read an index written by ``save``.
+
+        Args:
+            path (str): The file path.
+
+        Returns:
+            DependencyIndex: The index.
+
+        Raises:
+            ValueError: If the file was written by an unknown version.
+        """
+        with open(path, "rb") as f:
+            data = ormsgpack.unpackb(f.read())
+        if data.get("version") != VERSION:
+            raise ValueError(
+                f"Unsupported dependency index version {data.get('version')}, "
+                f"expected {VERSION}"
+            )
+        return cls(
+            data["paths"], _from_bytes(data["offsets"]), _from_bytes(data["targets"])
+        )
+
+
+def save_dependency_index(dependencies_per_file: Mapping, output_path: str) -> str:
+    """
+    Save the dependency graph of a documented repository in its output path.
+
+    Args:
+        dependencies_per_file (Mapping): The ``dependencies_per_file`` of the
+            DocAgent state.
+        output_path (str): The output directory.
+
+    Returns:
+        str: The path of the index file.
+    """
+    index_path = os.path.join(output_path, INDEX_FILE)
+    DependencyIndex.from_dependencies(dependencies_per_file or {}).save(index_path)
+    return index_path
+
+
+def main(argv=None) -> int:
+    """
+    Query a saved dependency index from the command line.
+
+    Args:
+        argv (list[str] | None): Command line arguments.
+
+    Returns:
+        int: 0 on success, 1 if a path is not in the index.
+    """
+    parser = argparse.ArgumentParser(description="Query a dependency index")
+    parser.add_argument("index", help=f"Path of the index file ({INDEX_FILE})")
+    parser.add_argument(
+        "query",
+        choices=[
+            "dependencies",
+            "dependents",
+            "closure",
+            "impact",
+            "cycles",
+            "levels",
+        ],
+        help="closure: transitive dependencies; impact: transitive dependents",
+    )
+    parser.add_argument("paths", nargs="*", help="File paths relative to the root")
+    args = parser.parse_args(argv)
+
+    index = DependencyIndex.load(args.index)
+    try:
+        if args.query == "dependencies":
+            lines = [d for path in args.paths for d in index.dependencies(path)]
+        elif args.query == "dependents":
+            lines = [d for path in args.paths for d in index.dependents(path)]
+        elif args.query == "closure":
+            lines = index.transitive_dependencies(args.paths)
+        elif args.query == "impact":
+            lines = index.transitive_dependents(args.paths)
+        elif args.query == "cycles":
+            lines = [
+                " ".join(component)
+                for component in index.strongly_connected_components()
+            ]
+        else:
+            lines = [" ".join(level) for level in index.levels()]
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+    print("\n".join(lines))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
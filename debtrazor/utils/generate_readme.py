@@ -1,8 +1,12 @@
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Optional, TextIO
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 import os
 import fnmatch
 
+from debtrazor.utils.walk import walk_tree
+
 
 def should_ignore(path: Path, base_path: Path, ignore_patterns: List[str]) -> bool:
     """
@@ -41,85 +45,123 @@ def read_file_content(file_path: Path) -> str:
         str: The content of the file or an error message if the file cannot be read.
     """
     try:
-        file_size = os.path.getsize(file_path)  # Get the size of the file
-        if file_size > 100_000:  # 100 KB limit
-            return f"[File content not shown. Size: {file_size} bytes]"
-
         with file_path.open("r", encoding="utf-8", errors="replace") as f:
+            # Size of the already open file, saving a separate stat by path
+            file_size = os.fstat(f.fileno()).st_size
+            if file_size > 100_000:  # 100 KB limit
+                return f"[File content not shown. Size: {file_size} bytes]"
             return f.read(1000)  # Read only the first 1000 characters
     except Exception as e:
         return f"[Error reading file: {str(e)}]"  # Return error message if file cannot be read
 
 
-def generate_comprehensive_readme(
-    root_path: str | Path, ignore_patterns: Optional[List[str]] = None
-) -> str:
+def iter_comprehensive_readme(
+    root_path: str | Path,
+    ignore_patterns: Optional[List[str]] = None,
+    max_workers: int = 8,
+    window: int = 256,
+) -> Iterator[str]:
     """
-    Generate a comprehensive README file for a project directory.
+    Stream the lines of a comprehensive README for a project directory.
+
+    README heads are read by a bounded thread pool while the tree is walked,
+    and lines are yielded in tree order. At most ``window`` entries are held
+    at a time, so memory stays flat regardless of the size of the tree.
 
     Args:
         root_path (str | Path): The root path of the project directory.
         ignore_patterns (Optional[List[str]]): A list of patterns to ignore.
+        max_workers (int): Maximum number of READMEs read concurrently.
+        window (int): Maximum number of entries buffered ahead of the output.
 
-    Returns:
-        str: The content of the generated README file.
+    Yields:
+        str: The lines of the README, without line endings.
     """
     root_path = Path(root_path).resolve()  # Resolve the root path
-    ignore_patterns = ignore_patterns or []  # Use empty list if ignore_patterns is None
-
-    def traverse(path: Path, depth: int = 0) -> List[Tuple[int, str, str]]:
-        """
-        Traverse the directory structure recursively.
-
-        Args:
-            path (Path): The current path to traverse.
-            depth (int): The current depth in the directory structure.
-
-        Returns:
-            List[Tuple[int, str, str]]: A list of tuples containing depth, item description, and content.
-        """
-        result = []
-        items = sorted(
-            path.iterdir(), key=lambda x: (not x.is_dir(), x.name)
-        )  # Sort items, directories first
-
-        for item in items:
-            if should_ignore(
-                item, root_path, ignore_patterns
-            ):  # Check if the item should be ignored
-                continue
-
-            indent = "  " * depth  # Create indentation based on depth
-
-            if item.is_dir():
-                result.append(
-                    (depth, f"{indent}📁 {item.name}/", "")
-                )  # Append directory to result
-                result.extend(
-                    traverse(item, depth + 1)
-                )  # Recursively traverse the directory
-            elif item.name.lower() == "readme.md":
-                content = read_file_content(item)  # Read the content of README.md
-                result.append(
-                    (depth, f"{indent}📄 {item.name}", content)
-                )  # Append README.md to result with content
+
+    yield f"# {root_path.name} Project Overview\n"
+    yield "## Directory Structure and Documentation\n"
+
+    def render(line: str, content: str | Future | None) -> Iterator[str]:
+        yield line
+        if isinstance(content, Future):
+            content = content.result()
+        if content:
+            yield "\n```markdown"
+            yield content
+            yield "```\n"
+
+    pending: deque[tuple[str, str | Future | None]] = deque()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Single iterative pass, directories first then by name, pruning
+        # ignored subtrees
+        for entry in walk_tree(root_path, ignore_patterns=ignore_patterns, sort=True):
+            indent = "  " * entry.depth  # Create indentation based on depth
+
+            if entry.is_dir:
+                pending.append((f"{indent}📁 {entry.name}/", None))
+            elif entry.name.lower() == "readme.md":
+                # Read the README.md in the background
+                content = pool.submit(read_file_content, Path(entry.path))
+                pending.append((f"{indent}📄 {entry.name}", content))
             else:
-                result.append(
-                    (depth, f"{indent}📄 {item.name}", "")
-                )  # Append file to result without content
+                pending.append((f"{indent}📄 {entry.name}", None))
+
+            # Emit what is ready, and block on the oldest read once the
+            # window is full
+            while pending and (
+                len(pending) >= window
+                or not isinstance(pending[0][1], Future)
+                or pending[0][1].done()
+            ):
+                yield from render(*pending.popleft())
+
+        while pending:
+            yield from render(*pending.popleft())
+
+
+def write_comprehensive_readme(
+    root_path: str | Path,
+    output: str | Path | TextIO,
+    ignore_patterns: Optional[List[str]] = None,
+    max_workers: int = 8,
+) -> None:
+    """
+    Write a comprehensive README for a project directory as it is rendered.
 
-        return result
+    Args:
+        root_path (str | Path): The root path of the project directory.
+        output (str | Path | TextIO): The file path or text file handle to
+            write to.
+        ignore_patterns (Optional[List[str]]): A list of patterns to ignore.
+        max_workers (int): Maximum number of READMEs read concurrently.
+    """
+    if isinstance(output, (str, Path)):
+        with open(output, "w", encoding="utf-8") as f:
+            write_comprehensive_readme(root_path, f, ignore_patterns, max_workers)
+        return
 
-    structure = traverse(root_path)  # Get the directory structure
+    lines = iter_comprehensive_readme(root_path, ignore_patterns, max_workers)
+    output.write(next(lines))
+    for line in lines:
+        output.write("\n")
+        output.write(line)
 
-    output = [f"# {root_path.name} Project Overview\n"]
-    output.append("## Directory Structure and Documentation\n")
 
-    for depth, item, content in structure:
-        output.append(item)
-        if content:
-            output.append("\n```markdown")
-            output.append(content)
-            output.append("```\n")
+def generate_comprehensive_readme(
+    root_path: str | Path, ignore_patterns: Optional[List[str]] = None
+) -> str:
+    """
+    Generate a comprehensive README file for a project directory.
+
+    Prefer ``write_comprehensive_readme`` or ``iter_comprehensive_readme`` for
+    large trees, which do not hold the whole README in memory.
 
-    return "\n".join(output)
+    Args:
+        root_path (str | Path): The root path of the project directory.
+        ignore_patterns (Optional[List[str]]): A list of patterns to ignore.
+
+    Returns:
+        str: The content of the generated README file.
+    """
+    return "\n".join(iter_comprehensive_readme(root_path, ignore_patterns))
@@ -0,0 +1,128 @@
+"""Dependency graph helpers: strongly connected components and topological levels"""
+
+from typing import Collection, Hashable, Mapping
+
+
+def strongly_connected_components(
+    graph: Mapping[Hashable, Collection[Hashable]],
+) -> list[list[Hashable]]:
+    """
+    Find the strongly connected components of a directed graph.
+
+    Iterative Tarjan's algorithm, so deep dependency chains do not hit the
+    recursion limit. Edges to nodes that are not keys of ``graph`` are ignored.
+
+    Args:
+        graph (Mapping[Hashable, Collection[Hashable]]): Each node mapped to the
+            nodes it depends on.
+
+    Returns:
+        list[list[Hashable]]: The components, each listed after every
+        component it depends on.
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+
+    for root in graph:
+        if root in index:
+            continue
+        # Each frame is a node and the iterator over its remaining edges
+        frames = [(root, iter(graph[root]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+
+        while frames:
+            node, edges = frames[-1]
+            for target in edges:
+                if target not in graph:
+                    continue
+                if target not in index:
+                    index[target] = lowlink[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack.add(target)
+                    frames.append((target, iter(graph[target])))
+                    break
+                if target in on_stack:
+                    lowlink[node] = min(lowlink[node], index[target])
+            else:
+                # All edges of the node are done
+                frames.pop()
+                if frames:
+                    parent = frames[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+
+    return components
+
+
+def component_levels(
+    graph: Mapping[Hashable, Collection[Hashable]],
+) -> list[list[list[Hashable]]]:
+    """
+    Group the strongly connected components of a dependency graph into levels.
+
+    Like ``topological_levels``, but the nodes of a dependency cycle are kept
+    together as one component, to be processed as a unit.
+
+    Args:
+        graph (Mapping[Hashable, Collection[Hashable]]): Each node mapped to the
+            nodes it depends on.
+
+    Returns:
+        list[list[list[Hashable]]]: The levels, in processing order, each a
+        list of components.
+    """
+    level_of = {}
+    levels: list[list[list[Hashable]]] = []
+    for component in strongly_connected_components(graph):
+        members = set(component)
+        level = 0
+        for node in component:
+            for dependency in graph[node]:
+                if dependency in level_of and dependency not in members:
+                    level = max(level, level_of[dependency] + 1)
+        for node in component:
+            level_of[node] = level
+        while len(levels) <= level:
+            levels.append([])
+        levels[level].append(component)
+    return levels
+
+
+def topological_levels(
+    graph: Mapping[Hashable, Collection[Hashable]],
+) -> list[list[Hashable]]:
+    """
+    Group the nodes of a dependency graph into levels.
+
+    Every node comes after all of its dependencies: level 0 holds the nodes
+    without dependencies, level 1 the nodes depending only on level 0, and so
+    on. Nodes of a dependency cycle share a level. Nodes within a level do not
+    depend on each other and can be processed in parallel.
+
+    Args:
+        graph (Mapping[Hashable, Collection[Hashable]]): Each node mapped to the
+            nodes it depends on.
+
+    Returns:
+        list[list[Hashable]]: The levels, in processing order.
+    """
+    return [
+        [node for component in level for node in component]
+        for level in component_levels(graph)
+    ]
@@ -1,12 +1,13 @@
-import yaml
 import asyncio
 import argparse
 
-from typing import Any
+from typing import Any, TYPE_CHECKING
 from debtrazor.utils.cfg import Config
-from debtrazor.schema.request import AgentRequest
 from debtrazor.utils.logging import add_to_log_queue
 
+if TYPE_CHECKING:  # pydantic is slow to import and only needed for typing here
+    from debtrazor.schema.request import AgentRequest
+
 
 def load_config(config_path: str) -> dict[str, Any]:
     """
@@ -18,6 +19,8 @@ def load_config(config_path: str) -> dict[str, Any]:
     Returns:
         dict[str, Any]: The configuration data loaded from the YAML file.
     """
+    import yaml
+
     with open(config_path, "r") as fp:
         return yaml.safe_load(fp)
 
@@ -31,11 +34,43 @@ def parse_arguments() -> argparse.Namespace:
     """
     parser = argparse.ArgumentParser(description="Process a configuration file")
     parser.add_argument("config_path", help="Path to config file")
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a service documenting the JSON jobs read from stdin",
+    )
+    parser.add_argument(
+        "--sharded",
+        action="store_true",
+        help="Document the subtrees of the repository in parallel processes",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep documenting the changes to the repository until stopped",
+    )
+    parser.add_argument(
+        "--migrate",
+        action="store_true",
+        help="Migrate the repository to the new language once it is documented",
+    )
+    parser.add_argument(
+        "--estimate",
+        action="store_true",
+        help="Estimate tokens, cost and time of documenting without calling the model",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, help="Model calls in flight for --estimate"
+    )
+    parser.add_argument(
+        "--rpm", type=int, help="Provider requests per minute limit for --estimate"
+    )
     return parser.parse_args()
 
 
 async def load_and_validate_config(
-    config_data: AgentRequest | None = None, log_queue: asyncio.Queue | None = None
+    config_data: "AgentRequest | None" = None,
+    log_queue: asyncio.Queue | None = None,
 ) -> Config:
     """
     Load configuration and validate essential parameters.
@@ -1,8 +1,15 @@
 """Global logging for the app"""
 
 import asyncio
+import contextvars
 import logging
 import sys
+from contextlib import contextmanager
+
+# Where the progress of the running job is reported, see ``forward_progress``.
+# A context variable, so concurrent jobs sharing one agent report to their own
+# queue; ``asyncio.to_thread`` carries it into the thread running the graph.
+_progress_sink = contextvars.ContextVar("progress_sink", default=None)
 
 
 async def add_to_log_queue(message, log_queue):
@@ -21,6 +28,47 @@ async def add_to_log_queue(message, log_queue):
         await asyncio.sleep(1)  # Simulate a delay
 
 
+@contextmanager
+def forward_progress(log_queue):
+    """
+    Forward the ``report_progress`` messages of the current context to a queue.
+
+    Must be entered in the event loop consuming the queue; the messages can
+    then be reported from any thread running in a copy of the context.
+
+    Args:
+        log_queue (asyncio.Queue | None): The queue of the job, if any.
+    """
+    if not log_queue:
+        yield
+        return
+    loop = asyncio.get_running_loop()
+
+    def put(message):
+        try:
+            log_queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass  # Progress is best effort, the final messages still follow
+
+    token = _progress_sink.set(lambda message: loop.call_soon_threadsafe(put, message))
+    try:
+        yield
+    finally:
+        _progress_sink.reset(token)
+
+
+def report_progress(message):
+    """
+    Report progress of the running job, from any thread, without waiting.
+
+    Args:
+        message (str): The progress message; dropped if the job has no queue.
+    """
+    sink = _progress_sink.get()
+    if sink is not None:
+        sink(message)
+
+
 def setup_logger(name, level=logging.INFO):
     """
     Set up a logger with the given name and level.
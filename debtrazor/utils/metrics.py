@@ -0,0 +1,408 @@
+"""Built-in metrics for the app, exportable as JSON or Prometheus text"""
+
+import os
+import json
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from debtrazor.utils.logging import logger
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+
+# Upper bounds of the histogram buckets of per-call token counts
+TOKEN_BUCKETS = (0, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+
+class Histogram:
+    """
+    A cumulative histogram with fixed bucket bounds, like Prometheus'.
+
+    Attributes:
+        buckets (tuple[float, ...]): Upper bounds of the buckets.
+        counts (list[int]): Observations per bucket, the last one being +Inf.
+        count (int): Number of observations.
+        sum (float): Sum of the observed values.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """
+        Record one observation.
+
+        Args:
+            value (float): The observed value.
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        Return the cumulative count per upper bound.
+
+        Returns:
+            list[tuple[str, int]]: (upper bound, observations <= bound) pairs,
+            ending with ``+Inf``.
+        """
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), total))
+        return result
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of labelled counters and histograms.
+
+    Metrics are created on first use and keyed by name plus label values.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[tuple, float]] = {}
+        self._histograms: dict[str, dict[tuple, Histogram]] = {}
+        self._help: dict[str, str] = {}
+        # Registry of the run in progress in the current context, see ``run``
+        self._run = contextvars.ContextVar(f"metrics_run_{id(self)}", default=None)
+
+    @staticmethod
+    def _key(labels: dict) -> tuple:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def describe(self, name: str, help_text: str):
+        """
+        Set the help text of a metric, shown in the Prometheus export.
+
+        Args:
+            name (str): The metric name.
+            help_text (str): A one-line description.
+        """
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): The metric name.
+            value (float): The amount to add.
+            **labels: Label values of the series.
+        """
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+        run = self._run.get()
+        if run is not None:
+            run.inc(name, value, **labels)
+
+    def observe(self, name: str, value: float, buckets=DEFAULT_BUCKETS, **labels):
+        """
+        Record an observation in a histogram.
+
+        Args:
+            name (str): The metric name.
+            value (float): The observed value.
+            buckets (tuple[float, ...]): Bucket bounds, used when the series is
+                created. Defaults to the latency buckets.
+            **labels: Label values of the series.
+        """
+        key = self._key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+        run = self._run.get()
+        if run is not None:
+            run.observe(name, value, buckets, **labels)
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        """
+        Time a block and record its duration in seconds in a histogram.
+
+        Args:
+            name (str): The metric name.
+            **labels: Label values of the series.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def run(self):
+        """
+        Record the metrics of a run in a registry of its own too.
+
+        The metrics recorded in the block, and in the threads and tasks it
+        starts with a copy of its context, also go to a new registry, so runs
+        sharing the process (the jobs of the service) each export their own.
+
+        Yields:
+            MetricsRegistry: The registry of the run.
+        """
+        registry = MetricsRegistry()
+        registry._help = self._help
+        token = self._run.set(registry)
+        try:
+            yield registry
+        finally:
+            self._run.reset(token)
+
+    def current(self) -> "MetricsRegistry":
+        """
+        Return the registry of the run in progress, see ``run``.
+
+        Returns:
+            MetricsRegistry: The registry of the run, or this registry outside
+            of runs.
+        """
+        run = self._run.get()
+        return self if run is None else run
+
+    def reset(self):
+        """
+        Drop every recorded value.
+        """
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_dict(self) -> dict:
+        """
+        Return a snapshot of the metrics.
+
+        Returns:
+            dict: Counters and histograms, each a list of series with their
+            labels.
+        """
+        with self._lock:
+            counters = {
+                name: [
+                    {"labels": dict(key), "value": value}
+                    for key, value in series.items()
+                ]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": hist.count,
+                        "sum": hist.sum,
+                        "buckets": dict(hist.cumulative()),
+                    }
+                    for key, hist in series.items()
+                ]
+                for name, series in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def to_json(self) -> str:
+        """
+        Return a snapshot of the metrics as JSON.
+
+        Returns:
+            str: The JSON document.
+        """
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Return a snapshot of the metrics in the Prometheus text format.
+
+        Returns:
+            str: The exposition text.
+        """
+
+        def fmt_labels(labels, extra=None):
+            items = list(labels.items()) + list((extra or {}).items())
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+        snapshot = self.to_dict()
+        lines = []
+        for name, series in snapshot["counters"].items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for s in series:
+                lines.append(f"{name}{fmt_labels(s['labels'])} {s['value']}")
+        for name, series in snapshot["histograms"].items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for s in series:
+                for bound, count in s["buckets"].items():
+                    labels = fmt_labels(s["labels"], {"le": bound})
+                    lines.append(f"{name}_bucket{labels} {count}")
+                lines.append(f"{name}_sum{fmt_labels(s['labels'])} {s['sum']}")
+                lines.append(f"{name}_count{fmt_labels(s['labels'])} {s['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, output_dir: str):
+        """
+        Write ``metrics.json`` and ``metrics.prom`` to a directory.
+
+        Args:
+            output_dir (str): The directory to write to.
+        """
+        with open(os.path.join(output_dir, "metrics.json"), "w") as f:
+            f.write(self.to_json())
+        with open(os.path.join(output_dir, "metrics.prom"), "w") as f:
+            f.write(self.to_prometheus())
+
+
+def _escape(value) -> str:
+    """
+    Escape a label value for the Prometheus text format.
+
+    Args:
+        value: The label value.
+
+    Returns:
+        str: The escaped value.
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def start_metrics_server(registry: MetricsRegistry, port: int, host: str = "127.0.0.1"):
+    """
+    Serve live metrics over HTTP from a daemon thread.
+
+    ``/metrics`` returns the Prometheus text format and ``/metrics.json`` the
+    JSON snapshot.
+
+    Args:
+        registry (MetricsRegistry): The registry to serve.
+        port (int): The port to listen on.
+        host (str): The interface to bind. Defaults to localhost.
+
+    Returns:
+        ThreadingHTTPServer: The running server; call ``shutdown()`` to stop it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = (
+                    registry.to_prometheus(),
+                    "text/plain; version=0.0.4",
+                )
+            elif self.path == "/metrics.json":
+                body, content_type = registry.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            payload = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass  # Keep scrapes out of the application log
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info("Serving metrics on http://%s:%s/metrics", host, port)
+    return server
+
+
+# Create a default registry for the entire application
+metrics = MetricsRegistry()
+
+metrics.describe("debtrazor_node_seconds", "Time spent in each DocAgent graph node")
+metrics.describe("debtrazor_chain_seconds", "Latency of each model chain call")
+metrics.describe("debtrazor_llm_prompt_tokens_total", "Prompt tokens sent per chain")
+metrics.describe(
+    "debtrazor_llm_completion_tokens_total", "Completion tokens received per chain"
+)
+metrics.describe(
+    "debtrazor_llm_cached_prompt_tokens_total",
+    "Prompt tokens served from the provider's prompt cache per chain",
+)
+metrics.describe(
+    "debtrazor_llm_cached_prompt_tokens",
+    "Prompt tokens served from the provider's prompt cache per call",
+)
+metrics.describe("debtrazor_cache_hits_total", "Model calls avoided by each cache")
+metrics.describe("debtrazor_bytes_written_total", "Bytes of documentation written")
+metrics.describe(
+    "debtrazor_files_skipped_total", "Source files left out, by detected kind"
+)
+metrics.describe(
+    "debtrazor_files_split_total",
+    "Source files over the token limit, by chunked or truncated",
+)
+metrics.describe(
+    "debtrazor_prefetch_total",
+    "Prepared files and dependencies used, by whether the prefetch was ready",
+)
+metrics.describe(
+    "debtrazor_insertions_total",
+    "Comments listed by the model in insertions mode, by applied or rejected",
+)
+metrics.describe(
+    "debtrazor_insertions_fallback_total",
+    "Files documented as whole code after unusable insertions, by reason",
+)
+metrics.describe(
+    "debtrazor_duplicates_total",
+    "Files documented from an exact or near copy of a documented file",
+)
+metrics.describe(
+    "debtrazor_batch_requests_total",
+    "Requests sent through the batch backend, by kind and result",
+)
+metrics.describe(
+    "debtrazor_batch_wait_seconds", "Time spent waiting for each batch, by kind"
+)
+metrics.describe(
+    "debtrazor_watch_refresh_seconds",
+    "Time from a change to the repository to its documentation in watch mode",
+)
+metrics.describe("debtrazor_migrated_files_total", "Files migrated to the new language")
+metrics.describe(
+    "debtrazor_migration_failures_total", "Files whose migration raised an error"
+)
+metrics.describe(
+    "debtrazor_migration_wave_seconds",
+    "Time spent migrating each wave of the dependency graph",
+)
+metrics.describe(
+    "debtrazor_checkpoint_seconds", "Time spent in each checkpointer operation"
+)
@@ -0,0 +1,247 @@
+"""
+Content sniffing of source files before they are sent to the model.
+
+Only the size and the first few KB of a file are read to tell whether it is
+binary, minified, generated or too large to document, so vendored bundles and
+build artifacts that match the language's extension are skipped without
+reading them in full.
+"""
+
+import os
+import re
+from typing import NamedTuple
+
+# Bytes read from the start of a file to classify it
+SNIFF_BYTES = 8192
+
+# Standard headers of generated code, searched in the comments opening a
+# file: ``@generated``, Go's ``Code generated ... DO NOT EDIT.`` and protoc's
+GENERATED_MARKERS = re.compile(
+    r"@generated\b|"
+    r"^Code generated .* DO NOT EDIT\.$|"
+    r"Generated by the protocol buffer compiler\.\s+DO NOT EDIT!"
+)
+GENERATED_LINES = 10
+
+# Line comment prefixes, and block comment delimiters, of the supported
+# languages
+LINE_COMMENT = re.compile(r"^(?://+|#+!?|--|;+|%+)\s?")
+BLOCK_COMMENTS = {"/*": "*/", "<!--": "-->"}
+
+# File name patterns of minified and generated files
+MINIFIED_NAMES = re.compile(r"[.-]min\.(js|css|mjs)$|\.bundle\.js$|\.chunk\.js$")
+GENERATED_NAMES = re.compile(r"_pb2(_grpc)?\.py$|\.pb\.go$|\.g\.dart$|\.designer\.cs$")
+
+# Minified code has few, very long lines
+MINIFIED_LINE_LENGTH = 500
+
+# Share of control bytes (other than whitespace, backspace and escape) above
+# which a file is binary
+TEXT_CONTROL_BYTES = frozenset(b"\t\n\r\f\v\b\x1b")
+BINARY_CONTROL_RATIO = 0.1
+
+
+class FileLimits(NamedTuple):
+    """
+    Limits deciding which files are documented and how.
+
+    Attributes:
+        max_bytes (int): Files larger than this are skipped unread.
+        max_tokens (int): Code tokens sent to the model in one prompt.
+        oversize (str): What to do with files above ``max_tokens``: "chunk"
+            documents them in pieces of ``max_tokens``, "truncate" documents
+            their first ``max_tokens`` only, "skip" leaves them out.
+        skip_generated (bool): Skip minified and generated files. Binary files
+            are always skipped.
+    """
+
+    max_bytes: int = 1_000_000
+    max_tokens: int = 16_000
+    oversize: str = "chunk"
+    skip_generated: bool = True
+
+    @classmethod
+    def from_config(cls, document_cfg) -> "FileLimits":
+        """
+        Read the limits of the ``document`` config section.
+
+        Args:
+            document_cfg (Config | None): The ``document`` section.
+
+        Returns:
+            FileLimits: The configured limits, with defaults for unset keys.
+        """
+        defaults = cls()
+        skip_generated = getattr(document_cfg, "skip_generated_files", None)
+        return cls(
+            max_bytes=getattr(document_cfg, "max_file_bytes", None)
+            or defaults.max_bytes,
+            max_tokens=getattr(document_cfg, "max_file_tokens", None)
+            or defaults.max_tokens,
+            oversize=getattr(document_cfg, "oversize_files", None) or defaults.oversize,
+            skip_generated=(
+                defaults.skip_generated if skip_generated is None else skip_generated
+            ),
+        )
+
+
+class FileProfile(NamedTuple):
+    """
+    Classification of a file from its size and first bytes.
+
+    Attributes:
+        kind (str): "text", "binary", "minified", "generated", "oversize" or
+            "unreadable".
+        size (int): Size of the file in bytes.
+    """
+
+    kind: str
+    size: int
+
+
+def _is_binary(head: bytes) -> bool:
+    """
+    Tell whether the start of a file is binary data.
+
+    Text in another encoding than UTF-8 (e.g. Latin-1) is not binary; its
+    undecodable bytes are replaced when the file is read.
+
+    Args:
+        head (bytes): The first bytes of the file.
+
+    Returns:
+        bool: True if the bytes contain NUL bytes or mostly control bytes.
+    """
+    if b"\x00" in head:
+        return True
+    if not head:
+        return False
+    control = sum(1 for byte in head if byte < 32 and byte not in TEXT_CONTROL_BYTES)
+    return control / len(head) > BINARY_CONTROL_RATIO
+
+
+def _is_minified(text: str) -> bool:
+    """
+    Tell whether the start of a file looks like minified code.
+
+    Args:
+        text (str): The decoded first bytes of the file.
+
+    Returns:
+        bool: True if the lines are very long on average.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return False
+    # The last line may be cut by the head
+    complete_lines = lines[:-1] or lines
+    average = sum(len(line) for line in complete_lines) / len(complete_lines)
+    return average > MINIFIED_LINE_LENGTH
+
+
+def _has_generated_header(text: str) -> bool:
+    """
+    Tell whether the comments opening a file mark it as generated.
+
+    Only the comments before the first line of code are searched, and only
+    for the standard headers, so docstrings and code mentioning generated
+    things (e.g. "auto-generated invoice numbers") are not matched.
+
+    Args:
+        text (str): The decoded first bytes of the file.
+
+    Returns:
+        bool: True if a leading comment holds a ``GENERATED_MARKERS`` header.
+    """
+    block_end = None
+    for line in text.splitlines()[:GENERATED_LINES]:
+        line = line.strip()
+        if block_end is not None:
+            comment, closed, _ = line.partition(block_end)
+            if closed:
+                block_end = None
+            comment = comment.lstrip("*").strip()
+        elif not line:
+            continue
+        else:
+            for start, end in BLOCK_COMMENTS.items():
+                if line.startswith(start):
+                    comment, closed, _ = line[len(start) :].partition(end)
+                    block_end = None if closed else end
+                    comment = comment.lstrip("*").strip()
+                    break
+            else:
+                match = LINE_COMMENT.match(line)
+                if match is None:
+                    return False  # The code starts
+                comment = line[match.end() :]
+        if GENERATED_MARKERS.search(comment):
+            return True
+    return False
+
+
+def sniff_file(path: str, max_bytes: int | None = None) -> FileProfile:
+    """
+    Classify a file from its size and its first ``SNIFF_BYTES`` bytes.
+
+    Args:
+        path (str): The file path.
+        max_bytes (int | None): Files larger than this are "oversize" and are
+            not read at all.
+
+    Returns:
+        FileProfile: The file's kind and size.
+    """
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if max_bytes is not None and size > max_bytes:
+                return FileProfile("oversize", size)
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return FileProfile("unreadable", 0)
+
+    if _is_binary(head):
+        return FileProfile("binary", size)
+
+    name = os.path.basename(path)
+    text = head.decode("utf-8", errors="ignore")
+    if MINIFIED_NAMES.search(name) or _is_minified(text):
+        return FileProfile("minified", size)
+    if GENERATED_NAMES.search(name) or _has_generated_header(text):
+        return FileProfile("generated", size)
+    return FileProfile("text", size)
+
+
+def skip_reason(path: str, limits: FileLimits) -> str | None:
+    """
+    Decide from its profile whether a file is left out of the documentation.
+
+    Args:
+        path (str): The file path.
+        limits (FileLimits): The configured limits.
+
+    Returns:
+        str | None: The kind of the skipped file (e.g. "binary"), or None if
+        the file is documented.
+    """
+    profile = sniff_file(path, limits.max_bytes)
+    if profile.kind in ("binary", "oversize", "unreadable"):
+        return profile.kind
+    if profile.kind in ("minified", "generated") and limits.skip_generated:
+        return profile.kind
+    return None
+
+
+def read_source(path: str) -> str:
+    """
+    Read a source file as text, replacing undecodable bytes.
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        str: The file content.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read()
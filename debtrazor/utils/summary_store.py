@@ -0,0 +1,308 @@
+"""
+Queryable store of the summaries of a documented repository.
+
+File summaries and directory READMEs are written to ``summaries.db``, a
+SQLite database next to the dependency index, with the code digest,
+language and dependencies of each file and a full-text index (FTS5) of the
+summaries. Later stages (planning, migration) can then look up the context
+of thousands of files without reading the documentation or calling the
+model again. Where SQLite is built without FTS5, search falls back to
+substring matching.
+
+The store can be queried from the command line::
+
+    python -m debtrazor.utils.summary_store summaries.db get utils/load.py
+    python -m debtrazor.utils.summary_store summaries.db search "config loading"
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from typing import Iterable
+
+# File name of the store in the output directory
+STORE_FILE = "summaries.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    language TEXT,
+    digest TEXT,
+    summary TEXT NOT NULL,
+    dependencies TEXT
+)
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(
+    path, summary, content='summaries', tokenize='porter unicode61'
+)
+"""
+
+_COLUMNS = ("path", "kind", "language", "digest", "summary", "dependencies")
+
+
+def _row(values) -> dict:
+    record = dict(zip(_COLUMNS, values))
+    if record["dependencies"] is not None:
+        record["dependencies"] = json.loads(record["dependencies"])
+    return record
+
+
+def _match_query(query: str) -> str:
+    """
+    Quote the terms of a search, so FTS5 operators in it are plain text.
+
+    Args:
+        query (str): The search terms.
+
+    Returns:
+        str: The FTS5 query matching summaries with all the terms.
+    """
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+class SummaryStore:
+    """
+    Summaries and READMEs of a documented repository, by path.
+
+    Each record has the ``path`` relative to the repository root (``""`` for
+    the root README), its ``kind`` ("file" or "directory"), the ``language``,
+    the ``digest`` of the documented code (files only), the ``summary`` or
+    README, and the ``dependencies`` of a file (None if unknown).
+    """
+
+    def __init__(self, path: str):
+        """
+        Open or create a store.
+
+        Args:
+            path (str): The database path.
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        try:
+            self._conn.execute(_FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5
+            self.full_text = False
+        self._conn.commit()
+
+    def __enter__(self) -> "SummaryStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def add(self, records: Iterable[dict], prefix: str = ""):
+        """
+        Add or replace records, and update the full-text index.
+
+        Args:
+            records (Iterable[dict]): The records, see the class.
+            prefix (str): Directory prepended to their paths and
+                dependencies, e.g. to merge the store of a subtree.
+        """
+        rows = []
+        for record in records:
+            path = record["path"]
+            dependencies = record.get("dependencies")
+            if prefix:
+                # The root README ("") of a subtree is its directory's README
+                path = os.path.join(prefix, path).rstrip(os.sep)
+                if dependencies is not None:
+                    dependencies = [
+                        os.path.normpath(os.path.join(prefix, dependency))
+                        for dependency in dependencies
+                    ]
+            rows.append(
+                (
+                    path,
+                    record["kind"],
+                    record.get("language"),
+                    record.get("digest"),
+                    record["summary"],
+                    None if dependencies is None else json.dumps(list(dependencies)),
+                )
+            )
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            if self.full_text:
+                self._conn.execute(
+                    "INSERT INTO summaries_fts(summaries_fts) VALUES ('rebuild')"
+                )
+
+    def records(self, kind: str | None = None) -> list[dict]:
+        """
+        Return all records, sorted by path.
+
+        Args:
+            kind (str | None): Only return records of this kind.
+
+        Returns:
+            list[dict]: The records.
+        """
+        rows = self._conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM summaries"
+            " WHERE ? IS NULL OR kind = ? ORDER BY path",
+            (kind, kind),
+        ).fetchall()
+        return [_row(row) for row in rows]
+
+    def get(self, path: str) -> dict | None:
+        """
+        Return the record of a path.
+
+        Args:
+            path (str): The path relative to the repository root.
+
+        Returns:
+            dict | None: The record, or None if the path has none.
+        """
+        row = self._conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM summaries WHERE path = ?", (path,)
+        ).fetchone()
+        return None if row is None else _row(row)
+
+    def get_many(self, paths: Iterable[str]) -> dict[str, dict]:
+        """
+        Return the records of many paths at once.
+
+        Args:
+            paths (Iterable[str]): The paths relative to the repository root.
+
+        Returns:
+            dict[str, dict]: The record of each path that has one.
+        """
+        paths = list(dict.fromkeys(paths))
+        records = {}
+        # Stay below the SQLite limit of bound parameters
+        for start in range(0, len(paths), 500):
+            chunk = paths[start : start + 500]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM summaries"
+                f" WHERE path IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            records.update((row[0], _row(row)) for row in rows)
+        return records
+
+    def search(
+        self, query: str, limit: int = 20, kind: str | None = None
+    ) -> list[dict]:
+        """
+        Find the summaries mentioning all the terms of a query.
+
+        Args:
+            query (str): The search terms.
+            limit (int): Maximum number of records returned.
+            kind (str | None): Only return records of this kind.
+
+        Returns:
+            list[dict]: The matching records, best first (by BM25 with full
+            text search, by path otherwise).
+        """
+        if not query.split():
+            return []
+        if self.full_text:
+            rows = self._conn.execute(
+                f"SELECT {', '.join('s.' + column for column in _COLUMNS)}"
+                " FROM summaries_fts JOIN summaries s ON s.rowid = summaries_fts.rowid"
+                " WHERE summaries_fts MATCH ? AND (? IS NULL OR s.kind = ?)"
+                " ORDER BY bm25(summaries_fts) LIMIT ?",
+                (_match_query(query), kind, kind, limit),
+            ).fetchall()
+        else:
+            terms = query.split()
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM summaries WHERE "
+                + " AND ".join("(summary LIKE ? OR path LIKE ?)" for _ in terms)
+                + " AND (? IS NULL OR kind = ?) ORDER BY path LIMIT ?",
+                [f"%{term}%" for term in terms for _ in range(2)] + [kind, kind, limit],
+            ).fetchall()
+        return [_row(row) for row in rows]
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        self._conn.close()
+
+
+def save_summary_store(records: Iterable[dict], output_path: str) -> str:
+    """
+    Save the summaries of a documented repository in its output path.
+
+    The store is rebuilt and replaces the previous one once complete, so
+    readers never see a partial store.
+
+    Args:
+        records (Iterable[dict]): The records, see ``SummaryStore``, e.g.
+            from ``DocAgent.summary_records``.
+        output_path (str): The output directory.
+
+    Returns:
+        str: The path of the store.
+    """
+    store_path = os.path.join(output_path, STORE_FILE)
+    temporary_path = store_path + ".tmp"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    with SummaryStore(temporary_path) as store:
+        store.add(records)
+    os.replace(temporary_path, store_path)
+    return store_path
+
+
+def main(argv=None) -> int:
+    """
+    Query a summary store from the command line.
+
+    Args:
+        argv (list[str] | None): Command line arguments.
+
+    Returns:
+        int: 0 on success, 1 if the store does not exist or a path is not
+        in it.
+    """
+    parser = argparse.ArgumentParser(description="Query a summary store")
+    parser.add_argument("store", help=f"Path of the store ({STORE_FILE})")
+    parser.add_argument("query", choices=["get", "search", "list"])
+    parser.add_argument(
+        "terms", nargs="*", help="get: paths relative to the root; search: words"
+    )
+    parser.add_argument("--kind", choices=["file", "directory"])
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.store):
+        print(f"{args.store} does not exist", file=sys.stderr)
+        return 1
+    with SummaryStore(args.store) as store:
+        if args.query == "get":
+            records = store.get_many(args.terms)
+            missing = [path for path in args.terms if path not in records]
+            if missing:
+                print(f"Not in the store: {' '.join(missing)}", file=sys.stderr)
+                return 1
+            print(json.dumps([records[path] for path in args.terms], indent=2))
+        elif args.query == "search":
+            records = store.search(" ".join(args.terms), args.limit, args.kind)
+            print(json.dumps(records, indent=2))
+        else:
+            print("\n".join(record["path"] for record in store.records(args.kind)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
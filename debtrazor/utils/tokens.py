@@ -0,0 +1,141 @@
+"""Local token counting, used to budget prompts without calling the model"""
+
+import io
+import math
+import itertools
+from functools import lru_cache
+from typing import Iterable, Iterator
+
+from debtrazor.utils.logging import logger
+
+# Average characters per token for code and English prose with OpenAI
+# tokenizers, used when tiktoken or its encoding files are unavailable.
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str | None = None):
+    """
+    Return the tiktoken encoding for a model, if it can be loaded.
+
+    Args:
+        model_name (str | None): The model name, e.g. ``gpt-4o-mini``.
+
+    Returns:
+        The tiktoken encoding, or None if tiktoken or the encoding files are
+        not available (e.g. when running offline).
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model_name or "gpt-4o")
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.info("tiktoken encoding unavailable, estimating tokens: %s", e)
+        return None
+
+
+def count_tokens(text: str, model_name: str | None = None) -> int:
+    """
+    Count the tokens of a text locally.
+
+    Args:
+        text (str): The text to count.
+        model_name (str | None): The model whose tokenizer should be used.
+
+    Returns:
+        int: The exact token count when tiktoken is usable, otherwise an
+        estimate from the text length.
+    """
+    if not text:
+        return 0
+    encoding = get_encoding(model_name)
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_by_tokens(
+    text: str, max_tokens: int, model_name: str | None = None
+) -> list[str]:
+    """
+    Split a text into pieces of at most ``max_tokens`` tokens.
+
+    The text is cut at line breaks, so code is split between lines; a single
+    line longer than the budget is cut by characters.
+
+    Args:
+        text (str): The text to split.
+        max_tokens (int): Token budget of each piece.
+        model_name (str | None): The model whose tokenizer should be used.
+
+    Returns:
+        list[str]: The pieces, in order; a single piece if the text fits.
+    """
+    if count_tokens(text, model_name) <= max_tokens:
+        return [text]
+    return list(_split_lines(text.splitlines(keepends=True), max_tokens, model_name))
+
+
+def split_file_by_tokens(
+    path: str, max_tokens: int, model_name: str | None = None
+) -> Iterator[str]:
+    """
+    Read a text file in pieces of at most ``max_tokens`` tokens.
+
+    The pieces are those of ``split_by_tokens``, but only one piece is held
+    in memory at a time.
+
+    Args:
+        path (str): The file to read.
+        max_tokens (int): Token budget of each piece.
+        model_name (str | None): The model whose tokenizer should be used.
+
+    Yields:
+        str: The pieces, in order; a single piece if the file fits.
+    """
+    with open(path, "r") as f:
+        # Twice the expected size of a fitting file, to keep its single piece
+        head = f.read(2 * max_tokens * CHARS_PER_TOKEN)
+        if len(head) < 2 * max_tokens * CHARS_PER_TOKEN:
+            yield from split_by_tokens(head, max_tokens, model_name)
+            return
+        lines = itertools.chain(io.StringIO(head + f.readline()), f)
+        yield from _split_lines(lines, max_tokens, model_name)
+
+
+def _split_lines(
+    lines: Iterable[str], max_tokens: int, model_name: str | None
+) -> Iterator[str]:
+    """
+    Group lines into pieces of at most ``max_tokens`` tokens.
+
+    Args:
+        lines (Iterable[str]): The lines, with their line breaks.
+        max_tokens (int): Token budget of each piece.
+        model_name (str | None): The model whose tokenizer should be used.
+
+    Yields:
+        str: The pieces, in order.
+    """
+    current = []
+    current_tokens = 0
+    for line in lines:
+        line_tokens = count_tokens(line, model_name)
+        if current and current_tokens + line_tokens > max_tokens:
+            yield "".join(current)
+            current = []
+            current_tokens = 0
+        if line_tokens > max_tokens:
+            width = max_tokens * CHARS_PER_TOKEN
+            yield from (line[i : i + width] for i in range(0, len(line), width))
+            continue
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        yield "".join(current)
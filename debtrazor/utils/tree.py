@@ -2,6 +2,8 @@ from pathlib import Path
 from typing import Optional, List
 import fnmatch
 
+from debtrazor.utils.walk import walk_tree
+
 
 def should_ignore(path: Path, base_path: Path, ignore_patterns: List[str]) -> bool:
     """
@@ -50,47 +52,35 @@ def tree(
     """
     # Resolve the directory path to an absolute path
     dir_path = Path(dir_path).resolve()
-    # Initialize ignore patterns if not provided
-    ignore_patterns = ignore_patterns or []
     files = 0
     directories = 0
     output = [dir_path.name]
+    # Whether the open directory at each depth is the last of its parent
+    last_at_depth: List[bool] = []
 
-    def inner(dir_path: Path, prefix: str = "", level: int = -1) -> List[str]:
-        nonlocal files, directories
-        if level == 0:
-            return []
-
-        # Get the contents of the directory, filtering out ignored paths
-        contents = [
-            d
-            for d in dir_path.iterdir()
-            if not should_ignore(d, dir_path, ignore_patterns)
-        ]
-        if limit_to_directories:
-            contents = [d for d in contents if d.is_dir()]
-
-        # Create pointers for tree structure
-        pointers = ["├── "] * (len(contents) - 1) + ["└── "]
-        result = []
-        for pointer, path in zip(pointers, contents):
-            if path.is_dir():
-                result.append(f"{prefix}{pointer}{path.name}")
-                directories += 1
-                extension = "│   " if pointer == "├── " else "    "
-                result.extend(inner(path, prefix=prefix + extension, level=level - 1))
-            elif not limit_to_directories:
-                result.append(f"{prefix}{pointer}{path.name}")
-                files += 1
-        return result
-
-    # Generate the tree structure
-    output.extend(inner(dir_path, level=level))
+    # Stream entries from the walker so that nothing past the length limit is
+    # ever listed. Ignore patterns are matched against entry names, as if every
+    # directory were the root.
+    for entry in walk_tree(
+        dir_path,
+        ignore_patterns=ignore_patterns,
+        level=level,
+        limit_to_directories=limit_to_directories,
+        match_names_only=True,
+    ):
+        if len(output) >= length_limit:
+            output.append(f"... length_limit, {length_limit}, reached, counted:")
+            break
 
-    # Check if the output exceeds the length limit
-    if len(output) > length_limit:
-        output = output[:length_limit]
-        output.append(f"... length_limit, {length_limit}, reached, counted:")
+        del last_at_depth[entry.depth :]
+        prefix = "".join("    " if last else "│   " for last in last_at_depth)
+        pointer = "└── " if entry.is_last else "├── "
+        output.append(f"{prefix}{pointer}{entry.name}")
+        if entry.is_dir:
+            directories += 1
+            last_at_depth.append(entry.is_last)
+        else:
+            files += 1
 
     # Append the summary of directories and files
     output.append(
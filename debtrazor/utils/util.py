@@ -66,6 +66,89 @@ def parse_code_string(code_string):
     return code_string
 
 
+class CodeStringStream:
+    """
+    Incremental ``parse_code_string`` for model output streamed in chunks.
+
+    Text is passed on as soon as it cannot be part of the code fence anymore,
+    so only the fence lines (and what follows the closing one) are held back.
+    Unlike ``parse_code_string``, output that ends inside the code block,
+    e.g. because it was cut at the token limit, keeps its code without the
+    opening fence.
+    """
+
+    FENCE = "```"
+    CLOSING_FENCE = "\n```"
+
+    def __init__(self):
+        self._buffer = ""
+        # None until the start of the output is known, then "code" inside a
+        # code block, "plain" without one and "done" after the closing fence
+        self._mode = None
+
+    def _pass_through(self) -> str:
+        self._mode = "plain"
+        text, self._buffer = self._buffer, ""
+        return text
+
+    def feed(self, chunk: str) -> str:
+        """
+        Consume a chunk of the output.
+
+        Args:
+            chunk (str): The next chunk of the model output.
+
+        Returns:
+            str: The code that can be written out so far.
+        """
+        if self._mode == "plain":
+            return chunk
+        if self._mode == "done":
+            return ""
+        self._buffer += chunk
+
+        if self._mode is None:
+            if not self._buffer.startswith(self.FENCE[: len(self._buffer)]):
+                return self._pass_through()
+            newline = self._buffer.find("\n", len(self.FENCE))
+            if newline == -1:
+                return ""  # Still in the opening fence line
+            if newline == len(self.FENCE):
+                # A fence without language is not parsed by parse_code_string
+                return self._pass_through()
+            self._buffer = self._buffer[newline + 1 :]
+            self._mode = "code"
+
+        end = self._buffer.find(self.CLOSING_FENCE)
+        if end != -1:
+            self._mode = "done"
+            text, self._buffer = self._buffer[:end], ""
+            return text
+        # Hold back the start of a closing fence split across chunks
+        keep = next(
+            (
+                size
+                for size in range(len(self.CLOSING_FENCE) - 1, 0, -1)
+                if self._buffer.endswith(self.CLOSING_FENCE[:size])
+            ),
+            0,
+        )
+        text = self._buffer[: len(self._buffer) - keep]
+        self._buffer = self._buffer[len(self._buffer) - keep :]
+        return text
+
+    def close(self) -> str:
+        """
+        Finish the output.
+
+        Returns:
+            str: The code held back until the end of the output.
+        """
+        text, self._buffer = self._buffer, ""
+        self._mode = "done"
+        return text
+
+
 def get_relative_path(path, entry_path):
     """
     Computes the relative path from the entry path to the given path.
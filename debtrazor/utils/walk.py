@@ -0,0 +1,130 @@
+import os
+import re
+import fnmatch
+from typing import Iterator, List, NamedTuple, Optional
+
+
+class WalkEntry(NamedTuple):
+    """
+    A file or directory yielded by ``walk_tree``.
+
+    Attributes:
+        depth (int): Depth below the root, 0 for the root's own entries.
+        name (str): The entry name.
+        path (str): The full path of the entry.
+        rel_path (str): The path relative to the root.
+        is_dir (bool): True if the entry is a directory.
+        is_last (bool): True if it is the last entry of its directory.
+    """
+
+    depth: int
+    name: str
+    path: str
+    rel_path: str
+    is_dir: bool
+    is_last: bool
+
+
+def compile_ignore_patterns(ignore_patterns: Optional[List[str]]):
+    """
+    Compile fnmatch patterns into a single regular expression.
+
+    Args:
+        ignore_patterns (Optional[List[str]]): Patterns to ignore.
+
+    Returns:
+        re.Pattern | None: The compiled pattern, or None if there are none.
+    """
+    if not ignore_patterns:
+        return None
+    return re.compile(
+        "|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in ignore_patterns)
+    )
+
+
+def walk_tree(
+    root: str | os.PathLike,
+    ignore_patterns: Optional[List[str]] = None,
+    level: int = -1,
+    limit_to_directories: bool = False,
+    sort: bool = False,
+    match_names_only: bool = False,
+) -> Iterator[WalkEntry]:
+    """
+    Walk a directory tree depth-first without recursion.
+
+    Entries are listed with ``os.scandir`` so file types come from the
+    directory listing instead of a stat per entry. Ignored directories are
+    pruned, and since this is a generator, callers can stop early without the
+    rest of the tree being listed.
+
+    Args:
+        root (str | os.PathLike): The directory to walk.
+        ignore_patterns (Optional[List[str]]): fnmatch patterns of entries to
+            skip. They are matched against the path relative to the root (also
+            with a trailing slash) and the entry name.
+        level (int): Maximum depth to list (-1 for unlimited).
+        limit_to_directories (bool): If True, only yield directories.
+        sort (bool): If True, list directories first, then by name; otherwise
+            keep the order of the directory listing.
+        match_names_only (bool): If True, match the patterns against entry
+            names only, as if every directory were the root.
+
+    Yields:
+        WalkEntry: The entries, parents before their children.
+    """
+    if level == 0:
+        return
+    ignore = compile_ignore_patterns(ignore_patterns)
+    root = os.fspath(root)
+
+    def list_directory(path: str, rel_dir: str, depth: int) -> List[WalkEntry]:
+        try:
+            with os.scandir(path) as it:
+                raw = [(entry, entry.is_dir()) for entry in it]
+        except OSError:
+            return []
+
+        kept = []
+        for entry, is_dir in raw:
+            if limit_to_directories and not is_dir:
+                continue
+            rel_path = (
+                entry.name
+                if match_names_only or not rel_dir
+                else (rel_dir + "/" + entry.name)
+            )
+            if ignore is not None and (
+                ignore.match(rel_path)
+                or ignore.match(rel_path + "/")
+                or ignore.match(entry.name)
+            ):
+                continue
+            kept.append((entry, is_dir))
+        if sort:
+            kept.sort(key=lambda item: (not item[1], item[0].name))
+
+        return [
+            WalkEntry(
+                depth=depth,
+                name=entry.name,
+                path=entry.path,
+                rel_path=entry.name if not rel_dir else rel_dir + "/" + entry.name,
+                is_dir=is_dir,
+                is_last=index == len(kept) - 1,
+            )
+            for index, (entry, is_dir) in enumerate(kept)
+        ]
+
+    # Stack of directory listings being walked, innermost last
+    stack = [iter(list_directory(root, "", 0))]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+        yield entry
+        if entry.is_dir and (level < 0 or entry.depth + 1 < level):
+            stack.append(
+                iter(list_directory(entry.path, entry.rel_path, entry.depth + 1))
+            )
@@ -0,0 +1,21 @@
+import sqlite3
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from debtrazor.agents.instrumentation import InstrumentedCheckpointSaver
+from debtrazor.utils.metrics import MetricsRegistry
+
+
+def test_delete_thread_is_forwarded():
+    saver = InstrumentedCheckpointSaver(
+        SqliteSaver(sqlite3.connect(":memory:", check_same_thread=False)),
+        MetricsRegistry(),
+    )
+    config = {"configurable": {"thread_id": "a", "checkpoint_ns": ""}}
+    saver.put(config, empty_checkpoint(), {}, {})
+    assert saver.get_tuple(config) is not None
+
+    saver.delete_thread("a")
+
+    assert saver.get_tuple(config) is None
@@ -0,0 +1,23 @@
+import sqlite3
+
+import pytest
+
+from debtrazor.agents.doc_agent.journal import get_journal, hold_journal
+
+
+def test_journal_is_closed_after_last_run(tmp_path):
+    path = str(tmp_path / "journal.db")
+
+    with hold_journal(path):
+        journal = get_journal(path)
+        with hold_journal(path):
+            assert get_journal(path) is journal
+        journal.record("/repo", "a.py", "doc")
+        assert journal.done("/repo", "a.py", "doc")
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        journal.done("/repo", "a.py", "doc")
+    reopened = get_journal(path)
+    assert reopened is not journal
+    assert reopened.done("/repo", "a.py", "doc")
+    reopened.close()
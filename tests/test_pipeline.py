@@ -0,0 +1,22 @@
+from debtrazor.agents.doc_agent.pipeline import Prefetcher
+
+
+def test_closed_prefetcher_drops_results_and_can_run_again():
+    loads = []
+
+    def load(value):
+        loads.append(value)
+        return value * 2
+
+    prefetcher = Prefetcher("test", load)
+    prefetcher.prefetch([(1,), (2,)])
+    assert prefetcher.get((1,)) == 2
+
+    prefetcher.close()
+    assert prefetcher._pool is None and not prefetcher._futures
+
+    prefetcher.prefetch([(3,)])
+    assert prefetcher.get((3,)) == 6
+    assert prefetcher.get((1,)) == 2
+    prefetcher.close()
+    assert loads.count(1) == 2
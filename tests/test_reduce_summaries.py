@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from debtrazor.agents.doc_agent.agent import DocAgent
+
+
+class _Chain:
+    """Stands in for the README batch chain, answering with a fixed text."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+
+    def batch(self, inputs, config=None):
+        self.calls += len(inputs)
+        return [SimpleNamespace(content=self.answer) for _ in inputs]
+
+
+def _reduce(summaries, answer, budget=50):
+    chain = _Chain(answer)
+    agent = SimpleNamespace(
+        readme_batch_tokens=budget,
+        model_name=None,
+        readme_batch_chain=chain,
+        max_concurrency=4,
+    )
+    return DocAgent.reduce_summaries(agent, summaries, "pkg"), chain.calls
+
+
+def test_summaries_over_budget_each_are_not_batched():
+    summaries = ["x" * 400 for _ in range(5)]
+
+    assert _reduce(summaries, "short") == ("\n\n".join(summaries), 0)
+
+
+def test_rounds_stop_when_summaries_do_not_shrink():
+    summaries = ["x" * 80 for _ in range(6)]
+
+    joined, calls = _reduce(summaries, "y" * 160)
+
+    assert calls == 3
+    assert joined.count("y" * 160) == 3
+
+
+def test_summaries_are_reduced_within_budget():
+    summaries = ["x" * 80 for _ in range(6)]
+
+    joined, calls = _reduce(summaries, "short")
+
+    assert calls == 3
+    assert joined.count("short") == 3
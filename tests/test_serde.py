@@ -0,0 +1,60 @@
+import datetime
+import uuid
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.types import Interrupt
+
+from debtrazor.agents.doc_agent.serde import FORMAT, CompactCheckpointSerializer
+
+
+def _round_trip(obj):
+    serializer = CompactCheckpointSerializer()
+    return serializer.loads_typed(serializer.dumps_typed(obj))
+
+
+def test_state_is_compacted():
+    checkpoint = {
+        "v": 1,
+        "channel_values": {
+            "messages": [
+                HumanMessage(content="doc", additional_kwargs={"file_name": "a.py"}),
+                AIMessage(
+                    content="summary",
+                    additional_kwargs={"directory_path": "pkg", "file_name": "b.py"},
+                ),
+            ],
+            "dependencies_per_file": {"a.py": ["b.py"], "b.py": None},
+        },
+    }
+    serializer = CompactCheckpointSerializer()
+    type_, _ = serializer.dumps_typed(checkpoint)
+
+    assert type_ == FORMAT
+    assert _round_trip(checkpoint) == checkpoint
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        Interrupt(value="approve?", when="during"),
+        uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+        datetime.date(2024, 5, 1),
+        ("doc_node", 1),
+    ],
+)
+def test_value_round_trips(value):
+    assert _round_trip(value) == value
+    assert type(_round_trip(value)) is type(value)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        [("task", ("a.py", "b.py")), {"writes": [("messages", 1)]}],
+        {"id": uuid.UUID(int=1), "at": datetime.datetime(2024, 5, 1)},
+    ],
+)
+def test_nested_values_round_trip(value):
+    assert _round_trip(value) == value
@@ -0,0 +1,33 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from debtrazor.migrate_utils.service import DocService
+
+
+@pytest.mark.parametrize(
+    "jobs",
+    [
+        [{"entry_path": "/repo/a"}],
+        [{"thread_id": "defaults", "entry_path": "/repo/a"}],
+        [
+            {"thread_id": "a", "entry_path": "/repo/a"},
+            {"thread_id": "a", "entry_path": "/repo/b"},
+        ],
+    ],
+)
+def test_job_without_own_thread_is_rejected(tmp_path, jobs):
+    async def submit():
+        service = DocService(
+            SimpleNamespace(output_path=str(tmp_path)), {"thread_id": "defaults"}
+        )
+        try:
+            for job in jobs[:-1]:
+                await service.submit(job)
+            with pytest.raises(ValueError):
+                await service.submit(jobs[-1])
+        finally:
+            await service.close()
+
+    asyncio.run(submit())
@@ -0,0 +1,43 @@
+import pytest
+
+from debtrazor.utils.sniff import FileLimits, skip_reason, sniff_file
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        '"""Helpers for auto-generated invoice numbers."""\n\n\ndef next_number():\n'
+        "    pass\n",
+        "# Do not edit the rates below without asking finance\nRATES = {}\n",
+        "import os\n\n# @generated below is the marker we look for\n",
+        'HEADER = "// Code generated by tool. DO NOT EDIT."\n',
+    ],
+)
+def test_handwritten_file_is_not_generated(tmp_path, code):
+    path = tmp_path / "invoices.py"
+    path.write_text(code)
+
+    assert sniff_file(str(path)).kind == "text"
+    assert skip_reason(str(path), FileLimits()) is None
+
+
+@pytest.mark.parametrize(
+    "name, code",
+    [
+        ("schema.py", "#!/usr/bin/env python\n# @generated by codegen\nX = 1\n"),
+        ("api.go", "// Code generated by protoc-gen-go. DO NOT EDIT.\npackage api\n"),
+        (
+            "msg.h",
+            "// Generated by the protocol buffer compiler.  DO NOT EDIT!\n"
+            "// source: msg.proto\n",
+        ),
+        ("types.ts", "/**\n * This file is @generated by relay.\n */\nexport {};\n"),
+    ],
+)
+def test_standard_header_is_generated(tmp_path, name, code):
+    path = tmp_path / name
+    path.write_text(code)
+
+    assert sniff_file(str(path)).kind == "generated"
+    assert skip_reason(str(path), FileLimits()) == "generated"
+    assert skip_reason(str(path), FileLimits(skip_generated=False)) is None
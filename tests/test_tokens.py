@@ -0,0 +1,19 @@
+import pytest
+
+from debtrazor.utils.tokens import split_by_tokens, split_file_by_tokens
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "def f():\n    return 1\n",
+        "".join(f"value_{i} = {i} * {i}\n" for i in range(400)),
+        "x" * 1000 + "\n" + "y = 2\n" * 50,
+    ],
+)
+def test_file_pieces_match_text_pieces(tmp_path, text):
+    path = tmp_path / "code.py"
+    path.write_text(text)
+
+    assert list(split_file_by_tokens(str(path), 50)) == split_by_tokens(text, 50)